@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Headless batch generation of joints from a manifest, without Qt.
+
+The manifest is either a JSON file or a CSV file.  A JSON manifest is a list
+of jobs, or a dictionary {"defaults": {...}, "jobs": [...]}, where each job
+is a dictionary.  A CSV manifest has one job per row, with the keys as the
+column headers.  The job keys are:
+
+name: Output file prefix.  Default is joint<INDEX>.
+metric: If true, dimensions are in mm.  Otherwise, inches.  Default is false.
+num_increments: Increments per unit length.  Default is the configuration default.
+board_width, bit_width, bit_depth: [inches|mm]
+bit_angle: [degrees].  Default is 0 (straight bit).
+bit_gentle: Cutting part of the bit %.
+double_thickness: [inches|mm] If set, the double board is active.
+double_double_thickness: [inches|mm] If set, the double-double board is active.
+spacing: Either "equal" or "variable".  Default is "equal".
+
+For spacing="equal", the optional parameters (in increments, as on the
+sliders) are es_spacing, es_width, and es_centered.  For spacing="variable",
+the optional parameters are vs_fingers, vs_spacing, and vs_inverted.
+
+Usage:
+
+  python batch.py manifest.json -o outdir
+'''
+from __future__ import print_function
+from __future__ import division
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+
+import router
+import utils
+import job_runner
+import parallel
+
+# Converters for the job keys, used for CSV manifests whose values are all strings
+_BOOL_KEYS = ['metric', 'es_centered', 'vs_inverted']
+_INT_KEYS = ['num_increments', 'es_spacing', 'es_width', 'vs_fingers', 'vs_spacing']
+_FLOAT_KEYS = ['bit_angle', 'bit_gentle']
+
+
+def _to_bool(v):
+    '''Converts a manifest value to a bool'''
+    if isinstance(v, str):
+        return v.strip().lower() in ['1', 'true', 'yes', 'y']
+    return bool(v)
+
+
+def _clean_job(job):
+    '''
+    Returns a copy of job with empty values removed and values converted to
+    their expected types.
+    '''
+    r = {}
+    for k, v in job.items():
+        if v is None or (isinstance(v, str) and not v.strip()):
+            continue
+        if k in _BOOL_KEYS:
+            v = _to_bool(v)
+        elif k in _INT_KEYS:
+            v = int(v)
+        elif k in _FLOAT_KEYS:
+            v = float(v)
+        r[k] = v
+    return r
+
+
+def read_manifest(filename):
+    '''
+    Reads the manifest filename, in either JSON or CSV format, depending on
+    its extension.  Returns a list of job dictionaries.
+    '''
+    if filename.lower().endswith('.csv'):
+        with open(filename, 'r') as fd:
+            jobs = list(csv.DictReader(fd))
+        defaults = {}
+    else:
+        with open(filename, 'r') as fd:
+            m = json.load(fd)
+        if isinstance(m, dict):
+            defaults = m.get('defaults', {})
+            jobs = m['jobs']
+        else:
+            defaults = {}
+            jobs = m
+    r = []
+    for i, job in enumerate(jobs):
+        j = _clean_job(defaults)
+        j.update(_clean_job(job))
+        j.setdefault('name', 'joint%d' % i)
+        r.append(j)
+    return r
+
+
+def main(argv=None):
+    '''
+    Runs the manifest given on the command line.  Returns the number of jobs
+    that failed.
+    '''
+    parser = argparse.ArgumentParser(description='Generates pyRouterJig joints without the GUI.')
+    parser.add_argument('manifest', help='JSON or CSV manifest of joints')
+    parser.add_argument('-o', '--outdir', default=None,
+                        help='directory for pass tables and geometry (default: none written)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes (0 for one per CPU, default: 1)')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='jobs sent to each worker at once (default: automatic)')
+    parser.add_argument('--engine', choices=router.NUMERIC_ENGINES,
+                        default=router.get_numeric_engine(),
+                        help='arithmetic for the router passes (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    utils.init_decimal_context()
+    router.set_numeric_engine(args.engine)
+    jobs = read_manifest(args.manifest)
+    if args.outdir is not None and not os.path.isdir(args.outdir):
+        os.makedirs(args.outdir)
+
+    nfail = 0
+    npasses = 0
+    t0 = time.time()
+    if args.jobs == 1:
+        factory = job_runner.Joint_Factory()
+        results = [job_runner.run_job(i, job, factory, args.outdir)
+                   for (i, job) in enumerate(jobs)]
+    else:
+        workers = args.jobs if args.jobs > 0 else None
+        results = parallel.evaluate(jobs, args.outdir, workers, args.chunksize)
+    for r in results:
+        if r.ok():
+            npasses += r.npasses
+        else:
+            nfail += 1
+            print('%s: %s: %s' % (r.name, r.error_type, r.error), file=sys.stderr)
+    dt = time.time() - t0
+    njoints = len(jobs) - nfail
+    rate = njoints / dt if dt > 0 else float('inf')
+    print('%d joints (%d router passes) in %.3f s: %.1f joints/s, %d failed' %
+          (njoints, npasses, dt, rate, nfail))
+    return nfail
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,109 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for batch, job_runner, and parallel.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import utils
+import batch
+import job_runner
+import parallel
+
+jobs = [{'name': 'box'},
+        {'name': 'dovetail', 'bit_angle': 14, 'bit_width': '1/2', 'bit_depth': '3/8'},
+        {'name': 'variable', 'spacing': 'variable', 'vs_fingers': 4},
+        {'name': 'double', 'double_thickness': '1/8', 'double_double_thickness': '1/8'},
+        {'name': 'metric', 'metric': True, 'board_width': 150, 'bit_width': 12,
+         'bit_depth': 10, 'spacing': 'variable'},
+        {'name': 'too_narrow', 'board_width': '1/2'}]
+
+
+class Batch_Test(unittest.TestCase):
+    '''
+    Tests batch, job_runner, and parallel
+    '''
+    def setUp(self):
+        utils.init_decimal_context()
+
+    def test_make_joint(self):
+        factory = job_runner.Joint_Factory()
+        (bit, boards, sp) = job_runner.evaluate_job(jobs[3], factory)
+        self.assertTrue(boards[2].active and boards[3].active)
+        self.assertEqual(bit.width, 16)
+        self.assertEqual(sp.description[0:4], 'Equa')
+        geom = job_runner.joint_geometry(bit, boards)
+        self.assertEqual(sorted(geom.keys()), sorted(job_runner.BOARD_NAMES))
+
+    def test_parallel_matches_serial(self):
+        factory = job_runner.Joint_Factory()
+        results = parallel.evaluate(jobs, workers=2, chunksize=1, with_geometry=True)
+        self.assertEqual([r.name for r in results], [j['name'] for j in jobs])
+        for (job, r) in zip(jobs[:-1], results[:-1]):
+            self.assertTrue(r.ok())
+            (bit, boards, dummy_sp) = job_runner.evaluate_job(job, factory)
+            self.assertEqual(r.npasses, job_runner.count_passes(boards))
+            self.assertEqual(r.geometry, job_runner.joint_geometry(bit, boards))
+        self.assertFalse(results[-1].ok())
+        self.assertEqual(results[-1].error_type, 'Spacing_Exception')
+
+
+    def test_manifest(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            manifest = os.path.join(tmpdir, 'manifest.json')
+            bad = [{'name': 'bad_width', 'bit_width': 'abc'},
+                   {'name': 'bad_spacing', 'spacing': 'diagonal'}]
+            with open(manifest, 'w') as fd:
+                json.dump({'defaults': {'bit_depth': '1/2'}, 'jobs': jobs + bad}, fd)
+            csv_manifest = os.path.join(tmpdir, 'manifest.csv')
+            with open(csv_manifest, 'w') as fd:
+                fd.write('name,metric,board_width,bit_width,vs_fingers,spacing\n'
+                         'csv,1,150,12,3,variable\n'
+                         'csv_bad,0,8,3/4/,,\n')
+            self.assertEqual([j['bit_depth'] for j in batch.read_manifest(manifest)],
+                             [j.get('bit_depth', '1/2') for j in jobs + bad])
+            self.assertEqual(batch.read_manifest(csv_manifest)[0],
+                             {'name': 'csv', 'metric': True, 'board_width': '150',
+                              'bit_width': '12', 'vs_fingers': 3, 'spacing': 'variable'})
+            # a bad job is reported, and the others still run
+            for (m, nfail, names) in [(manifest, 3, [j['name'] for j in jobs[:-1]]),
+                                      (csv_manifest, 1, ['csv'])]:
+                for workers in ['1', '2']:
+                    outdir = os.path.join(tmpdir, 'out' + workers)
+                    self.assertEqual(batch.main([m, '-o', outdir, '-j', workers]), nfail)
+                    for name in names:
+                        with open(os.path.join(outdir, name + '.json'), 'r') as fd:
+                            self.assertTrue(json.load(fd)['boards']['top']['bottom_cuts'])
+                    self.assertEqual(len(os.listdir(outdir)), 2 * len(names))
+                    shutil.rmtree(outdir)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
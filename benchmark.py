@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Benchmarks of the joint geometry, without Qt.
+
+Each benchmark is timed over a grid of joints, covering English and metric
+units, straight and dovetail bits, and single, double, and double-double
+boards.  The time of each (benchmark, joint) is the best of several repeats,
+in seconds per call.  Combinations for which the joint cannot be made
+(a Router_Exception or Spacing_Exception) are listed as skipped; any other
+exception is a bug, and is raised.
+
+With --memory, the bytes held by the cut boards of each joint are also
+reported.
+
+Each run is appended to a JSON history file, and compared with the
+baseline, which is the best time of each benchmark over the last few runs
+in that file.  Comparing with the best, rather than with only the previous
+run, keeps a gradual slowdown from passing unnoticed one small step at a
+time, and a single noisy run from hiding a regression.  A time that
+increased by more than the threshold fraction is a regression, and the exit
+status is 1 if there are any.
+
+Usage:
+
+  python benchmark.py [-H history.json] [-w 5] [-t 0.25] [-t cut_boards=0.5] [-b cut_boards]
+'''
+from __future__ import print_function
+from __future__ import division
+
+import gc
+import os
+import sys
+import copy
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import timeit
+
+import router
+import spacing
+import serialize
+import threeDS
+import utils
+import job_runner
+
+DEFAULT_HISTORY = 'benchmark_history.json'
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_WINDOW = 5
+
+
+def joint_grid():
+    '''
+    Returns a list of (case name, job dictionary) for the benchmarked joints
+    '''
+    units = [('english', {'metric': False, 'board_width': '7 1/2', 'bit_width': '1/2',
+                          'bit_depth': '3/4', 'double_thickness': '1/8',
+                          'double_double_thickness': '1/8'}),
+             ('metric', {'metric': True, 'board_width': 200, 'bit_width': 12,
+                         'bit_depth': 19, 'double_thickness': 3,
+                         'double_double_thickness': 3})]
+    bits = [('straight', 0), ('dovetail', 14)]
+    doubles = ['single', 'double', 'double_double']
+    grid = []
+    for (uname, u) in units:
+        for (bname, angle) in bits:
+            for (nd, dname) in enumerate(doubles):
+                job = dict(u, bit_angle=angle, es_centered=False)
+                if nd < 2:
+                    del job['double_double_thickness']
+                if nd < 1:
+                    del job['double_thickness']
+                grid.append(('%s_%s_%s' % (uname, bname, dname), job))
+    return grid
+
+
+class Joint(object):
+    '''
+    The bit, boards, and spacings of one joint in the grid, created once, so
+    that only the benchmarked operation is timed.
+    '''
+    def __init__(self, job, factory):
+        (self.bit, self.boards, self.equal, self.config) = factory.make_joint(job)
+        self.var = spacing.Variable_Spaced(self.bit, self.boards, self.config)
+        self.var.set_cuts()
+        self.transl = utils.Null_Translator()
+        # cut boards, for perimeter, triangulate, and format_labels
+        self.cut = copy.deepcopy(self.boards)
+        router.cut_boards(self.cut, self.bit, self.equal)
+        self.serialized = serialize.serialize(self.bit, self.boards, self.equal, self.config)
+        self.legacy = serialize.serialize_legacy(self.bit, self.boards, self.equal, self.config)
+        self.tmpdir = None
+
+    def cut_boards(self):
+        # time the computation, not the cache lookup
+        router.joint_cache.invalidate()
+        router.cut_boards(self.boards, self.bit, self.equal)
+
+    def perimeter(self):
+        for b in self.cut:
+            if b.active:
+                b.perimeter(self.bit)
+
+    def triangulate(self):
+        for b in self.cut:
+            if b.active:
+                b.triangulate(self.bit)
+
+    def format_labels(self):
+        # the strings drawn on each paint: the title, finger widths, and
+        # router pass locations
+        units = self.bit.units
+        router.create_title(self.boards, self.bit, self.equal)
+        for b in self.cut:
+            if b.active:
+                for cuts in [b.top_cuts, b.bottom_cuts]:
+                    for c in cuts or []:
+                        units.increments_to_string(round(c.xmax - c.xmin, 3))
+                        for p in c.passes:
+                            units.increments_to_string(b.xR() - p)
+
+    def serialize(self):
+        serialize.serialize(self.bit, self.boards, self.equal, self.config)
+
+    def unserialize(self):
+        serialize.unserialize(self.serialized, self.config, True, self.transl)
+
+    def serialize_legacy(self):
+        serialize.serialize_legacy(self.bit, self.boards, self.equal, self.config)
+
+    def unserialize_legacy(self):
+        serialize.unserialize(self.legacy, self.config, True, self.transl)
+
+    def unserialize_header(self):
+        serialize.unserialize_header(self.serialized, self.config, True, self.transl)
+
+    def joint_to_3ds(self):
+        if self.tmpdir is None:
+            self.tmpdir = tempfile.mkdtemp()
+        threeDS.joint_to_3ds(os.path.join(self.tmpdir, 'joint.3ds'),
+                             self.boards, self.bit, self.equal)
+
+    def cleanup(self):
+        '''Removes any temporary files'''
+        if self.tmpdir is not None:
+            shutil.rmtree(self.tmpdir)
+            self.tmpdir = None
+
+
+# The benchmarks, as (name, function of a Joint)
+BENCHMARKS = [('equal_set_cuts', lambda j: j.equal.set_cuts()),
+              ('variable_set_cuts', lambda j: j.var.set_cuts()),
+              ('cut_boards', Joint.cut_boards),
+              ('perimeter', Joint.perimeter),
+              ('triangulate', Joint.triangulate),
+              ('format_labels', Joint.format_labels),
+              ('serialize', Joint.serialize),
+              ('unserialize', Joint.unserialize),
+              ('serialize_legacy', Joint.serialize_legacy),
+              ('unserialize_legacy', Joint.unserialize_legacy),
+              ('unserialize_header', Joint.unserialize_header),
+              ('joint_to_3ds', Joint.joint_to_3ds)]
+
+
+def time_call(f, min_time=0.05, repeat=3):
+    '''
+    Returns the best time, in seconds per call, of repeat runs of f, where
+    the number of calls in each run is chosen so that a run takes at least
+    min_time.
+    '''
+    timer = timeit.Timer(f)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return min(timer.repeat(repeat, number)) / number
+
+
+def run(names=None, min_time=0.05, repeat=3):
+    '''
+    Runs the benchmarks in the list names (default all) over the joint grid.
+    Returns (results, skipped), where results is a dictionary of
+    "benchmark/case" to seconds per call, and skipped is a dictionary of
+    "benchmark/case" to the exception message.
+    '''
+    utils.init_decimal_context()
+    factory = job_runner.Joint_Factory()
+    joints = [(case, Joint(job, factory)) for (case, job) in joint_grid()]
+    results = {}
+    skipped = {}
+    for (name, f) in BENCHMARKS:
+        if names and name not in names:
+            continue
+        for (case, joint) in joints:
+            key = name + '/' + case
+            try:
+                f(joint)
+            except (router.Router_Exception, spacing.Spacing_Exception) as e:
+                skipped[key] = '%s: %s' % (type(e).__name__, e)
+                continue
+            results[key] = time_call(lambda: f(joint), min_time, repeat)
+    for (dummy_case, joint) in joints:
+        joint.cleanup()
+    return (results, skipped)
+
+
+def sizeof(obj, shared):
+    '''
+    Returns the number of bytes of obj and of the objects it refers to,
+    counting each object once, and not counting the objects in the list
+    shared, or classes and modules.
+    '''
+    seen = set(id(o) for o in shared)
+    todo = [obj]
+    nbytes = 0
+    while todo:
+        o = todo.pop()
+        if id(o) in seen or isinstance(o, type) or type(o).__name__ == 'module':
+            continue
+        seen.add(id(o))
+        nbytes += sys.getsizeof(o)
+        todo.extend(gc.get_referents(o))
+    return nbytes
+
+
+def memory():
+    '''
+    Returns a dictionary of "memory/case" to the number of bytes held by the
+    cut boards of each joint in the grid, not counting the bit and units
+    shared with other joints.
+    '''
+    utils.init_decimal_context()
+    factory = job_runner.Joint_Factory()
+    results = {}
+    for (case, job) in joint_grid():
+        (bit, boards, dummy_sp) = job_runner.evaluate_job(job, factory)
+        # the boards' own cut lists, not shared with the joint cache
+        shared = [bit, bit.units, bit.units.transl]
+        boards = copy.deepcopy(boards, dict((id(o), o) for o in shared))
+        results['memory/' + case] = sizeof(boards, shared)
+    return results
+
+
+def read_history(filename):
+    '''Returns the list of runs in the history file, or [] if none'''
+    if not os.path.exists(filename):
+        return []
+    with open(filename, 'r') as fd:
+        return json.load(fd)
+
+
+def write_history(filename, history):
+    '''Writes the list of runs to the history file'''
+    with open(filename, 'w') as fd:
+        json.dump(history, fd, indent=1, sort_keys=True)
+
+
+def baseline(history, window=DEFAULT_WINDOW):
+    '''
+    Returns the dictionary of "benchmark/case" to the best (smallest) value
+    over the last window runs of the history.  If window is 0, all of the
+    runs are used.
+    '''
+    runs = history[-window:] if window > 0 else history
+    best = {}
+    for r in runs:
+        for (key, v) in r['results'].items():
+            if key not in best or v < best[key]:
+                best[key] = v
+    return best
+
+
+def threshold_for(key, thresholds, default):
+    '''
+    Returns the threshold for the "benchmark/case" key.  A threshold may be
+    given for a benchmark or for a single case.
+    '''
+    if key in thresholds:
+        return thresholds[key]
+    return thresholds.get(key.split('/')[0], default)
+
+
+def compare(results, previous, thresholds=None, default=DEFAULT_THRESHOLD):
+    '''
+    Compares results with previous, each a dictionary of "benchmark/case" to
+    seconds, where previous is usually the baseline() of the history.  Returns a sorted list of (key, previous, current, ratio) for
+    each regression, which is a time that increased by more than its
+    threshold fraction.
+    '''
+    if thresholds is None:
+        thresholds = {}
+    regressions = []
+    for key in sorted(results.keys()):
+        if key not in previous or previous[key] <= 0:
+            continue
+        ratio = results[key] / previous[key]
+        if ratio > 1 + threshold_for(key, thresholds, default):
+            regressions.append((key, previous[key], results[key], ratio))
+    return regressions
+
+
+def parse_thresholds(args):
+    '''
+    Converts the list of threshold arguments, each either a fraction or
+    NAME=fraction, to (default, dictionary of NAME to fraction)
+    '''
+    default = DEFAULT_THRESHOLD
+    thresholds = {}
+    for a in args:
+        if '=' in a:
+            (name, v) = a.split('=', 1)
+            thresholds[name] = float(v)
+        else:
+            default = float(a)
+    return (default, thresholds)
+
+
+def main(argv=None):
+    '''
+    Runs the benchmarks given on the command line.  Returns the number of
+    regressions.
+    '''
+    names = [name for (name, dummy_f) in BENCHMARKS]
+    parser = argparse.ArgumentParser(description='Benchmarks the pyRouterJig geometry, without the GUI.')
+    parser.add_argument('-H', '--history', default=DEFAULT_HISTORY,
+                        help='JSON history file (default: %(default)s)')
+    parser.add_argument('-w', '--window', type=int, default=DEFAULT_WINDOW,
+                        help='number of past runs whose best times are the baseline'
+                        ' (0 for all, default: %(default)s)')
+    parser.add_argument('-t', '--threshold', action='append', default=[],
+                        help='allowed fractional slowdown, either for all benchmarks or as'
+                        ' NAME=FRACTION for a benchmark or benchmark/case (default: %s)'
+                        % DEFAULT_THRESHOLD)
+    parser.add_argument('-b', '--benchmark', action='append', choices=names,
+                        help='benchmark to run (default: all)')
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help='minimum seconds per repeat (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='repeats, of which the best is kept (default: %(default)s)')
+    parser.add_argument('--memory', action='store_true',
+                        help='also report the bytes held by each joint')
+    parser.add_argument('--no-save', action='store_true',
+                        help='do not append this run to the history')
+    args = parser.parse_args(argv)
+    (default, thresholds) = parse_thresholds(args.threshold)
+
+    (results, skipped) = run(args.benchmark, args.min_time, args.repeat)
+    history = read_history(args.history)
+    previous = baseline(history, args.window)
+
+    for key in sorted(results.keys()):
+        if key in previous:
+            change = '%+6.1f%%' % (100 * (results[key] / previous[key] - 1))
+        else:
+            change = ''
+        print('%-50s %12.1f us %s' % (key, results[key] * 1e6, change))
+    if args.memory:
+        sizes = memory()
+        for key in sorted(sizes.keys()):
+            if key in previous:
+                change = '%+6.1f%%' % (100 * (sizes[key] / previous[key] - 1))
+            else:
+                change = ''
+            print('%-50s %12d B  %s' % (key, sizes[key], change))
+        results.update(sizes)
+    for key in sorted(skipped.keys()):
+        print('%-50s      skipped    %s' % (key, skipped[key]))
+
+    regressions = compare(results, previous, thresholds, default)
+    for (key, t0, t1, ratio) in regressions:
+        print('REGRESSION %s: %.1f us -> %.1f us (%.2fx)' % (key, t0 * 1e6, t1 * 1e6, ratio))
+
+    if not args.no_save:
+        history.append({'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                        'version': utils.VERSION,
+                        'python': platform.python_version(),
+                        'engine': router.get_numeric_engine(),
+                        'results': results,
+                        'skipped': skipped})
+        write_history(args.history, history)
+    return len(regressions)
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,77 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for benchmark.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import benchmark
+
+
+class Benchmark_Test(unittest.TestCase):
+    '''
+    Tests the benchmark runner and regression checks
+    '''
+    def test_compare(self):
+        previous = {'a/x': 1.0, 'a/y': 1.0, 'b/x': 1.0}
+        results = {'a/x': 1.2, 'a/y': 1.4, 'b/x': 1.4, 'c/x': 9.0}
+        (default, thresholds) = benchmark.parse_thresholds(['0.3', 'b=0.5', 'a/x=0.1'])
+        self.assertEqual(default, 0.3)
+        regressions = benchmark.compare(results, previous, thresholds, default)
+        self.assertEqual([r[0] for r in regressions], ['a/x', 'a/y'])
+
+    def test_baseline(self):
+        history = [{'results': {'a/x': 1.0, 'b/x': 3.0}},
+                   {'results': {'a/x': 2.0, 'b/x': 2.0}},
+                   {'results': {'a/x': 1.5, 'c/x': 4.0}}]
+        self.assertEqual(benchmark.baseline(history), {'a/x': 1.0, 'b/x': 2.0, 'c/x': 4.0})
+        self.assertEqual(benchmark.baseline(history, 2), {'a/x': 1.5, 'b/x': 2.0, 'c/x': 4.0})
+        self.assertEqual(benchmark.baseline(history, 0), benchmark.baseline(history))
+        self.assertEqual(benchmark.baseline([]), {})
+        # faster than the previous run, but a regression from the best
+        regressions = benchmark.compare({'a/x': 1.3}, benchmark.baseline(history), {}, 0.25)
+        self.assertEqual([r[0] for r in regressions], ['a/x'])
+
+    def test_history(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            history = os.path.join(tmpdir, 'history.json')
+            argv = ['-H', history, '-b', 'equal_set_cuts', '-b', 'joint_to_3ds',
+                    '--min-time', '0.001', '--repeat', '1', '-t', '1000']
+            self.assertEqual(benchmark.main(argv), 0)
+            self.assertEqual(benchmark.main(argv), 0)
+            runs = benchmark.read_history(history)
+            self.assertEqual(len(runs), 2)
+            ncases = len(benchmark.joint_grid())
+            keys = list(runs[-1]['results'].keys()) + list(runs[-1]['skipped'].keys())
+            self.assertEqual(len(keys), 2 * ncases)
+            self.assertTrue('equal_set_cuts/metric_dovetail_double_double' in keys)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
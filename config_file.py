@@ -210,6 +210,18 @@ left_margin = {left_margin}
 right_margin = {right_margin}
 separation = {separation}
 
+# The maximum number of changes that may be undone in the spacing Editor
+undo_depth = {undo_depth}
+
+# Set save_cuts to True to save the computed router passes with each joint, so
+# that opening the joint does not recompute them.  This increases the size of
+# the saved data.
+save_cuts = {save_cuts}
+
+# The maximum size, in MB, of the cache of thumbnails previewed when opening
+# files
+thumbnail_cache_mb = {thumbnail_cache_mb}
+
 # Set debug to True to turn on debugging.  This will print a lot of output to
 # stdout during a pyRouterJig session.  This option is typically only useful
 # for developers.
@@ -234,6 +246,9 @@ COMMON_VALS = {'version': 'NONE',
                'wood_images': 'NONE',
                'default_wood': '1',
                'debug': False,
+               'undo_depth': 100,
+               'save_cuts': True,
+               'thumbnail_cache_mb': 64,
                'print_color': True,
                'canvas_background': (255, 237, 184, 255),
                'canvas_foreground': (91, 68, 0, 255),
@@ -295,6 +310,9 @@ MIGRATE = ['english_separator',  # COMMON_VALS
            'print_scale_factor',
            'default_wood',
            'debug',
+           'undo_depth',
+           'save_cuts',
+           'thumbnail_cache_mb',
            'bit_gentle',
            'left_margin',
            'right_margin',
@@ -347,6 +365,42 @@ def set_default_dimensions(d):
         d[v] = COMMON_VALS[v]
 
 
+class Default_Config(object):
+    '''
+    Holds the default configuration values as attributes, in the same way as
+    the module loaded from the configuration file.  Used when running without
+    the GUI, where the configuration file is neither read nor created.
+    '''
+    def __init__(self, metric=False, **kwargs):
+        vals = COMMON_VALS.copy()
+        if metric:
+            vals.update(METRIC_VALS)
+        else:
+            vals.update(ENGLISH_VALS)
+        vals['version'] = str(utils.VERSION)
+        vals['max_image_width'] = vals['min_image_width']
+        vals.update(kwargs)
+        self.__dict__.update(vals)
+
+
+def user_config(metric, filename=None):
+    '''
+    Returns the configuration in the user's configuration file, or in
+    filename, for use without the GUI, where the file is neither created
+    nor updated.  Values missing from an outdated file are set to their
+    defaults.  If the file does not exist, or is for the other unit system
+    than metric, the default configuration is returned.
+    '''
+    c = Configuration()
+    if filename is not None:
+        c.filename = filename
+    if c.read_config() == 1 or c.config.metric != metric:
+        return Default_Config(metric)
+    vals = dict((k, v) for (k, v) in vars(c.config).items()
+                if not k.startswith('__') and k != 'metric')
+    return Default_Config(metric, **vals)
+
+
 class Configuration(object):
     '''
     Defines interface to reading and creating the configuration file
@@ -356,7 +410,7 @@ class Configuration(object):
         # config file must be updated if it was created with an earlier number.
         # Update this value when new parameters are added to the config file,
         # or any parameter's type changes,
-        self.create_version_number = 94
+        self.create_version_number = 95
         # config file cannot be migrated from versions earlier than this.
         # This value is currently set at the version that all dimensions and bit_angle
         # were consistent types and dimensions.
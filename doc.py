@@ -105,6 +105,12 @@ class Doc(object):
             using zero "Spacing", zero "Width", and the "Centered" option \
             checked.')
 
+        self._edit_undo = self.transl.tr('<b>Undo</b> undoes the last change to the cuts. \
+            The <b>U</b> key also undoes the last change.')
+
+        self._edit_redo = self.transl.tr('<b>Redo</b> redoes the last change that was undone. \
+            The <b>R</b> key also redoes the last undone change.')
+
     def short_desc(self):
         return self._short_desc
 
@@ -152,3 +158,9 @@ class Doc(object):
 
     def cb_vsfingers(self):
         return self._cb_vsfingers % spacing.Variable_Spaced.keys[0]
+
+    def edit_undo(self):
+        return self._edit_undo
+
+    def edit_redo(self):
+        return self._edit_redo
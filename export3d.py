@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Exports joints to binary STL and Wavefront OBJ files, as well as the 3DS
+files of threeDS.  All formats share the meshes of threeDS.joint_objects().
+
+The facet normals are computed for all of the triangles of an object at
+once, with numpy if it is available, and each object is formatted in
+memory and written with a single write.
+
+Usage, to export the joint saved in a PNG file, without the GUI:
+
+  python export3d.py joint.png -o joint.stl [-o joint.obj] [-o joint.3ds] [-c config]
+
+The joint is recomputed with the user's configuration file, as in the GUI,
+or with the default configuration if there is none.
+'''
+from __future__ import print_function
+from __future__ import division
+
+import os
+import sys
+import struct
+import argparse
+
+import config_file
+import png_text
+import serialize
+import threeDS
+import utils
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Record of a binary STL facet: normal, three vertices, and attribute byte count
+if np is not None:
+    STL_FACET = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)),
+                          ('attribute', '<u2')])
+
+
+def facet_normals(vertices, triangles):
+    '''
+    Returns the unit normals of the triangles, which are (i0, i1, i2)
+    indices into vertices, oriented counterclockwise.  Degenerate triangles
+    have zero normals.  Returns an (n, 3) numpy array if numpy is available,
+    otherwise a list of (x, y, z).
+    '''
+    if np is not None:
+        v = np.asarray(vertices, dtype=float).reshape(-1, 3)
+        t = np.asarray(triangles, dtype=int).reshape(-1, 3)
+        n = np.cross(v[t[:, 1]] - v[t[:, 0]], v[t[:, 2]] - v[t[:, 0]])
+        length = np.sqrt((n * n).sum(axis=1))
+        length[length == 0] = 1
+        return n / length[:, np.newaxis]
+    normals = []
+    for t in triangles:
+        (a, b, c) = [vertices[i] for i in t[0:3]]
+        u = [b[k] - a[k] for k in range(3)]
+        w = [c[k] - a[k] for k in range(3)]
+        n = (u[1] * w[2] - u[2] * w[1], u[2] * w[0] - u[0] * w[2], u[0] * w[1] - u[1] * w[0])
+        length = (n[0] ** 2 + n[1] ** 2 + n[2] ** 2) ** 0.5 or 1
+        normals.append(tuple(x / length for x in n))
+    return normals
+
+
+def stl_facets(obj):
+    '''Returns the bytes of the binary STL facets of the Object_Geometry obj'''
+    normals = facet_normals(obj.vertices, obj.triangles)
+    if np is not None:
+        v = np.asarray(obj.vertices, dtype=float).reshape(-1, 3)
+        facets = np.zeros(len(obj.triangles), dtype=STL_FACET)
+        facets['normal'] = normals
+        facets['vertices'] = v[np.asarray(obj.triangles, dtype=int).reshape(-1, 3)]
+        return facets.tobytes()
+    values = []
+    for (n, t) in zip(normals, obj.triangles):
+        values.extend(n)
+        for i in t[0:3]:
+            values.extend(obj.vertices[i][0:3])
+    return b''.join(struct.pack('<12fH', *(values[k:k + 12] + [0]))
+                    for k in range(0, len(values), 12))
+
+
+def write_stl(filename, objects, header='pyRouterJig'):
+    '''
+    Writes the list of Object_Geometrys to filename as a binary STL file.
+    STL has no objects, so their triangles are written as one solid.
+    '''
+    header = header.encode('ascii')[0:80].ljust(80, b' ')
+    ntriangles = sum(obj.num_triangles() for obj in objects)
+    with open(filename, 'wb') as fd:
+        fd.write(header + struct.pack('<I', ntriangles))
+        for obj in objects:
+            fd.write(stl_facets(obj))
+
+
+def read_stl(filename):
+    '''
+    Reads the binary STL file filename.  Returns (normals, vertices), where
+    normals is a list of the (x, y, z) facet normals and vertices is a list
+    of the three (x, y, z) vertices of each facet.
+    '''
+    with open(filename, 'rb') as fd:
+        data = fd.read()
+    (n,) = struct.unpack_from('<I', data, 80)
+    if len(data) != 84 + 50 * n:
+        raise ValueError('%s is not a binary STL file' % filename)
+    normals = []
+    vertices = []
+    for k in range(n):
+        values = struct.unpack_from('<12f', data, 84 + 50 * k)
+        normals.append(values[0:3])
+        vertices.append([values[3:6], values[6:9], values[9:12]])
+    return (normals, vertices)
+
+
+def obj_text(obj, vertex_offset, normal_offset):
+    '''
+    Returns the OBJ text of the Object_Geometry obj, whose first vertex and
+    normal have the given 0-based indices in the file
+    '''
+    normals = facet_normals(obj.vertices, obj.triangles)
+    if np is not None:
+        v = np.asarray(obj.vertices, dtype=float).ravel().tolist()
+        # adding zero turns -0 into 0
+        n = (np.asarray(normals, dtype=float).ravel() + 0.0).tolist()
+        f = (np.asarray(obj.triangles, dtype=int).reshape(-1, 3) + vertex_offset + 1)
+        k = np.arange(normal_offset + 1, normal_offset + 1 + len(f))
+        f = np.column_stack([f[:, 0], k, f[:, 1], k, f[:, 2], k]).ravel().tolist()
+    else:
+        v = [x for p in obj.vertices for x in p[0:3]]
+        n = [x + 0.0 for p in normals for x in p]
+        f = []
+        for (k, t) in enumerate(obj.triangles):
+            k += normal_offset + 1
+            for i in t[0:3]:
+                f.extend([i + vertex_offset + 1, k])
+    return ''.join(['o %s\n' % obj.name,
+                    'v %.9g %.9g %.9g\n' * obj.num_vertices() % tuple(v),
+                    'vn %.6g %.6g %.6g\n' * obj.num_triangles() % tuple(n),
+                    'f %d//%d %d//%d %d//%d\n' * obj.num_triangles() % tuple(f)])
+
+
+def write_obj(filename, objects):
+    '''Writes the list of Object_Geometrys to filename as a Wavefront OBJ file'''
+    with open(filename, 'w') as fd:
+        fd.write('# pyRouterJig %s\n' % utils.VERSION)
+        vertex_offset = 0
+        normal_offset = 0
+        for obj in objects:
+            fd.write(obj_text(obj, vertex_offset, normal_offset))
+            vertex_offset += obj.num_vertices()
+            normal_offset += obj.num_triangles()
+
+
+def read_obj(filename):
+    '''
+    Reads the Wavefront OBJ file filename, as written by write_obj().
+    Returns a list of Object_Geometrys, with the vertices and triangles of
+    each object indexed from 0 within the object.
+    '''
+    objects = []
+    offset = 0
+    with open(filename, 'r') as fd:
+        for line in fd:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == 'o':
+                if objects:
+                    offset += objects[-1].num_vertices()
+                objects.append(threeDS.Object_Geometry(fields[1], [], []))
+            elif fields[0] == 'v':
+                objects[-1].vertices.append(tuple(float(x) for x in fields[1:4]))
+            elif fields[0] == 'f':
+                objects[-1].triangles.append(tuple(int(x.split('/')[0]) - 1 - offset
+                                                   for x in fields[1:4]))
+    return objects
+
+
+# Writers by filename extension
+WRITERS = {'.stl': write_stl,
+           '.obj': write_obj,
+           '.3ds': threeDS.write_3ds}
+
+
+def write_joint(filename, boards, bit, spacing):
+    '''
+    Writes the joint to filename, in the format given by its extension, one
+    of WRITERS
+    '''
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in WRITERS:
+        raise ValueError('Unknown 3D format %s; use one of %s' %
+                         (ext, ', '.join(sorted(WRITERS.keys()))))
+    WRITERS[ext](filename, threeDS.joint_objects(boards, bit, spacing))
+
+
+def main(argv=None):
+    '''Exports the joint in the PNG file given on the command line'''
+    parser = argparse.ArgumentParser(description='Exports a pyRouterJig joint saved in a PNG'
+                                     ' file to 3D formats, without the GUI.')
+    parser.add_argument('png', help='PNG file saved by pyRouterJig')
+    parser.add_argument('-o', '--output', action='append', required=True,
+                        help='output file, whose extension is one of %s' %
+                        ', '.join(sorted(WRITERS.keys())))
+    parser.add_argument('-c', '--config',
+                        help='configuration file, used to recompute the joint as in the GUI'
+                        ' (default: the file created by pyRouterJig in the home directory)')
+    args = parser.parse_args(argv)
+
+    utils.init_decimal_context()
+    (s, newformat) = png_text.read_design(args.png)
+    if not s:
+        print('%s does not contain a pyRouterJig joint' % args.png, file=sys.stderr)
+        return 1
+    config = config_file.user_config(serialize.describe(s, newformat)['metric'], args.config)
+    (bit, boards, sp, dummy_sp_type) = \
+        serialize.unserialize(s, config, newformat, utils.Null_Translator())
+    for filename in args.output:
+        write_joint(filename, boards, bit, sp)
+        print('Exported to file %s' % filename)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for export3d.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import utils
+import config_file
+import serialize
+import job_runner
+import png_text
+import png_text_test
+import threeDS
+import threeDS_test
+import export3d
+
+
+class Export3D_Test(unittest.TestCase):
+    '''
+    Tests the STL and OBJ writers
+    '''
+    def setUp(self):
+        utils.init_decimal_context()
+        self.tmpdir = tempfile.mkdtemp()
+        self.np = export3d.np
+        (self.bit, self.boards, self.sp, self.config) = \
+            job_runner.Joint_Factory().make_joint({'es_centered': False})
+        self.objects = threeDS.joint_objects(self.boards, self.bit, self.sp)
+
+    def tearDown(self):
+        export3d.np = self.np
+        shutil.rmtree(self.tmpdir)
+
+    def test_normals(self):
+        vertices = [[0, 0, 0], [1, 0, 0], [0, 2, 0], [0, 0, 3]]
+        triangles = [[0, 1, 2], [0, 2, 3], [0, 1, 1]]
+        for np in [self.np, None]:
+            export3d.np = np
+            normals = [[float(x) for x in n]
+                       for n in export3d.facet_normals(vertices, triangles)]
+            self.assertEqual(normals, [[0, 0, 1], [1, 0, 0], [0, 0, 0]])
+
+    def test_stl(self):
+        filename = os.path.join(self.tmpdir, 'joint.stl')
+        expected = None
+        for np in [self.np, None]:
+            export3d.np = np
+            export3d.write_stl(filename, self.objects)
+            with open(filename, 'rb') as fd:
+                data = fd.read()
+            if expected is None:
+                expected = data
+            self.assertEqual(data, expected)
+        (normals, facets) = export3d.read_stl(filename)
+        self.assertEqual(len(facets), sum(o.num_triangles() for o in self.objects))
+        i = 0
+        for o in self.objects:
+            for t in o.triangles:
+                self.assertEqual(facets[i], [tuple(float(x) for x in o.vertices[k]) for k in t])
+                i += 1
+
+    def test_obj(self):
+        filename = os.path.join(self.tmpdir, 'joint.obj')
+        for np in [self.np, None]:
+            export3d.np = np
+            export3d.write_obj(filename, self.objects)
+            objects = export3d.read_obj(filename)
+            self.assertEqual([o.name for o in objects], ['top', 'bottom'])
+            for (o, expected) in zip(objects, self.objects):
+                self.assertEqual(threeDS_test.as_lists(o), threeDS_test.as_lists(expected))
+
+    def save_png(self, bit, boards, sp, config):
+        '''Returns the name of a PNG file with the joint saved in it'''
+        s = serialize.serialize(bit, boards, sp, config)
+        png = os.path.join(self.tmpdir, 'joint.png')
+        with open(png, 'wb') as fd:
+            fd.write(png_text.insert_text(png_text_test.png_bytes([], (8, 8)),
+                                          [(png_text.DESIGN_KEY, s),
+                                           (png_text.VERSION_KEY, utils.VERSION)]))
+        return png
+
+    def test_cli(self):
+        png = self.save_png(self.bit, self.boards, self.sp, self.config)
+        outputs = [os.path.join(self.tmpdir, 'joint' + ext) for ext in ['.stl', '.obj', '.3ds']]
+        # without a configuration file, the defaults are used
+        args = [png, '-c', os.path.join(self.tmpdir, 'none')]
+        for f in outputs:
+            args.extend(['-o', f])
+        self.assertEqual(export3d.main(args), 0)
+        self.assertEqual(len(threeDS.read_3ds(outputs[2])), 2)
+        self.assertEqual(len(export3d.read_obj(outputs[1])), 2)
+        self.assertRaises(ValueError, export3d.write_joint, 'joint.dxf', self.boards, self.bit,
+                          self.sp)
+
+    def test_cli_config(self):
+        # a joint designed with a setting that is not the default
+        factory = job_runner.Joint_Factory()
+        factory.configs[False] = config_file.Default_Config(False, min_finger_width='1/2')
+        (bit, boards, sp, config) = factory.make_joint({'es_centered': False})
+        png = self.save_png(bit, boards, sp, config)
+        filename = os.path.join(self.tmpdir, 'config.py')
+        c = config_file.Configuration()
+        c.filename = filename
+        c.write_config(vars(config))
+        self.assertEqual(config_file.user_config(False, filename).min_finger_width, '1/2')
+        # a file for the other unit system is not used
+        self.assertEqual(config_file.user_config(True, filename).min_finger_width,
+                         config_file.Default_Config(True).min_finger_width)
+        obj = os.path.join(self.tmpdir, 'joint.obj')
+        expected = [threeDS_test.as_lists(o) for o in threeDS.joint_objects(boards, bit, sp)]
+        for (args, same) in [(['-c', filename], True),
+                             (['-c', os.path.join(self.tmpdir, 'none')], False)]:
+            self.assertEqual(export3d.main([png, '-o', obj] + args), 0)
+            objects = [threeDS_test.as_lists(o) for o in export3d.read_obj(obj)]
+            self.assertEqual(objects == expected, same)
+
+
+if __name__ == '__main__':
+    unittest.main()
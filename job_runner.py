@@ -0,0 +1,224 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Creates and cuts the joints of manifest jobs (see batch.py), and reports
+their router passes and geometry.  Used by both batch.py and parallel.py.
+No Qt modules are imported.
+'''
+from __future__ import print_function
+from __future__ import division
+
+import os
+import json
+
+import config_file
+import router
+import spacing
+import utils
+
+BOARD_NAMES = ['top', 'bottom', 'double', 'double_double']
+
+
+class Joint_Factory(object):
+    '''
+    Creates the bit, boards, and spacing for manifest jobs.  Holds one
+    configuration per unit system, so that defaults (such as
+    min_finger_width) are in the job's units.
+    '''
+    def __init__(self):
+        self.configs = {}
+        self.transl = utils.Null_Translator()
+
+    def config(self, metric):
+        '''Returns the default configuration for the unit system'''
+        if metric not in self.configs:
+            self.configs[metric] = config_file.Default_Config(metric)
+        return self.configs[metric]
+
+    def make_joint(self, job):
+        '''
+        Returns (bit, boards, sp, config) for the job dictionary.  The cuts of
+        sp are set, but the boards are not yet cut.
+        '''
+        metric = job.get('metric', False)
+        config = self.config(metric)
+        units = utils.Units(config.english_separator, metric,
+                            job.get('num_increments', config.num_increments), self.transl)
+        bit_width = units.abstract_to_increments(job.get('bit_width', config.bit_width))
+        bit_depth = units.abstract_to_increments(job.get('bit_depth', config.bit_depth))
+        bit_angle = units.abstract_to_float(job.get('bit_angle', config.bit_angle))
+        bit_gentle = job.get('bit_gentle', config.bit_gentle)
+        bit = router.Router_Bit(units, bit_width, bit_depth, bit_angle, bit_gentle)
+        board_width = units.abstract_to_increments(job.get('board_width', config.board_width))
+        boards = []
+        for _ in range(4):
+            boards.append(router.Board(bit, width=board_width))
+        for (i, k) in [(2, 'double_thickness'), (3, 'double_double_thickness')]:
+            if k in job and boards[i - 1].active:
+                boards[i].set_height(bit, units.abstract_to_increments(job[k]))
+            else:
+                boards[i].set_active(False)
+
+        sp_type = job.get('spacing', 'equal').lower()
+        if sp_type == 'equal':
+            if not spacing.Equally_Spaced.is_board_width_ok(bit, boards, config):
+                raise spacing.Spacing_Exception(spacing.Equally_Spaced.msg)
+            sp = spacing.Equally_Spaced(bit, boards, config)
+            _set_param(sp, 'Spacing', job.get('es_spacing'))
+            _set_param(sp, 'Width', job.get('es_width'))
+            if 'es_centered' in job:
+                sp.params['Centered'].v = job['es_centered']
+        elif sp_type == 'variable':
+            if not spacing.Variable_Spaced.is_board_width_ok(bit, boards):
+                raise spacing.Spacing_Exception(spacing.Variable_Spaced.msg)
+            sp = spacing.Variable_Spaced(bit, boards, config)
+            if 'vs_inverted' in job:
+                sp.params['Inverted'].v = job['vs_inverted']
+            _set_param(sp, 'Fingers', job.get('vs_fingers'))
+            sp.calc_var_params()
+            _set_param(sp, 'Spacing', job.get('vs_spacing'))
+        else:
+            raise spacing.Spacing_Exception('Unknown spacing "%s"' % sp_type)
+        sp.set_cuts()
+        return (bit, boards, sp, config)
+
+
+def _set_param(sp, key, v):
+    '''Sets the spacing parameter key to v, if v is not None, checking its limits'''
+    if v is None:
+        return
+    p = sp.params[key]
+    if v < p.vMin or v > p.vMax:
+        raise spacing.Spacing_Exception('%s = %s is outside of its limits [%s, %s]' %
+                                        (key, v, p.vMin, p.vMax))
+    p.v = v
+
+
+def cuts_to_list(cuts):
+    '''Returns the cuts as a list of dictionaries, suitable for JSON'''
+    if cuts is None:
+        return None
+    return [{'xmin': float(c.xmin), 'xmax': float(c.xmax), 'passes': list(c.passes)}
+            for c in cuts]
+
+
+def joint_geometry(bit, boards):
+    '''
+    Returns a dictionary, suitable for JSON, of the cuts, router passes, and
+    perimeter of each active board.  The boards must have been cut.
+    '''
+    geom = {}
+    for name, b in zip(BOARD_NAMES, boards):
+        if not b.active:
+            continue
+        (x, y) = b.perimeter(bit)
+        geom[name] = {'width': b.width,
+                      'height': b.height,
+                      'top_cuts': cuts_to_list(b.top_cuts),
+                      'bottom_cuts': cuts_to_list(b.bottom_cuts),
+                      'perimeter': [[float(xi), float(yi)] for (xi, yi) in zip(x, y)]}
+    return geom
+
+
+def evaluate_job(job, factory):
+    '''
+    Creates and cuts the boards for the job dictionary.  Returns (bit, boards, sp).
+    '''
+    (bit, boards, sp, dummy_config) = factory.make_joint(job)
+    router.cut_boards(boards, bit, sp)
+    return (bit, boards, sp)
+
+
+def count_passes(boards):
+    '''Returns the number of router passes over all active boards'''
+    npasses = 0
+    for b in boards:
+        if b.active:
+            for cuts in [b.top_cuts, b.bottom_cuts]:
+                if cuts is not None:
+                    npasses += sum(len(c.passes) for c in cuts)
+    return npasses
+
+
+def write_job(job, bit, boards, sp, outdir):
+    '''
+    Writes the router pass table (NAME_table.txt) and geometry (NAME.json) of
+    the cut boards to outdir.
+    '''
+    name = job['name']
+    title = router.create_title(boards, bit, sp)
+    utils.print_table(os.path.join(outdir, name + '_table.txt'), boards, title)
+    geom = {'title': title,
+            'units': 'mm' if bit.units.metric else 'inches',
+            'increments_per_unit': bit.units.num_increments,
+            'boards': joint_geometry(bit, boards)}
+    with open(os.path.join(outdir, name + '.json'), 'w') as fd:
+        json.dump(geom, fd, indent=1)
+
+
+class Job_Result(object):
+    '''
+    Result of evaluating one job.
+
+    Attributes:
+
+    index: Index of the job in the manifest
+    name: Job name
+    npasses: Number of router passes over all boards, or None on error
+    geometry: Dictionary from joint_geometry(), if requested
+    error: None on success.  Otherwise, the exception message.
+    error_type: None on success.  Otherwise, the exception class name.
+    '''
+    def __init__(self, index, name):
+        self.index = index
+        self.name = name
+        self.npasses = None
+        self.geometry = None
+        self.error = None
+        self.error_type = None
+
+    def ok(self):
+        '''Returns True if the job succeeded'''
+        return self.error is None
+
+
+def run_job(index, job, factory, outdir=None, with_geometry=False):
+    '''
+    Computes the joint for the job dictionary, the index'th of the manifest.
+    If outdir is not None, the router pass table and geometry are written to
+    outdir.  Returns a Job_Result.  An error in the job is recorded in the
+    result, rather than raised, so that the other jobs still run.
+    '''
+    result = Job_Result(index, job.get('name'))
+    try:
+        (bit, boards, sp) = evaluate_job(job, factory)
+        result.npasses = count_passes(boards)
+        if with_geometry:
+            result.geometry = joint_geometry(bit, boards)
+        if outdir is not None:
+            write_job(job, bit, boards, sp, outdir)
+    except (router.Router_Exception, spacing.Spacing_Exception) as e:
+        result.error = e.msg
+        result.error_type = type(e).__name__
+    except Exception as e:  # report anything else per job, such as a bad value
+        result.error = str(e)
+        result.error_type = type(e).__name__
+    return result
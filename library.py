@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Catalog of the joints saved in PNG files, in an SQLite database, so that
+directories of saved joints may be searched without opening each file.
+
+Only the PNG text chunks and the joint header and spacing are read (see
+png_text and serialize.describe()), over a pool of worker processes.
+Re-indexing only reads files that are new, or whose modification time or
+size changed, and removes the files that no longer exist.
+
+All dimensions in the catalog are in mm, for both English and metric joints.
+Ranges are given as MIN:MAX, where either may be omitted, or as a single
+value.
+
+Usage:
+
+  python library.py [-d library.db] index DIRECTORY...
+  python library.py [-d library.db] find [--angle 14] [--board-width 150:200] ...
+'''
+from __future__ import print_function
+from __future__ import division
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import png_text
+import serialize
+import utils
+
+DEFAULT_DATABASE = 'pyrouterjig_library.db'
+
+# Version of the database schema.  Increment this when the schema or the
+# extracted values change, so that existing databases are rebuilt.
+SCHEMA_VERSION = 1
+
+# Spacing types, as stored in the catalog, by serialized type
+SPACINGS = {'Equa': 'equal', 'Vari': 'variable', 'Edit': 'edit'}
+
+# Tolerance, in mm, of the comparisons of dimensions, which are not exact
+# for English joints, or for searches in inches
+_TOLERANCE = 1e-6
+
+# Files are read in the calling process when there are fewer than this
+# many, since starting the workers costs more than reading them.
+_MIN_PARALLEL = 64
+
+_SCHEMA = '''
+CREATE TABLE joints (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    error TEXT,
+    version TEXT,
+    metric INTEGER,
+    bit_width REAL,
+    bit_depth REAL,
+    bit_angle REAL,
+    board_width REAL,
+    board_height REAL,
+    nboards INTEGER,
+    spacing TEXT,
+    params TEXT,
+    wood TEXT
+);
+CREATE INDEX joints_angle_width ON joints (bit_angle, board_width);
+CREATE INDEX joints_board_width ON joints (board_width);
+CREATE INDEX joints_bit_width ON joints (bit_width);
+CREATE INDEX joints_bit_depth ON joints (bit_depth);
+CREATE INDEX joints_spacing ON joints (spacing);
+CREATE INDEX joints_wood ON joints (wood);
+'''
+
+# Columns of the joints table that describe the joint
+COLUMNS = ['version', 'metric', 'bit_width', 'bit_depth', 'bit_angle', 'board_width',
+           'board_height', 'nboards', 'spacing', 'params', 'wood']
+
+
+def joint_row(d):
+    '''
+    Returns the values of COLUMNS for the joint described by d, as returned
+    by serialize.describe()
+    '''
+    mm = 1.0 / d['num_increments']
+    if not d['metric']:
+        mm *= 25.4
+    bit = d['bit']
+    top = d['boards'][0]
+    return (d['version'], int(d['metric']),
+            float(bit['width']) * mm, float(bit['depth']) * mm, float(bit['angle']),
+            float(top['width']) * mm, float(top['height']) * mm,
+            sum(1 for b in d['boards'] if b['active']),
+            SPACINGS.get(d['spacing'], d['spacing']),
+            json.dumps(d['params'], sort_keys=True),
+            None if top['wood'] is None else str(top['wood']))
+
+
+def read_file(args):
+    '''
+    Returns (path, mtime, size, error, values of COLUMNS) for the file
+    described by args = (path, mtime, size).  Files without a joint have
+    None for each column, and error is set if the file could not be read.
+    '''
+    (path, mtime, size) = args
+    row = (None,) * len(COLUMNS)
+    error = None
+    try:
+        (s, newformat) = png_text.read_design(path)
+        if s:
+            row = joint_row(serialize.describe(s, newformat))
+    except (png_text.PNG_Exception, OSError) as e:
+        error = str(e)
+    except Exception as e:  # a corrupt joint should not stop the indexing
+        error = '%s: %s' % (type(e).__name__, e)
+    return (path, mtime, size, error) + row
+
+
+def list_files(directory):
+    '''Returns a list of (path, mtime, size) of the PNG files under directory'''
+    r = []
+    for (root, dummy_dirs, files) in os.walk(directory):
+        for name in files:
+            if name.lower().endswith('.png'):
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                r.append((path, st.st_mtime, st.st_size))
+    return r
+
+
+def parse_range(s):
+    '''Returns (min, max) of the range string "MIN:MAX" or "VALUE", or None if s is None'''
+    if s is None:
+        return None
+    if ':' not in s:
+        return (float(s), float(s))
+    (lo, hi) = s.split(':', 1)
+    return (float(lo) if lo.strip() else None, float(hi) if hi.strip() else None)
+
+
+class Library(object):
+    '''
+    SQLite catalog of saved joints.
+
+    filename: The database file, which is created if it does not exist
+    '''
+    def __init__(self, filename=DEFAULT_DATABASE):
+        self.filename = filename
+        self.db = sqlite3.connect(filename)
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # rebuild the catalog, which is only a cache of the files
+            self.db.execute('DROP TABLE IF EXISTS joints')
+            self.db.executescript(_SCHEMA)
+            self.db.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+            self.db.commit()
+
+    def close(self):
+        '''Closes the database'''
+        self.db.close()
+
+    def update(self, directories, workers=None):
+        '''
+        Indexes the PNG files under each of the list of directories.  Only
+        files that are new, or whose modification time or size changed, are
+        read.  Files under the directories that no longer exist are removed.
+
+        workers: Number of processes.  Default is the number of CPUs.
+
+        Returns (read, unchanged, removed) numbers of files.
+        '''
+        todo = []
+        unchanged = 0
+        removed = []
+        for directory in directories:
+            directory = os.path.abspath(directory)
+            files = list_files(directory)
+            stored = dict((path, (mtime, size)) for (path, mtime, size) in self.db.execute(
+                'SELECT path, mtime, size FROM joints WHERE path >= ? AND path < ?',
+                (directory + os.sep, directory + chr(ord(os.sep) + 1))))
+            for f in files:
+                if stored.pop(f[0], None) == f[1:]:
+                    unchanged += 1
+                else:
+                    todo.append(f)
+            removed.extend(stored.keys())
+
+        if len(todo) < _MIN_PARALLEL or workers == 1:
+            rows = [read_file(f) for f in todo]
+        else:
+            if workers is None:
+                workers = os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rows = list(pool.map(read_file, todo,
+                                     chunksize=utils.default_chunksize(len(todo), workers)))
+
+        with self.db:
+            self.db.executemany('DELETE FROM joints WHERE path = ?', [(p,) for p in removed])
+            self.db.executemany('INSERT OR REPLACE INTO joints VALUES (%s)' %
+                                ','.join(['?'] * (4 + len(COLUMNS))), rows)
+        return (len(todo), unchanged, len(removed))
+
+    def find(self, bit_angle=None, bit_width=None, bit_depth=None, board_width=None,
+             spacing=None, wood=None, metric=None):
+        '''
+        Returns a list of dictionaries, of the path and COLUMNS, of the
+        joints that match all of the given arguments.  The bit and board
+        dimensions are (min, max) ranges, in mm, or None for no limit, and
+        match within _TOLERANCE.  The bit_angle range is in degrees.
+        '''
+        where = ['spacing IS NOT NULL']
+        values = []
+        for (column, r) in [('bit_angle', bit_angle), ('bit_width', bit_width),
+                            ('bit_depth', bit_depth), ('board_width', board_width)]:
+            if r is None:
+                continue
+            (lo, hi) = r
+            if column == 'bit_angle' and lo is not None and lo == hi:
+                # angles are stored exactly, and so that the (bit_angle,
+                # board_width) index is used
+                where.append('%s = ?' % column)
+                values.append(lo)
+                continue
+            tolerance = 0 if column == 'bit_angle' else _TOLERANCE
+            if lo is not None:
+                where.append('%s >= ?' % column)
+                values.append(lo - tolerance)
+            if hi is not None:
+                where.append('%s <= ?' % column)
+                values.append(hi + tolerance)
+        for (column, v) in [('spacing', spacing), ('wood', wood), ('metric', metric)]:
+            if v is not None:
+                where.append('%s = ?' % column)
+                values.append(int(v) if column == 'metric' else v)
+        columns = ['path'] + COLUMNS
+        sql = 'SELECT %s FROM joints WHERE %s ORDER BY path' % (', '.join(columns),
+                                                                  ' AND '.join(where))
+        return [dict(zip(columns, row)) for row in self.db.execute(sql, values)]
+
+    def errors(self):
+        '''Returns a list of (path, error) of the files that could not be read'''
+        return list(self.db.execute('SELECT path, error FROM joints WHERE error IS NOT NULL'
+                                    ' ORDER BY path'))
+
+
+def main(argv=None):
+    '''Indexes or searches the library, as given on the command line'''
+    parser = argparse.ArgumentParser(description='Catalog of pyRouterJig joints saved in PNG files.')
+    parser.add_argument('-d', '--database', default=DEFAULT_DATABASE,
+                        help='SQLite database (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command')
+    index = commands.add_parser('index', help='index the PNG files under directories')
+    index.add_argument('directory', nargs='+')
+    index.add_argument('-j', '--jobs', type=int, default=0,
+                       help='number of worker processes (0 for one per CPU, default: 0)')
+    find = commands.add_parser('find', help='list the joints that match all of the options')
+    find.add_argument('--angle', help='bit angle range [degrees]')
+    find.add_argument('--bit-width', help='bit width range [mm]')
+    find.add_argument('--bit-depth', help='bit depth range [mm]')
+    find.add_argument('--board-width', help='board width range [mm]')
+    find.add_argument('--spacing', choices=sorted(SPACINGS.values()))
+    find.add_argument('--wood')
+    find.add_argument('--inches', action='store_true',
+                      help='the bit and board ranges are in inches, rather than mm')
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.error('a command is required')
+
+    library = Library(args.database)
+    if args.command == 'index':
+        t0 = time.time()
+        (nread, unchanged, removed) = library.update(args.directory, args.jobs or None)
+        print('%d files read, %d unchanged, %d removed in %.3f s' %
+              (nread, unchanged, removed, time.time() - t0))
+        for (path, error) in library.errors():
+            print('%s: %s' % (path, error), file=sys.stderr)
+    else:
+        scale = 25.4 if args.inches else 1.0
+        ranges = {}
+        for k in ['bit_width', 'bit_depth', 'board_width']:
+            r = parse_range(getattr(args, k))
+            if r is not None:
+                r = tuple(None if x is None else x * scale for x in r)
+            ranges[k] = r
+        t0 = time.time()
+        joints = library.find(parse_range(args.angle), spacing=args.spacing, wood=args.wood,
+                              **ranges)
+        dt = time.time() - t0
+        for j in joints:
+            print('%s\t%g deg, bit %.1f x %.1f mm, board %.1f mm, %s\t%s' %
+                  (j['path'], j['bit_angle'], j['bit_width'], j['bit_depth'],
+                   j['board_width'], j['spacing'], j['params']))
+        print('%d joints in %.1f ms' % (len(joints), dt * 1000))
+    library.close()
+
+
+if __name__ == '__main__':
+    main()
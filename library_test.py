@@ -0,0 +1,141 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for library.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import utils
+import serialize
+import job_runner
+import png_text
+import png_text_test
+import library
+
+
+class Library_Test(unittest.TestCase):
+    '''
+    Tests indexing and searching directories of saved joints
+    '''
+    jobs = {'a.png': {'bit_angle': 14, 'metric': True, 'board_width': 180, 'bit_width': 12},
+            'b.png': {'bit_angle': 14, 'metric': True, 'board_width': 250, 'bit_width': 12},
+            'c.png': {'bit_angle': 14, 'board_width': '7', 'spacing': 'variable'},
+            'd.png': {'bit_angle': 0, 'metric': True, 'board_width': 180, 'bit_width': 12}}
+
+    def setUp(self):
+        utils.init_decimal_context()
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmpdir, 'library.db')
+        self.dir = os.path.join(self.tmpdir, 'joints')
+        os.mkdir(self.dir)
+        self.image = png_text_test.png_bytes([], (8, 8))
+        factory = job_runner.Joint_Factory()
+        for (name, job) in self.jobs.items():
+            (bit, boards, sp, config) = factory.make_joint(job)
+            if name == 'd.png':
+                s = serialize.serialize_legacy(bit, boards, sp, config)
+            else:
+                s = serialize.serialize(bit, boards, sp, config)
+            self.write(name, s)
+        self.write('no_joint.png', None)
+        with open(os.path.join(self.dir, 'corrupt.png'), 'wb') as fd:
+            fd.write(b'not a png')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, s):
+        '''Writes the PNG file name, with the serialized joint s'''
+        text = []
+        if s is not None:
+            text = [(png_text.DESIGN_KEY, s), (png_text.VERSION_KEY, utils.VERSION)]
+        with open(os.path.join(self.dir, name), 'wb') as fd:
+            fd.write(png_text.insert_text(self.image, text))
+
+    def names(self, joints):
+        return sorted(os.path.basename(j['path']) for j in joints)
+
+    def test_find(self):
+        lib = library.Library(self.db)
+        self.assertEqual(lib.update([self.dir]), (6, 0, 0))
+        self.assertEqual(self.names(lib.find()), ['a.png', 'b.png', 'c.png', 'd.png'])
+        # 14 degree dovetails on boards 150 to 200 mm; c.png is 7 inches
+        self.assertEqual(self.names(lib.find((14, 14), board_width=(150, 200))),
+                         ['a.png', 'c.png'])
+        self.assertEqual(self.names(lib.find(board_width=(None, 170))), [])
+        self.assertEqual(self.names(lib.find(spacing='variable')), ['c.png'])
+        [d] = lib.find((0, 0))
+        self.assertEqual((d['bit_width'], d['board_width'], d['spacing']), (12, 180, 'equal'))
+        self.assertEqual([os.path.basename(p) for (p, dummy_e) in lib.errors()], ['corrupt.png'])
+        lib.close()
+
+    def test_find_english(self):
+        lib = library.Library(self.db)
+        lib.update([self.dir])
+        # c.png is 7 inches, stored as 177.79999999999998 mm
+        for width in [177.8, 7 * 25.4]:
+            self.assertEqual(self.names(lib.find(board_width=(width, width))), ['c.png'])
+        self.assertEqual(self.names(lib.find((14, 14), board_width=(177.8, None))),
+                         ['a.png', 'b.png', 'c.png'])
+        lib.close()
+        # in inches, from the command line
+        for inches in ['7', '6.9:7']:
+            out = io.StringIO()
+            with redirect_stdout(out):
+                library.main(['-d', self.db, 'find', '--inches', '--board-width', inches])
+            self.assertTrue(os.path.join(self.dir, 'c.png') in out.getvalue())
+            self.assertTrue('1 joints' in out.getvalue())
+
+    def test_update(self):
+        lib = library.Library(self.db)
+        lib.update([self.dir])
+        lib.close()
+        lib = library.Library(self.db)
+        self.assertEqual(lib.update([self.dir]), (0, 6, 0))
+        # a changed file is read again, and a removed file is removed
+        (bit, boards, sp, config) = job_runner.Joint_Factory().make_joint({'bit_angle': 7})
+        self.write('a.png', serialize.serialize(bit, boards, sp, config))
+        os.remove(os.path.join(self.dir, 'b.png'))
+        self.assertEqual(lib.update([self.dir]), (1, 4, 1))
+        self.assertEqual(self.names(lib.find((7, 7))), ['a.png'])
+        self.assertEqual(self.names(lib.find()), ['a.png', 'c.png', 'd.png'])
+        lib.close()
+
+    def test_parallel(self):
+        # enough files that they are read by the worker processes
+        for i in range(library._MIN_PARALLEL):
+            shutil.copy(os.path.join(self.dir, 'a.png'), os.path.join(self.dir, 'e%d.png' % i))
+        lib = library.Library(self.db)
+        self.assertEqual(lib.update([self.dir], 2), (6 + library._MIN_PARALLEL, 0, 0))
+        self.assertEqual(len(lib.find((14, 14), board_width=(150, 200))),
+                         library._MIN_PARALLEL + 2)
+        lib.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
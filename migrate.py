@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Migrates the joints saved in PNG files to the current serialization format.
+
+Each PNG file under the given directories that holds a joint in a legacy
+(pickle) format is rewritten in place with the joint in the current format.
+Only the text chunks are rewritten; the image data is copied as is.  Before
+a file is replaced, the new joint is verified by unserializing it and
+comparing it with the legacy joint.
+
+The status of each file is appended to a journal, along with its size and
+modification time, so that an interrupted migration may be resumed, skipping
+the files already done.  A file that has changed since it was journaled is
+migrated again.
+
+Usage:
+
+  python migrate.py [-j JOBS] [--journal FILE] [--dry-run] DIRECTORY...
+'''
+from __future__ import print_function
+
+import os
+import sys
+import time
+import argparse
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+import config_file
+import png_text
+import serialize
+import utils
+
+DEFAULT_JOURNAL = 'pyrouterjig_migrate.journal'
+
+# Statuses of a file.  Files with a status in DONE are skipped when resuming.
+MIGRATED = 'migrated'
+CURRENT = 'current'
+NO_JOINT = 'no_joint'
+FAILED = 'failed'
+DONE = [MIGRATED, CURRENT, NO_JOINT]
+
+# Per-process configurations, by metric, created on first use in each worker
+_configs = {}
+
+
+class Migrate_Exception(Exception):
+    '''
+    Exception handler for migration
+    '''
+    def __init__(self, msg):
+        Exception.__init__(self, msg)
+        self.msg = msg
+
+    def __str__(self):
+        return self.msg
+
+
+def _joint(r):
+    '''Returns a comparable summary of the unserialize() result r'''
+    (bit, boards, sp, sp_type) = r
+    return ((bit.width, bit.depth, bit.angle, bit.units.metric, bit.units.num_increments),
+            [(b.width, b.height, b.wood, b.active, b.dheight) for b in boards],
+            sp_type, [(c.xmin, c.xmax) for c in sp.cuts])
+
+
+def migrate_data(data, config, transl):
+    '''
+    Returns the PNG bytes data with its joint in the current format, or None
+    if data has no joint or its joint is already in the current format.
+    Raises Migrate_Exception if the migrated joint differs from the original.
+    '''
+    (s, newformat) = png_text.read_design(BytesIO(data))
+    if not s or not serialize.is_legacy(s):
+        return None
+    old = serialize.unserialize(s, config, newformat, transl)
+    new_s = serialize.serialize(old[0], old[1], old[2], config)
+    new_data = png_text.replace_text(data, [(png_text.DESIGN_KEY, new_s),
+                                            (png_text.VERSION_KEY, utils.VERSION)])
+    # verify, from the bytes that will be written
+    (t, newformat) = png_text.read_design(BytesIO(new_data))
+    if t != new_s or _joint(serialize.unserialize(t, config, newformat, transl)) != _joint(old):
+        raise Migrate_Exception('migrated joint differs from the original')
+    return new_data
+
+
+def _config(metric):
+    '''
+    Returns the user's configuration for metric, or the default if the
+    user has none for metric
+    '''
+    if metric not in _configs:
+        if not _configs:
+            utils.init_decimal_context()
+        _configs[metric] = config_file.user_config(metric)
+    return _configs[metric]
+
+
+def stamp(filename):
+    '''Returns the (size, modification time in ns) of filename'''
+    st = os.stat(filename)
+    return (st.st_size, st.st_mtime_ns)
+
+
+def migrate_file(filename, dry_run=False):
+    '''
+    Migrates the joint in the PNG file filename.  Returns (filename,
+    status, stamp, message), where status is one of MIGRATED, CURRENT,
+    NO_JOINT, or FAILED, and stamp is the stamp() of the file when done, or
+    None if it cannot be read.
+    '''
+    try:
+        with open(filename, 'rb') as fd:
+            data = fd.read()
+        (s, newformat) = png_text.read_design(BytesIO(data))
+        if not s:
+            return (filename, NO_JOINT, stamp(filename), '')
+        config = _config(serialize.describe(s, newformat)['metric'])
+        new_data = migrate_data(data, config, utils.Null_Translator())
+        if new_data is None:
+            return (filename, CURRENT, stamp(filename), '')
+        if not dry_run:
+            # replace the file only once the new one is completely written
+            tmp = filename + '.migrate'
+            with open(tmp, 'wb') as fd:
+                fd.write(new_data)
+            st = os.stat(filename)
+            os.chmod(tmp, st.st_mode)
+            os.replace(tmp, filename)
+        return (filename, MIGRATED, stamp(filename), '')
+    except Exception as e:  # report anything per file, rather than abort the pool
+        try:
+            st = stamp(filename)
+        except OSError:
+            st = None
+        return (filename, FAILED, st, '%s: %s' % (type(e).__name__, e))
+
+
+def read_journal(journal):
+    '''
+    Returns a dictionary of filename to (status, stamp) for the last entry
+    of each file in the journal.  The stamp is None if it is not known.
+    '''
+    status = {}
+    if os.path.exists(journal):
+        with open(journal, 'r') as fd:
+            for line in fd:
+                fields = line.rstrip('\n').split('\t', 4)
+                if len(fields) == 5 and fields[2] and fields[3]:
+                    status[fields[1]] = (fields[0], (int(fields[2]), int(fields[3])))
+                elif len(fields) >= 2:
+                    status[fields[1]] = (fields[0], None)
+    return status
+
+
+def _is_done(entry, filename):
+    '''Returns True if the journal entry of filename shows it needs no migration'''
+    if entry is None or entry[0] not in DONE:
+        return False
+    try:
+        return entry[1] == stamp(filename)
+    except OSError:
+        return False
+
+
+def png_files(directories):
+    '''Returns a sorted list of the absolute paths of the PNG files under directories'''
+    r = []
+    for directory in directories:
+        for (root, dummy_dirs, files) in os.walk(os.path.abspath(directory)):
+            r.extend(os.path.join(root, f) for f in files if f.lower().endswith('.png'))
+    return sorted(r)
+
+
+def migrate(directories, journal=DEFAULT_JOURNAL, workers=None, dry_run=False):
+    '''
+    Migrates the PNG files under directories, skipping files whose status
+    in the journal is in DONE and that are unchanged since.  Appends the
+    status of each file to the journal, unless dry_run.  Returns a
+    dictionary of status to the number of files, plus 'resumed', the number
+    of files skipped.
+    '''
+    journaled = read_journal(journal)
+    files = png_files(directories)
+    todo = [f for f in files if not _is_done(journaled.get(f), f)]
+    counts = dict((k, 0) for k in [MIGRATED, CURRENT, NO_JOINT, FAILED])
+    counts['resumed'] = len(files) - len(todo)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    dry = [dry_run] * len(todo)
+    if workers == 1:
+        results = map(migrate_file, todo, dry)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(migrate_file, todo, dry,
+                           chunksize=utils.default_chunksize(len(todo), workers))
+    fd = None if dry_run else open(journal, 'a')
+    try:
+        for (filename, status, st, msg) in results:
+            counts[status] += 1
+            if status == FAILED:
+                print('%s: %s' % (filename, msg), file=sys.stderr)
+            if fd is not None:
+                (size, mtime) = ('', '') if st is None else st
+                fd.write('%s\t%s\t%s\t%s\t%s\n' % (status, filename, size, mtime, msg))
+                fd.flush()
+    finally:
+        if fd is not None:
+            fd.close()
+        if pool is not None:
+            pool.shutdown()
+    return counts
+
+
+def main(argv=None):
+    '''
+    Migrates the directories given on the command line.  Returns the number
+    of files that failed.
+    '''
+    parser = argparse.ArgumentParser(description='Migrates pyRouterJig joints saved in PNG files'
+                                     ' to the current format.')
+    parser.add_argument('directory', nargs='+')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='number of worker processes (0 for one per CPU, default: 0)')
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL,
+                        help='progress journal, for resuming (default: %(default)s)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='verify the migration, without writing any files')
+    args = parser.parse_args(argv)
+    t0 = time.time()
+    counts = migrate(args.directory, args.journal, args.jobs or None, args.dry_run)
+    print('%d migrated, %d current, %d without joints, %d failed, %d skipped, in %.3f s' %
+          (counts[MIGRATED], counts[CURRENT], counts[NO_JOINT], counts[FAILED],
+           counts['resumed'], time.time() - t0))
+    return counts[FAILED]
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,142 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for migrate.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+import utils
+import serialize
+import job_runner
+import png_text
+import png_text_test
+import serialize_test
+import migrate
+
+
+class Migrate_Test(unittest.TestCase):
+    '''
+    Tests migrating directories of legacy joints
+    '''
+    def setUp(self):
+        utils.init_decimal_context()
+        self.tmpdir = tempfile.mkdtemp()
+        self.dir = os.path.join(self.tmpdir, 'joints')
+        os.makedirs(os.path.join(self.dir, 'sub'))
+        self.journal = os.path.join(self.tmpdir, 'journal')
+        self.image = png_text_test.png_bytes([], (16, 16))
+        factory = job_runner.Joint_Factory()
+        self.joints = {}
+        jobs = {'qp.png': {'double_thickness': '1/8'},
+                os.path.join('sub', 'raw.png'): {'spacing': 'variable', 'bit_angle': 7},
+                'mm.png': {'metric': True, 'board_width': 140, 'bit_width': 10,
+                           'spacing': 'equal'},
+                'current.png': {'metric': True, 'board_width': 150, 'bit_width': 12}}
+        for (name, job) in jobs.items():
+            (bit, boards, sp, config) = factory.make_joint(job)
+            self.joints[name] = serialize.serialize(bit, boards, sp, config)
+            if name == 'current.png':
+                text = [(png_text.DESIGN_KEY, self.joints[name]),
+                        (png_text.VERSION_KEY, utils.VERSION)]
+            else:
+                s = serialize.serialize_legacy(bit, boards, sp, config)
+                if name in ['qp.png', 'mm.png']:
+                    text = [(png_text.DESIGN_KEY, s), (png_text.VERSION_KEY, '0.9.0')]
+                else:
+                    # before version 0.9, there was no version key
+                    text = [(png_text.DESIGN_KEY, serialize_test.protocol0(s))]
+            self.write(name, png_text.insert_text(self.image, text))
+        self.legacy = dict((name, self.read(name)) for name in self.joints if name != 'current.png')
+        self.write('no_joint.png', self.image)
+        self.write('corrupt.png', b'not a png')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, data):
+        with open(os.path.join(self.dir, name), 'wb') as fd:
+            fd.write(data)
+
+    def read(self, name):
+        with open(os.path.join(self.dir, name), 'rb') as fd:
+            return fd.read()
+
+    def test_migrate(self):
+        counts = migrate.migrate([self.dir], self.journal, 1)
+        self.assertEqual([counts[k] for k in [migrate.MIGRATED, migrate.CURRENT,
+                                              migrate.NO_JOINT, migrate.FAILED]], [3, 1, 1, 1])
+        for name in ['qp.png', 'mm.png', os.path.join('sub', 'raw.png')]:
+            data = self.read(name)
+            self.assertEqual(png_text.read_design(BytesIO(data)), (self.joints[name], True))
+            self.assertEqual(png_text.read_text(BytesIO(data))[png_text.VERSION_KEY], utils.VERSION)
+            # the image is unchanged
+            self.assertEqual(Image.open(BytesIO(data)).tobytes(),
+                             Image.open(BytesIO(self.image)).tobytes())
+        # resuming only retries the failed file
+        counts = migrate.migrate([self.dir], self.journal, 1)
+        self.assertEqual((counts[migrate.MIGRATED], counts[migrate.FAILED]), (0, 1))
+        self.assertEqual(sum(counts[k] for k in migrate.DONE), 0)
+        self.assertEqual(counts['resumed'], 5)
+        # a file replaced since it was journaled is migrated again
+        self.write('qp.png', self.legacy['qp.png'])
+        counts = migrate.migrate([self.dir], self.journal, 1)
+        self.assertEqual((counts[migrate.MIGRATED], counts['resumed']), (1, 4))
+        self.assertEqual(png_text.read_design(BytesIO(self.read('qp.png'))),
+                         (self.joints['qp.png'], True))
+
+    def test_metric(self):
+        data = self.legacy['mm.png']
+        (s, newformat) = png_text.read_design(BytesIO(data))
+        self.assertTrue(serialize.describe(s, newformat)['metric'])
+        (dummy_filename, status, st, msg) = migrate.migrate_file(os.path.join(self.dir, 'mm.png'))
+        self.assertEqual((status, msg), (migrate.MIGRATED, ''))
+        self.assertEqual(st, migrate.stamp(os.path.join(self.dir, 'mm.png')))
+        (s, newformat) = png_text.read_design(BytesIO(self.read('mm.png')))
+        self.assertEqual(s, self.joints['mm.png'])
+        config = migrate._config(True)
+        self.assertTrue(config.metric)
+        (bit, dummy_boards, dummy_sp, sp_type) = serialize.unserialize(s, config, newformat,
+                                                                   utils.Null_Translator())
+        self.assertEqual((bit.units.metric, bit.width, sp_type), (True, 10, 'Equa'))
+
+    def test_dry_run(self):
+        before = self.read('qp.png')
+        counts = migrate.migrate([self.dir], self.journal, 1, dry_run=True)
+        self.assertEqual(counts[migrate.MIGRATED], 3)
+        self.assertEqual(self.read('qp.png'), before)
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_parallel(self):
+        counts = migrate.migrate([self.dir], self.journal, 2)
+        self.assertEqual((counts[migrate.MIGRATED], counts[migrate.FAILED]), (3, 1))
+        self.assertEqual(len(migrate.read_journal(self.journal)), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Evaluates manifest jobs (see batch.py) in parallel over a process pool.
+No Qt modules are imported.
+'''
+from __future__ import print_function
+from __future__ import division
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import router
+import utils
+import job_runner
+
+# Per-process factory, created on first use in each worker
+_factory = None
+
+
+def _init_worker(engine):
+    '''Initializes each worker process'''
+    utils.init_decimal_context()
+    router.set_numeric_engine(engine)
+
+
+def _run(args):
+    '''Evaluates one job in a worker.  Returns a job_runner.Job_Result.'''
+    global _factory
+    (index, job, outdir, with_geometry) = args
+    if _factory is None:
+        _factory = job_runner.Joint_Factory()
+    return job_runner.run_job(index, job, _factory, outdir, with_geometry)
+
+
+def evaluate(jobs, outdir=None, workers=None, chunksize=None, with_geometry=False):
+    '''
+    Evaluates the list of job dictionaries over a pool of workers processes.
+
+    jobs: List of job dictionaries, as returned by batch.read_manifest()
+    outdir: If not None, each worker writes its pass table and geometry here
+    workers: Number of processes.  Default is the number of CPUs.
+    chunksize: Number of jobs sent to a worker at once.  Default is
+               utils.default_chunksize().
+    with_geometry: If True, fill in job_runner.Job_Result.geometry
+
+    The workers use the current router numeric engine.
+
+    Returns a list of job_runner.Job_Result, in the same order as jobs.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = utils.default_chunksize(len(jobs), workers)
+    args = [(i, job, outdir, with_geometry) for (i, job) in enumerate(jobs)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(router.get_numeric_engine(),)) as pool:
+        return list(pool.map(_run, args, chunksize=chunksize))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Reads and writes the text metadata of PNG files, such as the joint saved by
+pyRouterJig, without decoding or encoding the image.  Only the chunk headers
+are read, up to the first image data chunk, and the other chunks are skipped
+with seek.  As with PIL's Image.open(), text chunks after the image data are
+not read, so text is written before the image data.
+
+Usage, to list the designs in directories of PNG files:
+
+  python png_text.py DIRECTORY...
+'''
+from __future__ import print_function
+
+import os
+import sys
+import zlib
+import struct
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# The text keys of a joint saved by pyRouterJig.  DESIGN_KEY is the
+# serialized joint.  VERSION_KEY is the code version, which marks the
+# serialization format used since version 0.9.
+DESIGN_KEY = 'pyRouterJig'
+VERSION_KEY = 'pyRouterJig_v'
+
+_TEXT_TYPES = (b'tEXt', b'zTXt', b'iTXt')
+
+
+class PNG_Exception(Exception):
+    '''
+    Exception handler for PNG files
+    '''
+    def __init__(self, msg):
+        Exception.__init__(self, msg)
+        self.msg = msg
+
+    def __str__(self):
+        return self.msg
+
+
+def _decode(ctype, data):
+    '''Returns (key, text) of the text chunk of type ctype with the given data'''
+    (key, data) = data.split(b'\0', 1)
+    key = key.decode('latin-1')
+    if ctype == b'tEXt':
+        return (key, data.decode('latin-1'))
+    if ctype == b'zTXt':
+        # data[0] is the compression method, which must be zlib
+        return (key, zlib.decompress(data[1:]).decode('latin-1'))
+    # iTXt: compression flag and method, then language and translated key
+    compressed = data[0:1] == b'\1'
+    (dummy_language, dummy_tkey, data) = data[2:].split(b'\0', 2)
+    if compressed:
+        data = zlib.decompress(data)
+    return (key, data.decode('utf-8'))
+
+
+def read_text(f, keys=None):
+    '''
+    Returns a dictionary of the text chunks of the PNG file f, up to the
+    first image data chunk.
+
+    f: Filename, or a binary file object positioned at the start of the PNG
+    keys: If not None, a list of the keys to return
+
+    Raises PNG_Exception if f is not a PNG file, or a text chunk is corrupt.
+    '''
+    if not hasattr(f, 'read'):
+        with open(f, 'rb') as fd:
+            return read_text(fd, keys)
+    if f.read(8) != PNG_SIGNATURE:
+        raise PNG_Exception('Not a PNG file')
+    text = {}
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        (length, ctype) = struct.unpack('>I4s', header)
+        if ctype in (b'IDAT', b'IEND'):
+            break
+        if ctype not in _TEXT_TYPES:
+            f.seek(length + 4, os.SEEK_CUR)
+            continue
+        data = f.read(length)
+        crc = f.read(4)
+        if len(crc) < 4 or struct.unpack('>I', crc)[0] != zlib.crc32(ctype + data) & 0xffffffff:
+            raise PNG_Exception('Corrupt %s chunk' % ctype.decode('ascii'))
+        try:
+            (key, value) = _decode(ctype, data)
+        except (ValueError, zlib.error):
+            raise PNG_Exception('Unable to decode %s chunk' % ctype.decode('ascii'))
+        if keys is None or key in keys:
+            text[key] = value
+    return text
+
+
+def _chunk(ctype, data):
+    '''Returns the PNG chunk of type ctype with the given data'''
+    return struct.pack('>I', len(data)) + ctype + data + \
+        struct.pack('>I', zlib.crc32(ctype + data) & 0xffffffff)
+
+
+def text_chunk(key, value, compress=False):
+    '''
+    Returns a tEXt chunk, or a zTXt chunk if compress is True, for the key
+    and value, which must be Latin-1 strings.
+    '''
+    key = key.encode('latin-1')
+    if not 0 < len(key) < 80:
+        raise PNG_Exception('PNG text keys must be 1 to 79 characters')
+    value = value.encode('latin-1')
+    if compress:
+        return _chunk(b'zTXt', key + b'\0\0' + zlib.compress(value))
+    return _chunk(b'tEXt', key + b'\0' + value)
+
+
+def insert_text(data, text, compress=False):
+    '''
+    Returns the PNG bytes data, with text chunks for each (key, value) in
+    the list text inserted before the first image data chunk.  The image
+    data is copied as is.
+    '''
+    if data[0:8] != PNG_SIGNATURE:
+        raise PNG_Exception('Not a PNG file')
+    i = 8
+    while i + 8 <= len(data):
+        (length, ctype) = struct.unpack('>I4s', data[i:i + 8])
+        if ctype in (b'IDAT', b'IEND'):
+            break
+        i += length + 12
+    else:
+        raise PNG_Exception('PNG file has no image data')
+    chunks = b''.join(text_chunk(key, value, compress) for (key, value) in text)
+    return data[:i] + chunks + data[i:]
+
+
+def replace_text(data, text, compress=False):
+    '''
+    Returns the PNG bytes data, with the text chunks of the keys in the list
+    of (key, value) text removed, wherever they are, and the text inserted
+    before the first image data chunk.  The other chunks are copied as is.
+    '''
+    if data[0:8] != PNG_SIGNATURE:
+        raise PNG_Exception('Not a PNG file')
+    keys = set(key.encode('latin-1') for (key, dummy_value) in text)
+    chunks = [data[0:8]]
+    i = 8
+    while i + 8 <= len(data):
+        (length, ctype) = struct.unpack('>I4s', data[i:i + 8])
+        end = i + length + 12
+        if ctype not in _TEXT_TYPES or data[i + 8:end - 4].split(b'\0', 1)[0] not in keys:
+            chunks.append(data[i:end])
+        i = end
+    return insert_text(b''.join(chunks), text, compress)
+
+
+def read_design(f):
+    '''
+    Returns (s, newformat) for the pyRouterJig joint saved in the PNG file f,
+    where s is the serialized joint, or None if there is none, and newformat
+    is the argument for serialize.unserialize().
+    '''
+    text = read_text(f, [DESIGN_KEY, VERSION_KEY])
+    return (text.get(DESIGN_KEY), VERSION_KEY in text)
+
+
+def scan(directory):
+    '''
+    Generator over the PNG files under directory that contain a
+    pyRouterJig joint.  Yields (filename, text), where text is the
+    dictionary returned by read_text().  Files that are not valid PNG files
+    are skipped.
+    '''
+    for (root, dummy_dirs, files) in os.walk(directory):
+        for name in sorted(files):
+            if not name.lower().endswith('.png'):
+                continue
+            filename = os.path.join(root, name)
+            try:
+                text = read_text(filename, [DESIGN_KEY, VERSION_KEY])
+            except (PNG_Exception, OSError):
+                continue
+            if DESIGN_KEY in text:
+                yield (filename, text)
+
+
+def main(argv=None):
+    '''Lists the designs in the directories given on the command line'''
+    if argv is None:
+        argv = sys.argv[1:]
+    n = 0
+    for directory in argv:
+        for (filename, text) in scan(directory):
+            print('%s\t%s' % (text.get(VERSION_KEY, 'legacy'), filename))
+            n += 1
+    print('%d designs' % n)
+
+
+if __name__ == '__main__':
+    main()
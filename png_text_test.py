@@ -0,0 +1,147 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for png_text.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+
+from PIL import Image
+from PIL import PngImagePlugin
+
+import utils
+import serialize
+import job_runner
+import png_text
+
+
+class Counting_File(object):
+    '''Binary file that counts the bytes read'''
+    def __init__(self, data):
+        self.fd = BytesIO(data)
+        self.nread = 0
+
+    def read(self, n):
+        s = self.fd.read(n)
+        self.nread += len(s)
+        return s
+
+    def seek(self, offset, whence):
+        return self.fd.seek(offset, whence)
+
+
+def png_bytes(text, size=(400, 300)):
+    '''Returns a noisy PNG image, with the (key, value, type) text chunks'''
+    image = Image.effect_noise(size, 64).convert('RGB')
+    info = PngImagePlugin.PngInfo()
+    for (key, value, ctype) in text:
+        if ctype == 'zTXt':
+            info.add_text(key, value, zip=True)
+        elif ctype == 'iTXt':
+            info.add_itxt(key, value, zip=True)
+        else:
+            info.add_text(key, value)
+    out = BytesIO()
+    image.save(out, 'png', pnginfo=info)
+    return out.getvalue()
+
+
+class PNG_Text_Test(unittest.TestCase):
+    '''
+    Tests png_text against PIL
+    '''
+    def setUp(self):
+        utils.init_decimal_context()
+
+    def test_matches_pil(self):
+        text = [('Software', 'pyRouterJig', 'tEXt'), ('Comment', 'caf\xe9 ' * 100, 'zTXt'),
+                ('Title', '½″ dovetail', 'iTXt'), ('pyRouterJig_v', utils.VERSION, 'tEXt')]
+        data = png_bytes(text)
+        f = Counting_File(data)
+        self.assertEqual(png_text.read_text(f), Image.open(BytesIO(data)).info)
+        # only the text is read, not the image data
+        self.assertTrue(f.nread < 2000 and len(data) > 100000)
+        self.assertEqual(png_text.read_text(BytesIO(data), ['Title']), {'Title': text[2][1]})
+
+    def test_design(self):
+        factory = job_runner.Joint_Factory()
+        (bit, boards, sp, config) = factory.make_joint({'spacing': 'variable'})
+        s = serialize.serialize(bit, boards, sp, config)
+        data = png_bytes([(png_text.DESIGN_KEY, s, 'tEXt'),
+                          (png_text.VERSION_KEY, utils.VERSION, 'tEXt')])
+        (t, newformat) = png_text.read_design(BytesIO(data))
+        self.assertEqual((t, newformat), (s, True))
+        (dummy_bit, dummy_boards, sp2, sp_type) = \
+            serialize.unserialize(t, config, newformat, utils.Null_Translator())
+        self.assertEqual(sp_type, 'Vari')
+        self.assertEqual([(c.xmin, c.xmax) for c in sp2.cuts], [(c.xmin, c.xmax) for c in sp.cuts])
+        self.assertEqual(png_text.read_design(BytesIO(png_bytes([]))), (None, False))
+
+    def test_insert(self):
+        data = png_bytes([('Software', 'Qt', 'tEXt')])
+        text = [(png_text.DESIGN_KEY, 'joint ' * 200), (png_text.VERSION_KEY, utils.VERSION)]
+        for compress in [False, True]:
+            new = png_text.insert_text(data, text, compress)
+            image = Image.open(BytesIO(new))
+            self.assertEqual(image.info, dict(text, Software='Qt'))
+            self.assertEqual(image.tobytes(), Image.open(BytesIO(data)).tobytes())
+            self.assertEqual(png_text.read_design(BytesIO(new)), (text[0][1], True))
+        self.assertTrue(len(png_text.insert_text(data, text, True)) <
+                        len(png_text.insert_text(data, text)))
+        self.assertRaises(png_text.PNG_Exception, png_text.insert_text, data, [('', 'x')])
+
+    def test_replace_text(self):
+        data = png_text.insert_text(png_bytes([], (8, 8)), [('a', 'x'), ('b', 'y')])
+        data = png_text.replace_text(data, [('a', 'z')])
+        self.assertEqual(png_text.read_text(BytesIO(data)), {'a': 'z', 'b': 'y'})
+
+    def test_errors(self):
+        self.assertRaises(png_text.PNG_Exception, png_text.read_text, BytesIO(b'GIF89a' * 4))
+        data = bytearray(png_bytes([('pyRouterJig', 'x' * 50, 'tEXt')], (8, 8)))
+        i = data.find(b'xxxx')
+        data[i] = ord('y')
+        self.assertRaises(png_text.PNG_Exception, png_text.read_text, BytesIO(bytes(data)))
+
+    def test_scan(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(tmpdir, 'sub'))
+            files = {'a.png': [(png_text.DESIGN_KEY, 'x', 'tEXt')],
+                     'b.png': [],
+                     os.path.join('sub', 'c.PNG'): [(png_text.DESIGN_KEY, 'y', 'tEXt')]}
+            for (name, text) in files.items():
+                with open(os.path.join(tmpdir, name), 'wb') as fd:
+                    fd.write(png_bytes(text, (8, 8)))
+            with open(os.path.join(tmpdir, 'd.png'), 'wb') as fd:
+                fd.write(b'not a png')
+            found = sorted(os.path.relpath(f, tmpdir) for (f, dummy_text) in png_text.scan(tmpdir))
+            self.assertEqual(found, ['a.png', os.path.join('sub', 'c.PNG')])
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
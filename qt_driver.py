@@ -30,12 +30,7 @@ import webbrowser
 import copy
 import shutil
 
-from io import BytesIO
-from decimal import getcontext
-
 from future.utils import lrange
-from PIL import Image
-from PIL import PngImagePlugin
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
@@ -48,7 +43,9 @@ import spacing
 import utils
 import doc
 import serialize
-import threeDS
+import png_text
+import thumbnails
+import export3d
 
 
 class Driver(QtWidgets.QMainWindow):
@@ -99,6 +96,11 @@ class Driver(QtWidgets.QMainWindow):
         self.edit_spacing.set_cuts(self.equal_spacing.cuts)
         self.spacing = self.equal_spacing  # the default
         self.spacing_index = None  # to be set in layout_widgets()
+        # Tables of the equal and variable spacing cuts, filled while idle
+        self.precompute_timer = QtCore.QTimer()
+        self.precompute_timer.setInterval(0)
+        self.precompute_timer.timeout.connect(self._on_precompute)
+        self.reset_spacing_tables()
         self.description = None
         self.woods = {}
 
@@ -119,6 +121,9 @@ class Driver(QtWidgets.QMainWindow):
         # we'd use the cwd, but that's complicated.
         self.working_dir = os.path.expanduser('~')
 
+        # Thumbnails for the open file previews, created on first use
+        self.thumbnails = None
+
         # Indices for screenshot/save and table filenames
         self.screenshot_index = None
         self.table_index = None
@@ -366,12 +371,11 @@ class Driver(QtWidgets.QMainWindow):
         # We need to make this action persistent, so that we can
         # enable and disable it (until all of its functionality is
         # written)
-        self.threeDS_action = QtWidgets.QAction(self.transl.tr('&Export 3DS...'), self)
+        self.threeDS_action = QtWidgets.QAction(self.transl.tr('&Export 3D...'), self)
         self.threeDS_action.setShortcut('Ctrl+E')
-        self.threeDS_action.setStatusTip(self.transl.tr('Export the joint to a 3DS file'))
+        self.threeDS_action.setStatusTip(self.transl.tr('Export the joint to a 3DS, STL, or OBJ file'))
         self.threeDS_action.triggered.connect(self._on_3ds)
         tools_menu.addAction(self.threeDS_action)
-        self.threeDS_enabler()
 
         tools_menu.addSeparator()
 
@@ -606,7 +610,10 @@ class Driver(QtWidgets.QMainWindow):
 
         edit_btn_undo = QtWidgets.QPushButton(self.transl.tr('Undo'), self.main_frame)
         edit_btn_undo.clicked.connect(self._on_edit_undo)
-        edit_btn_undo.setToolTip(self.transl.tr('Undo the last change'))
+        edit_btn_undo.setToolTip(self.doc.edit_undo())
+        edit_btn_redo = QtWidgets.QPushButton(self.transl.tr('Redo'), self.main_frame)
+        edit_btn_redo.clicked.connect(self._on_edit_redo)
+        edit_btn_redo.setToolTip(self.doc.edit_redo())
         edit_btn_add = QtWidgets.QPushButton(self.transl.tr('Add'), self.main_frame)
         edit_btn_add.clicked.connect(self._on_edit_add)
         edit_btn_add.setToolTip(self.transl.tr('Add a cut (if there is space to add cuts)'))
@@ -810,6 +817,7 @@ class Driver(QtWidgets.QMainWindow):
         hbox_edit.addLayout(grid_edit)
         hbox_edit.addStretch(1)
         hbox_edit.addWidget(edit_btn_undo)
+        hbox_edit.addWidget(edit_btn_redo)
 
         # Add the spacing layouts as Tabs
         self.tabs_spacing = QtWidgets.QTabWidget()
@@ -1020,6 +1028,8 @@ class Driver(QtWidgets.QMainWindow):
         self.template = router.Incra_Template(self.units, self.boards)
         self.fig.draw(self.template, self.boards, self.bit, self.spacing, self.woods,
                       self.description)
+        if self.config.debug:
+            print(router.joint_cache.stats())
         self.status_fit()
 
     def reinit_spacing(self):
@@ -1041,8 +1051,45 @@ class Driver(QtWidgets.QMainWindow):
 
         # Switch spacing index if now calculation issues
         self.spacing_index = self.tabs_spacing.currentIndex()
+        self.reset_spacing_tables()
         self.set_spacing_widgets()
 
+    def reset_spacing_tables(self):
+        '''
+        Creates new tables of cuts for the equal and variable spacing
+        objects, and starts filling them while the event loop is idle.  This
+        must be called when these spacing objects are replaced.
+        '''
+        self.equal_table = spacing.Spacing_Table(self.equal_spacing)
+        self.var_table = spacing.Spacing_Table(self.var_spacing)
+        self.precompute_timer.start()
+
+    def set_table_cuts(self, table):
+        '''
+        Sets the cuts of the spacing of the Spacing_Table table, and resumes
+        filling the table when the spacing parameters have changed
+        '''
+        if table.set_cuts():
+            self.precompute_timer.start()
+
+    @QtCore.pyqtSlot()
+    def _on_precompute(self):
+        '''
+        Computes a few more entries of the spacing tables, starting with the
+        current spacing.  Stops the timer when done.
+        '''
+        if self.spacing_index == self.var_spacing_id:
+            tables = [self.var_table, self.equal_table]
+        else:
+            tables = [self.equal_table, self.var_table]
+        for t in tables:
+            if t.precompute(20):
+                return
+        if self.config.debug:
+            print('precomputed spacing tables: %d equal, %d variable' %
+                  (len(self.equal_table.table), len(self.var_table.table)))
+        self.precompute_timer.stop()
+
     def set_spacing_widgets(self):
         '''
         Sets the spacing widget parameters
@@ -1110,7 +1157,7 @@ class Driver(QtWidgets.QMainWindow):
             self.cb_es_centered.setChecked(centered)
             self.cb_es_centered.blockSignals(False)
 
-            self.equal_spacing.set_cuts()
+            self.set_table_cuts(self.equal_table)
             self.es_slider0_label.setText(self.equal_spacing.labels[0])
             self.es_slider1_label.setText(self.equal_spacing.labels[1])
             self.spacing = self.equal_spacing
@@ -1121,7 +1168,7 @@ class Driver(QtWidgets.QMainWindow):
             self.cb_vsfingers.blockSignals(True)
             self.update_cb_vsfingers(p.vMin, p.vMax, p.v)
             self.cb_vsfingers.blockSignals(False)
-            self.var_spacing.set_cuts()
+            self.set_table_cuts(self.var_table)
             self.cb_vsfingers_label.setText(self.transl.tr(self.var_spacing.labels[0]))
             self.spacing = self.var_spacing
         elif self.spacing_index == self.edit_spacing_id:
@@ -1203,7 +1250,6 @@ class Driver(QtWidgets.QMainWindow):
             self.draw()
             self.status_message(self.transl.tr('Changed bit angle to ') + val)
             self.file_saved = False
-            self.threeDS_enabler()
 
     @QtCore.pyqtSlot()
     def _on_board_width(self):
@@ -1257,7 +1303,7 @@ class Driver(QtWidgets.QMainWindow):
         if self.config.debug:
             print('_on_es_slider0', value)
         self.equal_spacing.params['Spacing'].v = value
-        self.equal_spacing.set_cuts()
+        self.set_table_cuts(self.equal_table)
         self.es_slider0_label.setText(self.equal_spacing.labels[0])
         self.draw()
         self.status_message(self.transl.tr('Changed slider %s') % str(self.es_slider0_label.text()))
@@ -1269,7 +1315,7 @@ class Driver(QtWidgets.QMainWindow):
         if self.config.debug:
             print('_on_es_slider1', value)
         self.equal_spacing.params['Width'].v = value
-        self.equal_spacing.set_cuts()
+        self.set_table_cuts(self.equal_table)
         self.es_slider1_label.setText(self.equal_spacing.labels[1])
         self.draw()
         self.status_message(self.transl.tr('Changed slider %s') % str(self.es_slider1_label.text()))
@@ -1281,7 +1327,7 @@ class Driver(QtWidgets.QMainWindow):
         if self.config.debug:
             print('_on_vs_slider0', value)
         self.var_spacing.params['Spacing'].v = value
-        self.var_spacing.set_cuts()
+        self.set_table_cuts(self.var_table)
         self.vs_slider0_label.setText(self.var_spacing.labels[1])
         self.draw()
         self.status_message(self.transl.tr('Changed slider %s') % str(self.vs_slider0_label.text()))
@@ -1301,7 +1347,7 @@ class Driver(QtWidgets.QMainWindow):
         self.vs_slider0.setMaximum(p.vMax)
         self.vs_slider0.setValue(p.v)
 
-        self.var_spacing.set_cuts()
+        self.set_table_cuts(self.var_table)
         self.draw()
         if self.var_spacing.params['Inverted'].v:
             self.status_message(self.transl.tr('Checked Inverted.'))
@@ -1315,7 +1361,7 @@ class Driver(QtWidgets.QMainWindow):
         if self.config.debug:
             print('_on_cb_es_centered')
         self.equal_spacing.params['Centered'].v = self.cb_es_centered.isChecked()
-        self.equal_spacing.set_cuts()
+        self.set_table_cuts(self.equal_table)
         self.draw()
         if self.equal_spacing.params['Centered'].v:
             self.status_message(self.transl.tr('Checked Centered.'))
@@ -1336,7 +1382,7 @@ class Driver(QtWidgets.QMainWindow):
         self.vs_slider0.setMinimum(p.vMin)
         self.vs_slider0.setMaximum(p.vMax)
         self.vs_slider0.setValue(p.v)
-        self.var_spacing.set_cuts()
+        self.set_table_cuts(self.var_table)
 
         self.cb_vsfingers_label.setText(self.var_spacing.labels[0])
         self.draw()
@@ -1413,27 +1459,20 @@ class Driver(QtWidgets.QMainWindow):
         s = serialize.serialize(self.bit, self.boards, self.spacing,
                                 self.config)
 
-        # we use UUEC encoding so need more attributes in the image file
-        # QT5 does not work propertly with PNG text; use PIL as workaround
-
-        # Save QT image into stream and get it back into PIL to avoid native
-        # pil conversion risks
+        # QT5 does not work propertly with PNG text, so the text chunks are
+        # added to the PNG encoded by Qt, without decoding it
         buffer = QtCore.QBuffer()
         buffer.open(QtCore.QIODevice.ReadWrite)
         image.save(buffer, "PNG")
-        pio = BytesIO()
-        pio.write(buffer.data())
-        pio.seek(0)
+        data = bytes(buffer.data())
         buffer.close()
-        pilimg = Image.open(pio)
-
-        info = PngImagePlugin.PngInfo()
-        info.add_text('pyRouterJig', s)
-        info.add_text('pyRouterJig_v', utils.VERSION)
+        data = png_text.insert_text(data, [(png_text.DESIGN_KEY, s),
+                                           (png_text.VERSION_KEY, utils.VERSION)])
 
         r = True
         try:
-            pilimg.save(filename, 'png', pnginfo=info)
+            with open(filename, 'wb') as fd:
+                fd.write(data)
         except OSError:
             r = False
 
@@ -1446,6 +1485,13 @@ class Driver(QtWidgets.QMainWindow):
             self.status_message(self.transl.tr('Unable to save to file %s') % filename,
                                 warning=True)
 
+    def thumbnail_cache(self):
+        '''Returns the cache of the thumbnails of saved joints'''
+        if self.thumbnails is None:
+            mb = self.config.thumbnail_cache_mb
+            self.thumbnails = thumbnails.Thumbnail_Cache(max_bytes=mb * 1024 * 1024)
+        return self.thumbnails
+
     @QtCore.pyqtSlot()
     def _on_open(self):
         '''
@@ -1469,18 +1515,22 @@ class Driver(QtWidgets.QMainWindow):
                 return
 
         # Get the file name
-        filename, _ = QtWidgets.QFileDialog.getOpenFileName(
-            self, self.transl.tr('Open file'),
-            self.working_dir,
-            'Portable Network Graphics (*.png)')
-        # filename = str(filename).strip()
+        dialog = qt_utils.Preview_File_Dialog(self, self.transl.tr('Open file'),
+                                              self.working_dir,
+                                              'Portable Network Graphics (*.png)',
+                                              self.thumbnail_cache())
+        filename = None
+        if dialog.exec_():
+            filename = dialog.selectedFiles()[0]
         if not filename:
             self.status_message(self.transl.tr('File open aborted'), warning=True)
             return
 
-        # From the image file, parse the metadata.
-        image = Image.open(filename)
-        s = image.info['pyRouterJig']
+        # From the image file, parse the metadata, without reading the image.
+        try:
+            (s, newformat) = png_text.read_design(filename)
+        except png_text.PNG_Exception:
+            s = None
 
         if not s:
             msg = self.transl.tr('File %s does not contain pyRouterJig data.  The PNG file'\
@@ -1489,9 +1539,13 @@ class Driver(QtWidgets.QMainWindow):
             return
 
         # backwards compatibility
-        (bit, boards, sp, sp_type) = \
-            serialize.unserialize(s, self.config, ('pyRouterJig_v' in image.info.keys()),
-                                  self.transl)
+        try:
+            (bit, boards, sp, sp_type) = \
+                serialize.unserialize(s, self.config, newformat, self.transl)
+        except serialize.Serialize_Exception as e:
+            msg = self.transl.tr('Unable to open the file {}.\n{}').format(filename, e)
+            QtWidgets.QMessageBox.warning(self, self.transl.tr('Error'), msg)
+            return
 
         if self.bit.units.metric != bit.units.metric:
             scales_name = 'English'
@@ -1537,13 +1591,11 @@ class Driver(QtWidgets.QMainWindow):
             i = self.cb_wood[3].findText('NONE')
             self.cb_wood[3].setCurrentIndex(i)
 
-        # ... set spacing cuts and tabs
+        # ... set spacing tabs.  The cuts were set by unserialize().
         if sp_type == 'Equa':
-            sp.set_cuts()
             self.equal_spacing = sp
             self.spacing_index = self.equal_spacing_id
         elif sp_type == 'Vari':
-            sp.set_cuts()
             self.var_spacing = sp
             self.spacing_index = self.var_spacing_id
         elif sp_type == 'Edit':
@@ -1551,6 +1603,12 @@ class Driver(QtWidgets.QMainWindow):
             self.spacing_index = self.edit_spacing_id
 
         self.spacing = sp
+        self.reset_spacing_tables()
+        # so that set_spacing_widgets() looks up the cuts, rather than setting them again
+        if sp_type == 'Equa':
+            self.equal_table.store()
+        elif sp_type == 'Vari':
+            self.var_table.store()
         self.tabs_spacing.blockSignals(True)
         self.tabs_spacing.setCurrentIndex(self.spacing_index)
         self.tabs_spacing.blockSignals(False)
@@ -1564,23 +1622,10 @@ class Driver(QtWidgets.QMainWindow):
 
         self.draw()
 
-    def threeDS_enabler(self):
-        '''
-        Enables / Disables 3DS file save, depending on joint and bit
-        properties
-        '''
-        if self.config.debug:
-            print('threeDS_enabler')
-
-        if self.bit.angle > 0 or self.boards[2].active:
-            self.threeDS_action.setEnabled(False)
-        else:
-            self.threeDS_action.setEnabled(True)
-
     @QtCore.pyqtSlot()
     def _on_3ds(self):
         '''
-        Handles export to 3DS file events.
+        Handles export to 3DS, STL, and OBJ file events.
         '''
         if self.config.debug:
             print('_on_3ds')
@@ -1589,8 +1634,12 @@ class Driver(QtWidgets.QMainWindow):
 
         # Get the file name
         defname = os.path.join(self.working_dir, fname)
-        dialog = QtWidgets.QFileDialog(self, self.transl.tr('Export joint'), defname,
-                                       'Autodesk 3DS file (*.3ds)')
+        dialog = QtWidgets.QFileDialog(self, self.transl.tr('Export joint'), defname)
+        dialog.setNameFilters(['Autodesk 3DS file (*.3ds)', 'Binary STL file (*.stl)',
+                               'Wavefront OBJ file (*.obj)'])
+        dialog.filterSelected.connect(
+            lambda f: dialog.setDefaultSuffix(f[f.index('*.') + 2:f.index(')')]))
+        dialog.setDefaultSuffix('3ds')
         dialog.setFileMode(QtWidgets.QFileDialog.AnyFile)
         dialog.setAcceptMode(QtWidgets.QFileDialog.AcceptSave)
         filename = None
@@ -1606,7 +1655,11 @@ class Driver(QtWidgets.QMainWindow):
             self.status_message(self.transl.tr('Joint not exported'), warning=True)
             return
 
-        threeDS.joint_to_3ds(filename, self.boards, self.bit, self.spacing)
+        try:
+            export3d.write_joint(filename, self.boards, self.bit, self.spacing)
+        except ValueError as e:
+            self.status_message(str(e), warning=True)
+            return
         self.status_message(self.transl.tr('Exported to file %s') % filename)
 
     @QtCore.pyqtSlot()
@@ -1782,7 +1835,6 @@ class Driver(QtWidgets.QMainWindow):
             self.le_boardm[0].setEnabled(True)
             self.le_boardm[0].setStyleSheet("color: black;")
         self._on_wood(2, index, reinit)
-        self.threeDS_enabler()
 
     @QtCore.pyqtSlot(int)
     def _on_wood3(self, index):
@@ -1838,6 +1890,15 @@ class Driver(QtWidgets.QMainWindow):
         self.status_message('Undo')
         self.draw()
 
+    @QtCore.pyqtSlot()
+    def _on_edit_redo(self):
+        '''Handles redo event'''
+        if self.config.debug:
+            print('_on_edit_redo')
+        self.spacing.redo()
+        self.status_message('Redo')
+        self.draw()
+
     @QtCore.pyqtSlot()
     def _on_edit_moveL(self):
         '''Handles move left event'''
@@ -2080,6 +2141,10 @@ class Driver(QtWidgets.QMainWindow):
             self.spacing.undo()
             msg = 'Undo'
             self.draw()
+        elif event.key() == QtCore.Qt.Key_R:
+            self.spacing.redo()
+            msg = 'Redo'
+            self.draw()
         elif event.key() == QtCore.Qt.Key_A:
             msg = self.spacing.cut_all_active()
             self.draw()
@@ -2150,9 +2215,7 @@ def run():
     '''
     Sets up and runs the application
     '''
-    getcontext().prec = 4 + 4  # working in f8.4
-    getcontext().Emin = -99999999  # working in f8.4
-    getcontext().Emax = 99999999  # working in f8.4
+    utils.init_decimal_context()
 
 #    QtGui.QApplication.setStyle('plastique')
 #    QtGui.QApplication.setStyle('windows')
@@ -26,8 +26,11 @@ from __future__ import print_function
 import os
 import glob
 import operator
-from PyQt5 import QtCore, QtWidgets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5 import QtCore, QtGui, QtWidgets
 import router
+import thumbnails
 
 def set_router_value(line_edit, obj, attr, setter, is_float=False, bit=None):
     '''
@@ -188,3 +191,125 @@ def create_lang_dict():
                     langs[locale.languageToString(locale.language())] = name
     langs = sorted(langs.items(), key=operator.itemgetter(0))
     return langs
+
+
+def scale_png(data, size):
+    '''
+    Returns the PNG bytes of the image in the PNG bytes data, scaled to fit
+    in size x size pixels, or None if data is not a readable PNG.  QImage,
+    unlike QPixmap, may be used outside of the GUI thread.
+    '''
+    image = QtGui.QImage.fromData(data, 'PNG')
+    if image.isNull():
+        return None
+    image = image.scaled(size, size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+    buffer = QtCore.QBuffer()
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    ok = image.save(buffer, 'PNG')
+    r = bytes(buffer.data())
+    buffer.close()
+    if not ok:
+        return None
+    return r
+
+
+class Thumbnail_Loader(QtCore.QObject):
+    '''
+    Makes thumbnails in a pool of background threads, using a
+    thumbnails.Thumbnail_Cache.  The ready signal is emitted, in the GUI
+    thread, with the filename and the thumbnail's PNG bytes.  The files are
+    hashed by the workers, so that the GUI thread never reads them.
+    '''
+    ready = QtCore.pyqtSignal(str, bytes)
+
+    def __init__(self, cache, workers=4):
+        QtCore.QObject.__init__(self)
+        self.cache = cache
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        # filename to the future of its queued or running thumbnail
+        self.pending = {}
+        # filenames for which ready is emitted when their thumbnail is made
+        self.requested = set()
+
+    def _submit(self, filename):
+        '''Queues the thumbnail of filename, unless it is pending.  Call with lock held.'''
+        if filename not in self.pending:
+            self.pending[filename] = self.pool.submit(self._make, filename)
+
+    def request(self, filename):
+        '''Emits ready for filename, once its thumbnail is made or found in the cache'''
+        with self.lock:
+            self.requested.add(filename)
+            self._submit(filename)
+
+    def prefetch(self, directory):
+        '''Makes the thumbnails of the PNG files in directory, in the background'''
+        with self.lock:
+            for f in sorted(glob.glob(os.path.join(directory, '*.png'))):
+                self._submit(f)
+
+    def _make(self, filename):
+        '''Makes the thumbnail of filename, in a worker thread'''
+        try:
+            data = self.cache.thumbnail(filename, scale_png)
+        except (IOError, OSError):
+            data = None
+        with self.lock:
+            self.pending.pop(filename, None)
+            emit = filename in self.requested
+            self.requested.discard(filename)
+        if emit and data is not None:
+            # signals emitted from another thread are queued to the GUI thread
+            self.ready.emit(filename, data)
+
+    def shutdown(self):
+        '''Stops the worker threads, cancelling the queued thumbnails'''
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+            self.requested.clear()
+        self.pool.shutdown(wait=False)
+
+
+class Preview_File_Dialog(QtWidgets.QFileDialog):
+    '''
+    File dialog with a pane that previews the selected PNG file, from the
+    thumbnail cache.  When a directory is entered, the thumbnails of its
+    files are made in the background, so that paging through the files is
+    fast.
+    '''
+    def __init__(self, parent, caption, directory, file_filter, cache):
+        QtWidgets.QFileDialog.__init__(self, parent, caption, directory, file_filter)
+        # the native dialogs cannot be extended with the preview
+        self.setOption(QtWidgets.QFileDialog.DontUseNativeDialog, True)
+        self.setFileMode(QtWidgets.QFileDialog.ExistingFile)
+        self.preview = QtWidgets.QLabel()
+        self.preview.setFixedSize(cache.size, cache.size)
+        self.preview.setAlignment(QtCore.Qt.AlignCenter)
+        layout = self.layout()
+        layout.addWidget(self.preview, 0, layout.columnCount(), layout.rowCount(), 1)
+        self.current = None
+        self.loader = Thumbnail_Loader(cache)
+        self.loader.ready.connect(self._on_ready)
+        self.currentChanged.connect(self._on_current_changed)
+        self.directoryEntered.connect(self.loader.prefetch)
+        self.loader.prefetch(directory)
+
+    @QtCore.pyqtSlot(str)
+    def _on_current_changed(self, filename):
+        self.current = filename
+        self.preview.clear()
+        if filename.lower().endswith('.png') and os.path.isfile(filename):
+            self.loader.request(filename)
+
+    @QtCore.pyqtSlot(str, bytes)
+    def _on_ready(self, filename, data):
+        if filename == self.current:
+            image = QtGui.QImage.fromData(data, 'PNG')
+            self.preview.setPixmap(QtGui.QPixmap.fromImage(image))
+
+    def done(self, result):
+        self.loader.shutdown()
+        QtWidgets.QFileDialog.done(self, result)
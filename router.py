@@ -25,12 +25,108 @@ from __future__ import division
 from __future__ import print_function
 
 import math
+from collections import OrderedDict
 from decimal import Decimal, ROUND_HALF_DOWN
 
 from future.utils import lrange
 
 import utils
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Version of the algorithms that compute the cuts and router passes of a joint.
+# Increment this when they change, so that the cuts saved with joints are
+# recomputed.
+ALGORITHM_VERSION = 1
+
+# Engines for the arithmetic in Cut.make_router_passes().  See set_numeric_engine().
+NUMERIC_ENGINES = ['decimal', 'integer']
+if np is not None:
+    NUMERIC_ENGINES.append('numpy')
+    _numeric_engine = 'numpy'
+else:
+    _numeric_engine = 'integer'
+
+# The integer engine works in units of 1/_SCALE increments, so that Cut.precision
+# is exactly one unit.
+_SCALE = 100
+
+# The numpy engine uses the integer engine for fewer cuts than this, because the
+# fixed cost of the array operations is larger than the savings.
+_NUMPY_MIN_CUTS = 64
+
+# triangulate_polygon() uses numpy for polygons of at least this many vertices,
+# for the same reason.
+_NUMPY_MIN_VERTICES = 80
+
+
+def set_numeric_engine(engine):
+    '''
+    Sets the engine used for the router pass arithmetic, one of NUMERIC_ENGINES:
+
+    decimal: All arithmetic in Decimal.
+    integer: Arithmetic in integers scaled by _SCALE.  Cuts whose dimensions
+             are not exact at that scale, or that fail the error checks, are
+             redone with the decimal engine, so the results (and exceptions)
+             are identical.
+    numpy: Same as integer, except that edge_router_passes() does all of the
+           cuts at once with numpy arrays, when there are at least
+           _NUMPY_MIN_CUTS cuts.  Only available if numpy is installed, in
+           which case it is the default.
+    '''
+    global _numeric_engine
+    if engine not in NUMERIC_ENGINES:
+        raise ValueError('Unknown numeric engine %s' % engine)
+    _numeric_engine = engine
+
+
+def get_numeric_engine():
+    '''Returns the engine used for the router pass arithmetic'''
+    return _numeric_engine
+
+
+def _to_scaled(d):
+    '''
+    Returns the Decimal (or integer) d in units of 1/_SCALE increments, as an
+    integer, or None if d is not exact in those units.
+    '''
+    n = d * _SCALE
+    i = int(n)
+    if i != n:
+        return None
+    return i
+
+
+def _tdiv(a, b):
+    '''
+    Integer division of a by b > 0, truncated towards zero as Decimal does.
+    '''
+    if a >= 0:
+        return a // b
+    return -((-a) // b)
+
+
+def _round_scaled(n):
+    '''
+    Returns utils.math_round(n / _SCALE) for the integer n, in increments.
+    '''
+    q = _tdiv(n, _SCALE)
+    return q + _tdiv(2 * (n - q * _SCALE), _SCALE)
+
+
+def _np_tdiv(a, b):
+    '''Same as _tdiv(), for the numpy integer array a'''
+    return np.where(a >= 0, a // b, -((-a) // b))
+
+
+def _np_round_scaled(n):
+    '''Same as _round_scaled(), for the numpy integer array n'''
+    q = _np_tdiv(n, _SCALE)
+    return q + _np_tdiv(2 * (n - q * _SCALE), _SCALE)
+
 
 class Router_Exception(Exception):
     '''
@@ -222,11 +318,16 @@ class Router_Bit(object):
 
         self.overhang = (self.width_f - self.midline) / 2
 
+        # cached joints may depend on the old bit attributes
+        joint_cache.invalidate()
+
 
 class My_Rectangle(object):
     '''
     Stores a rectangle geometry
     '''
+    __slots__ = ('xOrg', 'yOrg', 'width', 'height')
+
     def __init__(self, xOrg, yOrg, width, height):
         '''
         (xOrg, yOrg): Bottom-left coordinate (origin)
@@ -281,6 +382,9 @@ class Board(My_Rectangle):
 
     Dimensions are in increment units.
     '''
+    __slots__ = ('units', 'thickness', 'wood', 'active', 'dheight', 'bottom_cuts', 'top_cuts',
+                 'transl')
+
     def __init__(self, bit, width, thickness=32):
         My_Rectangle.__init__(self, 0, 0, width, 32)
         self.units = bit.units
@@ -357,16 +461,22 @@ class Board(My_Rectangle):
             raise Router_Exception(msg)
         self.set_height(bit, t)
 
-    def set_bottom_cuts(self, cuts, bit):
-        '''Sets the bottom cuts for the board'''
-        for c in cuts:
-            c.make_router_passes(bit, self)
+    def set_bottom_cuts(self, cuts, bit, make_passes=True):
+        '''
+        Sets the bottom cuts for the board.  If make_passes is False, the
+        caller is responsible for the router passes of the cuts.
+        '''
+        if make_passes:
+            edge_router_passes([(cuts, self)], bit)
         self.bottom_cuts = cuts
 
-    def set_top_cuts(self, cuts, bit):
-        '''Sets the top cuts for the board'''
-        for c in cuts:
-            c.make_router_passes(bit, self)
+    def set_top_cuts(self, cuts, bit, make_passes=True):
+        '''
+        Sets the top cuts for the board.  If make_passes is False, the
+        caller is responsible for the router passes of the cuts.
+        '''
+        if make_passes:
+            edge_router_passes([(cuts, self)], bit)
         self.top_cuts = cuts
 
     def _do_cuts(self, bit, cuts, y_nocut, y_cut):
@@ -383,7 +493,7 @@ class Board(My_Rectangle):
         for c in cuts:
             if c.xmin > 0:
                 # on the surface, start of cut
-                x.append(c.xmin + x[0] + overhang - halfgap)
+                x.append(c.xmin + self.xL() + overhang - halfgap)
                 y.append(Decimal(y_nocut))
             # at the cut depth, start of cut
             x.append(c.xmin + self.xL() - halfgap)
@@ -452,107 +562,171 @@ class Board(My_Rectangle):
 
         bit: A Router_Bit object.
 
-        Returns (x, y, t), where
-
-        x, y = lists of vertex coordinates, ordered clockwise around perimeter
-        t = list of triangle indices in x, y
-
-        Note that perimeter() returns a smaller list of (x, y), but more
-        coordinates are needed to create a good triangulation.
-        '''
-        t = []
-        y_top = self.yT()
-        y_bot = self.yB()
-        v = 0
-        if self.top_cuts is None:  # has only bottom cuts
-            y_cut = y_bot + bit.depth  # y-location of routed edge
-            cuts = self.bottom_cuts
-            (xc, yc) = self._do_cuts(bit, cuts, y_bot, y_cut)
-            nintervals = 2 * len(cuts) - 1
-            incut = True
-            if cuts[0].xmin > 0:
-                nintervals += 1
-                incut = False
-                xc.insert(0, xc[0])
-                yc.insert(0, y_cut)
-            if cuts[-1].xmax < self.width:
-                nintervals += 1
-                xc.append(self.width)
-                yc.append(y_cut)
-            ntop = nintervals + 1
-            ntotal = ntop + len(xc)
-            v = [[self.xL(), y_top]] * ntotal
-            v[0] = [xc[0], yc[0]]
-            v[1] = [xc[1], yc[1]]
-            ic = 0
-            ibot = 2
-            itop = ntotal - 2
-            for _ in lrange(nintervals):
-                v[ibot] = [xc[ibot], yc[ibot]]
-                if ibot < len(xc) - 1:
-                    v[ibot + 1] = [xc[ibot + 1], yc[ibot + 1]]
-                if incut:
-                    v[itop] = [cuts[ic].xmax + self.xL(), y_top]
-                    ic += 1
-                    t.append([ibot - 1, ibot, itop])
-                    t.append([ibot - 1, itop, itop + 1])
-                else:
-                    if ic < len(cuts):
-                        v[itop] = [cuts[ic].xmin + self.xL(), y_top]
-                    else:
-                        v[itop] = [self.xR(), y_top]
-                    t.append([ibot - 1, ibot, ibot + 1])
-                    t.append([ibot - 1, ibot + 1, ibot - 2])
-                    t.append([ibot - 2, ibot + 1, itop])
-                    t.append([ibot - 2, itop, itop + 1])
-                incut = (not incut)
-                ibot += 2
-                itop -= 1
-        elif self.bottom_cuts is None:  # has only top cuts
-            y_cut = y_top - bit.depth  # y-location of routed edge
-            cuts = self.top_cuts
-            (xc, yc) = self._do_cuts(bit, cuts, y_top, y_cut)
-            nintervals = 2 * len(cuts) - 1
-            incut = True
-            if cuts[0].xmin > 0:
-                nintervals += 1
-                incut = False
-                xc.insert(0, xc[0])
-                yc.insert(0, y_cut)
-            if cuts[-1].xmax < self.width:
-                nintervals += 1
-                xc.append(self.width)
-                yc.append(y_cut)
-            nbot = nintervals + 1
-            ntotal = nbot + len(xc)
-            v = [[self.xL(), y_bot]] * ntotal
-            v[0] = [xc[0], yc[0]]
-            v[1] = [xc[1], yc[1]]
-            ic = 0
-            ibot = ntotal - 2
-            itop = 2
-            for _ in lrange(nintervals):
-                v[itop] = [xc[itop], yc[itop]]
-                if itop < len(xc) - 1:
-                    v[itop + 1] = [xc[itop + 1], yc[itop + 1]]
-                if incut:
-                    v[ibot] = [cuts[ic].xmax + self.xL(), y_bot]
-                    ic += 1
-                    t.append([itop - 1, itop, ibot + 1])
-                    t.append([itop, ibot, ibot + 1])
-                else:
-                    if ic < len(cuts):
-                        v[ibot] = [cuts[ic].xmin + self.xL(), y_bot]
-                    else:
-                        v[ibot] = [self.xR(), y_bot]
-                    t.append([itop - 2, itop + 1, itop])
-                    t.append([itop - 2, itop, itop - 1])
-                    t.append([itop + 1, itop - 2, ibot + 1])
-                    t.append([itop + 1, ibot + 1, ibot])
-                incut = (not incut)
-                itop += 2
-                ibot -= 1
-        return (v, t)
+        Returns (v, t) of triangulate_polygon() for the perimeter.  The
+        vertices are ordered clockwise around the perimeter, but there are
+        more of them than perimeter() returns.
+        '''
+        return triangulate_polygon(*self.perimeter(bit))
+
+
+def triangulate_polygon(x, y):
+    '''
+    Triangulates a simple polygon, such as a board perimeter.
+
+    x, y: Lists of the vertex coordinates, in order around the polygon in
+          either direction.  The first vertex may be repeated at the end.
+
+    Returns (v, t), where v is the (x, y) float coordinates of the vertices
+    and t is the counterclockwise triangles, as indices in v.  These are
+    numpy arrays if numpy is available, otherwise lists.  The vertices are
+    those of the polygon in the same order, with the edges split where they
+    cross the y-coordinate of another vertex.
+
+    The polygon is divided into horizontal bands at the y-coordinates, or
+    levels, of its vertices.  Within a band, the polygon is a row of
+    trapezoids, whose sides are edges.  Each trapezoid is convex, so it is
+    fanned into triangles from its top left and bottom right corners.
+
+    The vertices are put in order by level and x, and the edges by band and
+    x, by grouping them by level in polygon order and sorting each group.
+    On a board, the polygon order of each group is a few runs of increasing
+    or decreasing x, one for each edge of the board, and these sorts merge
+    the runs in linear time.  A board has at most four levels, so the
+    number of vertices at most triples, and the cost is linear in the
+    number of cuts.  A general polygon can have as many levels as vertices,
+    and then the split vertices grow as the square.
+    '''
+    ring = []
+    for p in zip(x, y):
+        p = (float(p[0]), float(p[1]))
+        if not ring or p != ring[-1]:
+            ring.append(p)
+    if len(ring) > 1 and ring[-1] == ring[0]:
+        ring.pop()
+    levels = sorted(set(p[1] for p in ring))
+    if np is not None and len(ring) >= _NUMPY_MIN_VERTICES:
+        return _numpy_triangulate(ring, levels)
+    level = dict((yl, k) for (k, yl) in enumerate(levels))
+    # split the edges at the levels that they cross, keeping the level
+    # index of each vertex
+    v = []
+    lv = []
+    for (k, (x0, y0)) in enumerate(ring):
+        (x1, y1) = ring[k + 1 - len(ring)]
+        (l0, l1) = (level[y0], level[y1])
+        v.append([x0, y0])
+        lv.append(l0)
+        step = 1 if l1 > l0 else -1
+        for l in lrange(l0 + step, l1, step):
+            yl = levels[l]
+            v.append([x0 + (x1 - x0) * (yl - y0) / (y1 - y0), yl])
+            lv.append(l)
+    # the vertices sorted by level and x, and the rank of each in that order
+    groups = [[] for _ in levels]
+    for i in lrange(len(v)):
+        groups[lv[i]].append(i)
+    order = []
+    for g in groups:
+        g.sort(key=lambda i: v[i][0])
+        order.extend(g)
+    rank = [0] * len(v)
+    for (r, i) in enumerate(order):
+        rank[i] = r
+    # the edges that span a band, as (lower, upper) vertex indices, sorted
+    # by band, then left to right
+    groups = [[] for _ in levels]
+    for i in lrange(len(v)):
+        j = (i + 1) % len(v)
+        if lv[i] < lv[j]:
+            groups[lv[i]].append((i, j))
+        elif lv[i] > lv[j]:
+            groups[lv[j]].append((j, i))
+    edges = []
+    for g in groups:
+        g.sort(key=lambda e: v[e[0]][0] + v[e[1]][0])
+        edges.extend(g)
+    t = []
+    for (left, right) in zip(edges[0::2], edges[1::2]):
+        (b0, b1) = (rank[left[0]], rank[right[0]])
+        (t0, t1) = (rank[left[1]], rank[right[1]])
+        for r in lrange(b0, b1):
+            t.append([order[r], order[r + 1], order[t0]])
+        for r in lrange(t0, t1):
+            t.append([order[b1], order[r + 1], order[r]])
+    if np is not None:
+        return (np.array(v, dtype=float).reshape(-1, 2), np.array(t, dtype=int).reshape(-1, 3))
+    return (v, t)
+
+
+def _numpy_group(keys, nkeys, x):
+    '''
+    Returns the indices that sort the numpy arrays keys, of integers less than
+    nkeys, and then x, keeping the order of equal elements.  For fewer than
+    2**15 keys, the keys are sorted by numpy's linear radix sort, and the
+    sort of x, whose runs were kept by it, is a merge of the runs.
+    '''
+    if nkeys <= 1 << 15:
+        keys = keys.astype(np.int16)
+    g = np.argsort(keys, kind='stable')
+    g = g[np.argsort(x[g], kind='stable')]
+    return g[np.argsort(keys[g], kind='stable')]
+
+
+def _numpy_triangulate(ring, levels):
+    '''
+    Returns triangulate_polygon() for the list of (x, y) vertices ring, with
+    the sorted y-coordinates levels, using numpy arrays.  The result is the
+    same as without numpy.
+    '''
+    p = np.array(ring, dtype=float).reshape(-1, 2)
+    levels = np.array(levels, dtype=float)
+    lp = np.searchsorted(levels, p[:, 1])
+    # split the edges at the levels that they cross
+    dl = np.roll(lp, -1) - lp
+    extra = np.maximum(np.abs(dl) - 1, 0)
+    before = np.cumsum(extra) - extra
+    pos = np.arange(len(p)) + before
+    v = np.empty((len(p) + extra.sum(), 2))
+    lv = np.empty(len(v), dtype=int)
+    v[pos] = p
+    lv[pos] = lp
+    e = np.repeat(np.arange(len(p)), extra)
+    k = np.arange(len(e)) - np.repeat(before, extra) + 1
+    l = lp[e] + np.sign(dl[e]) * k
+    (p0, p1) = (p[e], np.roll(p, -1, axis=0)[e])
+    v[pos[e] + k, 0] = p0[:, 0] + (p1[:, 0] - p0[:, 0]) * (levels[l] - p0[:, 1]) / \
+        (p1[:, 1] - p0[:, 1])
+    v[pos[e] + k, 1] = levels[l]
+    lv[pos[e] + k] = l
+    order = _numpy_group(lv, len(levels), v[:, 0])
+    rank = np.empty(len(v), dtype=int)
+    rank[order] = np.arange(len(v))
+    # the edges that span a band, sorted by band, then left to right
+    i = np.arange(len(v))
+    j = np.roll(i, -1)
+    span = lv[i] != lv[j]
+    up = lv[i] < lv[j]
+    lower = np.where(up, i, j)[span]
+    upper = np.where(up, j, i)[span]
+    s = _numpy_group(lv[lower], len(levels), v[lower, 0] + v[upper, 0])
+    (lower, upper) = (lower[s], upper[s])
+    # the trapezoids, as the ranks of their corners
+    b0 = rank[lower[0::2]]
+    b1 = rank[lower[1::2]]
+    t0 = rank[upper[0::2]]
+    t1 = rank[upper[1::2]]
+    # the fans from the top left corner over the bottom, then from the
+    # bottom right corner over the top, of each trapezoid
+    (nb, nt) = (b1 - b0, t1 - t0)
+    rb = np.arange(nb.sum()) - np.repeat(np.cumsum(nb) - nb - b0, nb)
+    rt = np.arange(nt.sum()) - np.repeat(np.cumsum(nt) - nt - t0, nt)
+    fans = [np.column_stack([order[rb], order[rb + 1], np.repeat(order[t0], nb)]),
+            np.column_stack([np.repeat(order[b1], nt), order[rt + 1], order[rt]])]
+    first = np.cumsum(nb + nt) - nb - nt
+    t = np.empty((len(rb) + len(rt), 3), dtype=int)
+    t[np.arange(len(rb)) + np.repeat(first - np.cumsum(nb) + nb, nb)] = fans[0]
+    t[np.arange(len(rt)) + np.repeat(first + nb - np.cumsum(nt) + nt, nt)] = fans[1]
+    return (v, t)
 
 
 class Cut(object):
@@ -565,15 +739,29 @@ class Cut(object):
     xmin: min x-location of cut.
     xmax: max x-location of cut.
     passes: Array of router passes to make the cut, indicating the center of the bit
-    midPass: The particle pass in passes that is centered (within an increment)
-             on the cut
+    precision: Tolerance of the cut checks, shared by all cuts
+
+    Cuts are pickled in saved designs, so the pickled state is the attribute
+    dictionary, including precision, as it was before __slots__ was used.
     '''
+    __slots__ = ('xmin', 'xmax', 'passes')
+
+    # Presission value is about 1/64 inch (the exact 1/64 = 0.0156 so we fine for bouth mesument systems)
+    precision = Decimal('0.01')
+
     def __init__(self, xmin, xmax):
         self.xmin = Decimal(xmin)
         self.xmax = Decimal(xmax)
         self.passes = []
-        # Presission value is about 1/64 inch (the exact 1/64 = 0.0156 so we fine for bouth mesument systems)
-        self.precision = Decimal('0.01')
+
+    def __getstate__(self):
+        return {'xmin': self.xmin, 'xmax': self.xmax, 'passes': self.passes,
+                'precision': self.precision}
+
+    def __setstate__(self, state):
+        self.xmin = state['xmin']
+        self.xmax = state['xmax']
+        self.passes = state.get('passes', [])
 
     def validate(self, bit, board):
         '''
@@ -603,6 +791,74 @@ class Cut(object):
         3 - multi-passed corner right cuts
         4 - corner right cut as is (it is most risky cut but we can't optimize it on Incra)
         '''
+        if _numeric_engine != 'decimal':
+            passes = self._integer_router_passes(bit, board)
+            if passes is not None:
+                self.passes = passes
+                return
+        self._decimal_router_passes(bit, board)
+
+    def _integer_router_passes(self, bit, board):
+        '''
+        Same as _decimal_router_passes(), but with the arithmetic in integers
+        scaled by _SCALE.  Returns the passes, or None if the cut cannot be done
+        exactly in those units or it fails any error check, in which case the
+        caller must use _decimal_router_passes().
+        '''
+        xmin = _to_scaled(self.xmin)
+        xmax = _to_scaled(self.xmax)
+        width = _to_scaled(bit.width_f)
+        if xmin is None or xmax is None or width is None or width % 2 != 0 or \
+           not isinstance(board.width, int):
+            return None
+        bwidth = board.width * _SCALE
+
+        # checks of validate()
+        if xmin >= xmax or xmin < 0 or xmax > bwidth or \
+           (width - (xmax - xmin) > 1 and xmin > 0 and xmax < bwidth):
+            return None
+
+        cutpass = int((bit.width_f * bit.bit_gentle) / 100) * _SCALE
+        halfwidth = width // 2
+        two_thirds = _tdiv(2 * width, 3 * _SCALE) * _SCALE
+        four_fifths = _tdiv(4 * width, 5 * _SCALE) * _SCALE
+
+        remainder = xmax - xmin
+        if xmax == bwidth and remainder > halfwidth:
+            p0 = xmax + halfwidth - cutpass
+        else:
+            p0 = _round_scaled(xmax - halfwidth) * _SCALE
+        p1 = _round_scaled(xmin + halfwidth) * _SCALE
+
+        passes = []
+        if xmax <= bwidth and (xmin - (p0 - halfwidth) < 1 or xmin == 0):
+            passes.append(_tdiv(p0, _SCALE))
+
+        while remainder > 0:
+            remainder = p0 - p1
+            if p0 != p1 and ((p1 + halfwidth) - xmax < 1 or xmax == bwidth):
+                p1 = _tdiv(p1, _SCALE) * _SCALE
+                passes.append(p1 // _SCALE)
+            if remainder <= two_thirds:
+                p1 = p0 - _tdiv(remainder, 2 * _SCALE) * _SCALE
+            else:
+                p1 += cutpass
+            if remainder < four_fifths:
+                remainder = 0
+
+        passes.sort()
+        # error checking
+        for p in passes:
+            p *= _SCALE
+            if (xmin > 0 and (xmin - (p - halfwidth)) > 1) or \
+               (xmax < bwidth and ((p + halfwidth) - xmax) > 1):
+                return None
+        return passes
+
+    def _decimal_router_passes(self, bit, board):
+        '''
+        Implements make_router_passes() with the arithmetic in Decimal.
+        '''
 
         self.validate(bit, board)
 
@@ -651,6 +907,108 @@ class Cut(object):
                                        % (self.xmin, self.xmax, p, bit.width_f))
 
 
+def edge_router_passes(edges, bit):
+    '''
+    Computes the router passes for every cut on the given edges.
+
+    edges: A list of (cuts, board) pairs, where cuts is an array of Cut
+           objects on an edge of board
+    bit: A Router_Bit object
+
+    Same as calling Cut.make_router_passes() for each cut, in order, except
+    that with the numpy engine all of the cuts are done at once.
+    '''
+    if _numeric_engine == 'numpy':
+        _numpy_router_passes(edges, bit)
+        return
+    for (cuts, board) in edges:
+        for c in cuts:
+            c.make_router_passes(bit, board)
+
+
+def _numpy_router_passes(edges, bit):
+    '''
+    Implements edge_router_passes() with the Cut._integer_router_passes()
+    arithmetic applied to arrays of all of the cuts.  Cuts that are not exact
+    in the scaled units, or that fail any error check, are redone one at a time
+    with Cut.make_router_passes(), which raises the error.
+    '''
+    all_cuts = [(c, board) for (cuts, board) in edges for c in cuts]
+    n = len(all_cuts)
+    width = _to_scaled(bit.width_f)
+    if n < _NUMPY_MIN_CUTS or width is None or width % 2 != 0:
+        for (c, board) in all_cuts:
+            c.make_router_passes(bit, board)
+        return
+
+    xmin = np.zeros(n, dtype=np.int64)
+    xmax = np.zeros(n, dtype=np.int64)
+    bwidth = np.zeros(n, dtype=np.int64)
+    ok = np.ones(n, dtype=bool)
+    for (i, (c, board)) in enumerate(all_cuts):
+        x0 = _to_scaled(c.xmin)
+        x1 = _to_scaled(c.xmax)
+        if x0 is None or x1 is None or not isinstance(board.width, int):
+            ok[i] = False
+            continue
+        xmin[i] = x0
+        xmax[i] = x1
+        bwidth[i] = board.width * _SCALE
+
+    # checks of validate()
+    ok &= ~((xmin >= xmax) | (xmin < 0) | (xmax > bwidth) |
+            ((width - (xmax - xmin) > 1) & (xmin > 0) & (xmax < bwidth)))
+
+    cutpass = int((bit.width_f * bit.bit_gentle) / 100) * _SCALE
+    halfwidth = width // 2
+    two_thirds = _tdiv(2 * width, 3 * _SCALE) * _SCALE
+    four_fifths = _tdiv(4 * width, 5 * _SCALE) * _SCALE
+
+    at_right = (xmax == bwidth)
+    remainder = np.where(ok, xmax - xmin, 0)
+    p0 = np.where(at_right & (remainder > halfwidth), xmax + halfwidth - cutpass,
+                  _np_round_scaled(xmax - halfwidth) * _SCALE)
+    p1 = _np_round_scaled(xmin + halfwidth) * _SCALE
+
+    # Each pass is stored as a column of values, with a mask of the cuts that have it
+    values = [_np_tdiv(p0, _SCALE)]
+    masks = [ok & (xmax <= bwidth) & ((xmin - (p0 - halfwidth) < 1) | (xmin == 0))]
+
+    active = remainder > 0
+    while active.any():
+        remainder = np.where(active, p0 - p1, remainder)
+        add = active & (p0 != p1) & (((p1 + halfwidth) - xmax < 1) | at_right)
+        p1 = np.where(add, _np_tdiv(p1, _SCALE) * _SCALE, p1)
+        values.append(p1 // _SCALE)
+        masks.append(add)
+        p1 = np.where(active,
+                      np.where(remainder <= two_thirds,
+                               p0 - _np_tdiv(remainder, 2 * _SCALE) * _SCALE,
+                               p1 + cutpass),
+                      p1)
+        remainder = np.where(active & (remainder < four_fifths), 0, remainder)
+        active &= (remainder > 0)
+
+    values = np.column_stack(values)
+    masks = np.column_stack(masks)
+
+    # error checking
+    p = values * _SCALE
+    bad = (((xmin > 0)[:, None] & ((xmin[:, None] - (p - halfwidth)) > 1)) |
+           ((xmax < bwidth)[:, None] & (((p + halfwidth) - xmax[:, None]) > 1))) & masks
+    ok &= ~bad.any(axis=1)
+
+    # sort the passes of each cut, with the missing passes at the end
+    values = np.where(masks, values, np.iinfo(np.int64).max)
+    values.sort(axis=1)
+    counts = masks.sum(axis=1)
+    for (i, (c, board)) in enumerate(all_cuts):
+        if ok[i]:
+            c.passes = values[i, :counts[i]].tolist()
+        else:
+            c.make_router_passes(bit, board)
+
+
 def adjoining_cuts(cuts, bit, board):
     '''
     Given the cuts on an edge, computes the cuts on the adjoining edge.
@@ -711,36 +1069,184 @@ def caul_cuts(cuts, bit, board, trim):
     for c in cuts:
         xmin = max(0, c.xmin - trim)
         xmax = min(board.width, c.xmax + trim)
-        cut = Cut(xmin, xmax)
-        cut.make_router_passes(bit, board)
-        new_cuts.append(cut)
+        new_cuts.append(Cut(xmin, xmax))
+    edge_router_passes([(new_cuts, board)], bit)
     return new_cuts
 
 
-def cut_boards(boards, bit, spacing):
+class Joint_Cache(object):
     '''
-    Determines the cuts for each board for the given bit and spacing
+    Bounded least-recently-used cache of the cuts computed by cut_boards(),
+    so that redrawing an unchanged joint does not recompute them.
+
+    The key is formed from the bit and board dimensions and the cuts of the
+    spacing (Board-A bottom cuts), which every spacing algorithm reduces to.
+    The value holds the passes of the spacing cuts and the adjoining Cut
+    lists of the other edges, which are shared by every hit.
+
+    On a miss, the most recently used joint with the same bit and boards
+    donates the passes of its cuts that are unchanged, so that editing a few
+    cuts only computes the passes of the cuts that changed.
+
+    Attributes:
+
+    maxsize: Maximum number of joints stored
+    hits: Number of lookups found in the cache
+    misses: Number of lookups not found in the cache
+    reused: Number of cuts whose passes were donated on a miss
+    computed: Number of cuts whose passes were computed on a miss
+    '''
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.reused = 0
+        self.computed = 0
+
+    @staticmethod
+    def key(boards, bit, spacing):
+        '''Returns the cache key of the joint'''
+        return ((bit.width_f, bit.midline, bit.bit_gentle),
+                tuple((b.width, b.dheight, b.active) for b in boards),
+                tuple((c.xmin, c.xmax) for c in spacing.cuts))
+
+    def get(self, key):
+        '''
+        Returns (passes, edges) stored for key, or None if key is not stored.
+        '''
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def peek(self, key):
+        '''
+        Returns (passes, edges) stored for key, or None, without counting a
+        hit or miss or marking key as used.
+        '''
+        return self.entries.get(key)
+
+    def donors(self, key):
+        '''
+        Returns a list, for each edge of the joint, of dictionaries of
+        (xmin, xmax) to the passes of the cuts on that edge in the most
+        recently used joint.  Returns None if that joint has a different bit
+        or boards than key.
+        '''
+        if not self.entries:
+            return None
+        last = next(reversed(self.entries))
+        if last[0:2] != key[0:2]:
+            return None
+        (passes, edges) = self.entries[last]
+        donors = [dict(zip(last[2], passes))]
+        for cuts in edges:
+            donors.append(dict(((c.xmin, c.xmax), c.passes) for c in cuts))
+        return donors
+
+    def put(self, key, passes, edges):
+        '''
+        Stores the passes of the spacing cuts and the other edges' Cut lists
+        for key, evicting the least-recently used joint if full.
+        '''
+        self.entries[key] = (passes, edges)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self):
+        '''Removes all of the stored joints'''
+        self.entries.clear()
+
+    def stats(self):
+        '''Returns a string summary of the cache statistics'''
+        return 'joint cache: %d hits, %d misses, %d of %d stored, %d cuts reused, %d computed' % \
+            (self.hits, self.misses, len(self.entries), self.maxsize, self.reused, self.computed)
+
+
+# Cache used by cut_boards()
+joint_cache = Joint_Cache()
+
+
+def joint_edges(boards, bit, cuts):
+    '''
+    Returns a list of (cuts, board) for each edge of the joint, starting
+    with the spacing cuts on the top board, without their router passes.
     '''
     # determine all the cuts from the A-cuts (index 0) on the top board.
-    last = spacing.cuts
-    boards[0].set_bottom_cuts(last, bit)
+    # The adjoining cuts do not depend on the router passes.
+    last = cuts
+    edges = [(last, boards[0])]
 
     if boards[3].active:
         # double-double case
         top = adjoining_cuts(last, bit, boards[0])
-        boards[3].set_top_cuts(top, bit)
+        edges.append((top, boards[3]))
         last = adjoining_cuts(top, bit, boards[3])
-        boards[3].set_bottom_cuts(last, bit)
+        edges.append((last, boards[3]))
     if boards[2].active:
         # double and double-double
         top = adjoining_cuts(last, bit, boards[0])
-        boards[2].set_top_cuts(top, bit)
+        edges.append((top, boards[2]))
         last = adjoining_cuts(top, bit, boards[2])
-        boards[2].set_bottom_cuts(last, bit)
+        edges.append((last, boards[2]))
 
     # make the top cuts on the bottom board
     top = adjoining_cuts(last, bit, boards[1])
-    boards[1].set_top_cuts(top, bit)
+    edges.append((top, boards[1]))
+    return edges
+
+
+def cut_boards(boards, bit, spacing):
+    '''
+    Determines the cuts for each board for the given bit and spacing
+    '''
+    key = Joint_Cache.key(boards, bit, spacing)
+    value = joint_cache.get(key)
+    if value is None:
+        # the passes for all of the edges are made at once
+        edges = joint_edges(boards, bit, spacing.cuts)
+
+        # only compute the passes of cuts that differ from the last joint
+        donors = joint_cache.donors(key)
+        if donors is None:
+            todo = edges
+        else:
+            todo = []
+            for ((cuts, board), donor) in zip(edges, donors):
+                missing = []
+                for c in cuts:
+                    passes = donor.get((c.xmin, c.xmax))
+                    if passes is None:
+                        missing.append(c)
+                    else:
+                        c.passes = passes
+                if missing:
+                    todo.append((missing, board))
+        ncomputed = sum(len(cuts) for (cuts, dummy_board) in todo)
+        joint_cache.computed += ncomputed
+        joint_cache.reused += sum(len(cuts) for (cuts, dummy_board) in edges) - ncomputed
+        edge_router_passes(todo, bit)
+        edges = [cuts for (cuts, dummy_board) in edges[1:]]
+        joint_cache.put(key, [c.passes for c in spacing.cuts], edges)
+    else:
+        # the spacing cuts may be new objects, so restore their passes
+        (passes, edges) = value
+        for (c, p) in zip(spacing.cuts, passes):
+            c.passes = p
+
+    boards[0].set_bottom_cuts(spacing.cuts, bit, False)
+    i = 0
+    for b in [boards[3], boards[2]]:
+        if b.active:
+            b.set_top_cuts(edges[i], bit, False)
+            b.set_bottom_cuts(edges[i + 1], bit, False)
+            i += 2
+    boards[1].set_top_cuts(edges[i], bit, False)
 
 
 class Joint_Geometry(object):
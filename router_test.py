@@ -0,0 +1,369 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for router.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import copy
+import math
+import pickle
+import random
+import unittest
+from decimal import Decimal
+
+from future.utils import lrange
+
+import utils
+import router
+import spacing
+import job_runner
+
+
+def joint_jobs():
+    '''
+    Returns a grid of manifest jobs over English/metric units, straight/dovetail
+    bits, single/double/double-double boards, and both spacing algorithms.
+    '''
+    jobs = []
+    english = {'metric': False, 'bit_width': '1/2', 'board_widths': ['3', '5 1/4', '7 1/2', '12'],
+               'depths': ['3/4', '3/8'], 'double': '1/8'}
+    metric = {'metric': True, 'bit_width': 12.7, 'board_widths': [80, 135, 200, 301],
+              'depths': [12, 9.5], 'double': 4}
+    for u in [english, metric]:
+        for angle in [0, 7, 14]:
+            for (depth, w) in zip(u['depths'] * 2, u['board_widths']):
+                for nd in range(3):
+                    base = {'metric': u['metric'], 'board_width': w, 'bit_width': u['bit_width'],
+                            'bit_depth': depth, 'bit_angle': angle}
+                    if nd > 0:
+                        base['double_thickness'] = u['double']
+                    if nd > 1:
+                        base['double_double_thickness'] = u['double']
+                    for centered in [True, False]:
+                        job = dict(base, es_centered=centered)
+                        jobs.append(job)
+                    jobs.append(dict(base, spacing='variable'))
+                    jobs.append(dict(base, spacing='variable', vs_inverted=True))
+    return jobs
+
+
+def all_cuts(boards):
+    '''Returns the (xmin, xmax, passes) of every cut on every active board'''
+    r = []
+    for b in boards:
+        if b.active:
+            for cuts in [b.top_cuts, b.bottom_cuts]:
+                if cuts is not None:
+                    r.append([(c.xmin, c.xmax, list(c.passes)) for c in cuts])
+    return r
+
+
+class Numeric_Engine_Test(unittest.TestCase):
+    '''
+    Cross-checks the integer and numpy engines for router passes against the
+    Decimal engine
+    '''
+    def setUp(self):
+        utils.init_decimal_context()
+        self.engine = router.get_numeric_engine()
+
+    def tearDown(self):
+        router.set_numeric_engine(self.engine)
+
+    def joint_cuts(self, engine, job):
+        router.set_numeric_engine(engine)
+        factory = job_runner.Joint_Factory()
+        try:
+            (dummy_bit, boards, dummy_sp) = job_runner.evaluate_job(job, factory)
+        except (router.Router_Exception, spacing.Spacing_Exception) as e:
+            return str(e)
+        return all_cuts(boards)
+
+    def test_joints(self):
+        jobs = joint_jobs()
+        for job in jobs:
+            expected = self.joint_cuts('decimal', job)
+            for engine in router.NUMERIC_ENGINES[1:]:
+                self.assertEqual(expected, self.joint_cuts(engine, job), engine + str(job))
+
+    def test_random_cuts(self):
+        rng = random.Random(2018)
+        units = utils.Units(' ', False, 32, utils.Null_Translator())
+        for angle in [0, 7, 9, 14]:
+            for gentle in [33., 25., 50.]:
+                bit = router.Router_Bit(units, 16, 12, angle, gentle)
+                board = router.Board(bit, 240)
+                for _ in range(100):
+                    # an edge of half and quarter increments, including some invalid cuts
+                    edge = []
+                    for _ in range(rng.randint(1, 8)):
+                        xmin = Decimal(rng.randint(-4, 900)) / 4
+                        xmax = xmin + Decimal(rng.randint(-2, 300)) / 2
+                        if rng.random() < 0.1:
+                            xmin = Decimal(0)
+                        if rng.random() < 0.1:
+                            xmax = Decimal(board.width)
+                        edge.append((xmin, xmax))
+                    r = []
+                    for engine in router.NUMERIC_ENGINES:
+                        router.set_numeric_engine(engine)
+                        cuts = [router.Cut(xmin, xmax) for (xmin, xmax) in edge]
+                        try:
+                            router.edge_router_passes([(cuts, board)], bit)
+                            e = None
+                        except router.Router_Exception as ex:
+                            e = str(ex)
+                        r.append(([c.passes for c in cuts], e))
+                    for ri in r[1:]:
+                        self.assertEqual(r[0], ri, str(edge))
+
+    def test_numpy_edges(self):
+        if 'numpy' not in router.NUMERIC_ENGINES:
+            return
+        # many edges at once, so that the numpy arrays are used
+        units = utils.Units(' ', True, 1, utils.Null_Translator())
+        for angle in [0, 14]:
+            bit = router.Router_Bit(units, 12, 10, angle)
+            boards = [router.Board(bit, w) for w in [150, 301, 999, 1000]]
+            r = []
+            for engine in router.NUMERIC_ENGINES:
+                router.set_numeric_engine(engine)
+                edges = []
+                for b in boards:
+                    cuts = []
+                    x = Decimal(0)
+                    while x + 20 < b.width:
+                        cuts.append(router.Cut(x, x + 15 + x % 7 + bit.overhang))
+                        x += 30
+                    edges.append((cuts, b))
+                router.edge_router_passes(edges, bit)
+                r.append([c.passes for (cuts, b) in edges for c in cuts])
+            self.assertTrue(len(r[0]) >= router._NUMPY_MIN_CUTS)
+            for ri in r[1:]:
+                self.assertEqual(r[0], ri)
+
+    def test_bad_engine(self):
+        self.assertRaises(ValueError, router.set_numeric_engine, 'float')
+
+
+def polygon_area(x, y):
+    '''Returns the area of the polygon with vertices (x, y)'''
+    (x, y) = ([float(xi) for xi in x], [float(yi) for yi in y])
+    return abs(sum(x[k - 1] * y[k] - x[k] * y[k - 1] for k in lrange(len(x)))) / 2
+
+
+def star_polygon(rng, n):
+    '''
+    Returns the (x, y) of a random polygon of n vertices, at multiples of 6
+    degrees around the origin, which has many distinct y-coordinates
+    '''
+    while True:
+        k = sorted(rng.sample(lrange(60), n))
+        if max((k[i] - k[i - 1]) % 60 for i in lrange(n)) < 30:
+            break
+    r = [rng.choice([5, 10, rng.randint(5, 10)]) for _ in k]
+    x = [round(ri * math.cos(ki * math.pi / 30), 1) for (ri, ki) in zip(r, k)]
+    y = [round(ri * math.sin(ki * math.pi / 30), 1) for (ri, ki) in zip(r, k)]
+    return (x, y)
+
+
+def comb_polygon(rng, n):
+    '''
+    Returns the (x, y) of a random polygon whose top and bottom edges are n
+    horizontal steps, like the fingers of a board, in either direction
+    '''
+    xs = sorted(rng.sample(lrange(100), n + 1))
+    (x, y) = ([], [])
+    for i in lrange(n):
+        h = rng.randint(5, 9)
+        x.extend([xs[i], xs[i + 1]])
+        y.extend([h, h])
+    for i in reversed(lrange(n)):
+        h = rng.randint(0, 4)
+        x.extend([xs[i + 1], xs[i]])
+        y.extend([h, h])
+    if rng.random() < 0.5:
+        x.reverse()
+        y.reverse()
+    return (x, y)
+
+
+class Triangulate_Test(unittest.TestCase):
+    '''
+    Tests triangulate_polygon(), with and without numpy
+    '''
+    def setUp(self):
+        utils.init_decimal_context()
+        self.np = router.np
+        self.min_vertices = router._NUMPY_MIN_VERTICES
+
+    def tearDown(self):
+        router.np = self.np
+        router._NUMPY_MIN_VERTICES = self.min_vertices
+
+    def triangulate(self, x, y):
+        '''
+        Returns triangulate_polygon(x, y) as lists, after checking that the
+        triangles are counterclockwise, their areas sum to the polygon area,
+        and numpy gives the same result
+        '''
+        r = []
+        for np in [self.np, None]:
+            router.np = np
+            router._NUMPY_MIN_VERTICES = 0
+            (v, t) = router.triangulate_polygon(x, y)
+            r.append(([list(p) for p in v], [list(tri) for tri in t]))
+        (v, t) = r[-1]
+        self.assertEqual(r[0], r[-1])
+        areas = [((v[b][0] - v[a][0]) * (v[c][1] - v[a][1]) -
+                  (v[b][1] - v[a][1]) * (v[c][0] - v[a][0])) / 2 for (a, b, c) in t]
+        self.assertTrue(min(areas) > 0)
+        self.assertAlmostEqual(sum(areas), polygon_area(x, y), 9)
+        return (v, t)
+
+    def test_random_polygons(self):
+        rng = random.Random(2018)
+        for n in lrange(3, 40):
+            for f in [star_polygon, comb_polygon]:
+                (x, y) = f(rng, n)
+                (v, dummy_t) = self.triangulate(x, y)
+                # the polygon vertices, in order, with the edges split
+                points = []
+                for p in zip(x, y):
+                    if not points or p != points[-1]:
+                        points.append(p)
+                self.assertEqual([p for p in v if tuple(p) in points], [list(p) for p in points])
+
+    def test_boards(self):
+        factory = job_runner.Joint_Factory()
+        for job in joint_jobs()[::5]:
+            try:
+                (bit, boards, sp, dummy_config) = factory.make_joint(job)
+                router.cut_boards(boards, bit, sp)
+            except (router.Router_Exception, spacing.Spacing_Exception):
+                continue
+            for b in boards:
+                if b.active:
+                    self.triangulate(*b.perimeter(bit))
+
+    def test_degenerate(self):
+        for np in [self.np, None]:
+            router.np = np
+            for (x, y) in [([], []), ([0, 1], [0, 0]), ([0, 1, 2, 0], [0, 0, 0, 0])]:
+                self.assertEqual(len(router.triangulate_polygon(x, y)[1]), 0)
+
+
+class Joint_Cache_Test(unittest.TestCase):
+    '''
+    Tests the cache used by cut_boards()
+    '''
+    def setUp(self):
+        utils.init_decimal_context()
+
+    def test_hits(self):
+        factory = job_runner.Joint_Factory()
+        (bit, boards, sp, dummy_config) = factory.make_joint({'double_thickness': '1/8'})
+        cache = router.joint_cache
+        router.cut_boards(boards, bit, sp)
+        expected = all_cuts(boards)
+        (hits, misses) = (cache.hits, cache.misses)
+        # new spacing cuts, with no passes yet, for the same joint
+        sp.set_cuts()
+        router.cut_boards(boards, bit, sp)
+        self.assertEqual((cache.hits, cache.misses), (hits + 1, misses))
+        self.assertEqual(all_cuts(boards), expected)
+        # changing the bit invalidates the cache
+        bit.set_width_from_string('3/8')
+        self.assertEqual(len(cache.entries), 0)
+        sp = spacing.Equally_Spaced(bit, boards, sp.config)
+        sp.set_cuts()
+        router.cut_boards(boards, bit, sp)
+        self.assertEqual(cache.misses, misses + 1)
+        self.assertNotEqual(all_cuts(boards), expected)
+
+    def test_edit(self):
+        # moving one cut in the editor only computes the passes of the changed cuts
+        factory = job_runner.Joint_Factory()
+        (bit, boards, sp, config) = factory.make_joint({'double_thickness': '1/8',
+                                                        'double_double_thickness': '1/8'})
+        edit = spacing.Edit_Spaced(bit, boards, config)
+        edit.set_cuts(sp.cuts)
+        cache = router.joint_cache
+        router.cut_boards(boards, bit, edit)
+        edit.active_cuts = [1]
+        for move in [edit.cut_move_left, edit.cut_move_left, edit.cut_widen_right,
+                     edit.cut_trim_left, edit.cut_add, edit.cut_move_right]:
+            move()
+            (reused, computed) = (cache.reused, cache.computed)
+            router.cut_boards(boards, bit, edit)
+            self.assertTrue(cache.reused > reused)
+            incremental = all_cuts(boards)
+            ncuts = sum(len(cuts) for cuts in incremental)
+            self.assertTrue(cache.computed - computed < ncuts // 2)
+            cache.invalidate()
+            router.cut_boards(boards, bit, edit)
+            self.assertEqual(incremental, all_cuts(boards))
+
+    def test_lru(self):
+        cache = router.Joint_Cache(maxsize=2)
+        for k in [1, 2, 1, 3]:
+            if cache.get(k) is None:
+                cache.put(k, [], [])
+        self.assertEqual(list(cache.entries.keys()), [1, 3])
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+
+class Slots_Test(unittest.TestCase):
+    '''
+    Tests the __slots__ classes
+    '''
+    # A list of one Cut, pickled by the dictionary-based Cut, with protocols 0 and 2
+    legacy = [b'(lp0\nccopy_reg\n_reconstructor\np1\n(crouter\nCut\np2\nc__builtin__\nobject\np3\n'
+              b'Ntp4\nRp5\n(dp6\nVxmin\np7\ncdecimal\nDecimal\np8\n(V3.5\np9\ntp10\nRp11\n'
+              b'sVxmax\np12\ng8\n(V20\np13\ntp14\nRp15\nsVpasses\np16\n(lp17\nI4\naI8\nas'
+              b'Vprecision\np18\ng8\n(V0.01\np19\ntp20\nRp21\nsba.',
+              b'\x80\x02]q\x00crouter\nCut\nq\x01)\x81q\x02}q\x03(X\x04\x00\x00\x00xminq\x04'
+              b'cdecimal\nDecimal\nq\x05X\x03\x00\x00\x003.5q\x06\x85q\x07Rq\x08X\x04\x00\x00'
+              b'\x00xmaxq\th\x05X\x02\x00\x00\x0020q\n\x85q\x0bRq\x0cX\x06\x00\x00\x00passesq'
+              b'\r]q\x0e(K\x04K\x08eX\t\x00\x00\x00precisionq\x0fh\x05X\x04\x00\x00\x000.01q'
+              b'\x10\x85q\x11Rq\x12uba.']
+
+    def test_no_dict(self):
+        units = utils.Units(' ', False, 32, utils.Null_Translator())
+        bit = router.Router_Bit(units, 16, 24)
+        for obj in [router.Cut(0, 16), router.Board(bit, 240), router.My_Rectangle(0, 0, 1, 1)]:
+            self.assertFalse(hasattr(obj, '__dict__'))
+            self.assertRaises(AttributeError, setattr, obj, 'not_an_attribute', 0)
+
+    def test_pickle(self):
+        for s in self.legacy:
+            [c] = pickle.loads(s)
+            self.assertEqual((c.xmin, c.xmax, c.passes), (Decimal('3.5'), 20, [4, 8]))
+        for protocol in lrange(pickle.HIGHEST_PROTOCOL + 1):
+            c = pickle.loads(pickle.dumps(c, protocol))
+            self.assertEqual((c.xmin, c.xmax, c.passes), (Decimal('3.5'), 20, [4, 8]))
+        c = copy.deepcopy(c)
+        self.assertEqual((c.xmin, c.xmax, c.passes), (Decimal('3.5'), 20, [4, 8]))
+
+
+if __name__ == '__main__':
+    unittest.main()
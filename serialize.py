@@ -19,11 +19,30 @@
 ###########################################################################
 
 '''
-Contains serialization capability
+Contains serialization capability.
+
+A joint is serialized as lines of canonical JSON.  The first line is the
+header, with the format and code versions, units, bit, and boards, so that
+these may be read without reading the spacing.  The second line is the
+spacing, with the parameter values of the Equal and Variable spacings, or
+the cuts of the Edit spacing.  Dimensions are in increments.  Integral
+values are JSON integers, and other Decimal values are strings, so that
+they are exact.
+
+An optional third line holds the cuts and router passes computed for every
+edge, with the router.ALGORITHM_VERSION and a hash of the first two lines.
+When these match, unserialize() stores the cuts in router.joint_cache, so
+that cut_boards() does not recompute them.
+
+Joints saved before FORMAT_VERSION 1 were a series of pickles.  These are
+still read, allowing only the classes that were pickled.
 '''
 from __future__ import print_function
 import binascii
+import hashlib
+import json
 import pickle
+from decimal import Decimal
 from io import BytesIO
 
 from future.utils import lrange
@@ -31,12 +50,191 @@ import router
 import utils
 import spacing
 
+# Version of the serialized format.  Increment this when the format changes.
+FORMAT_VERSION = 1
+
+
+class Serialize_Exception(Exception):
+    '''
+    Exception handler for serialized joints that cannot be read
+    '''
+    def __init__(self, msg):
+        Exception.__init__(self, msg)
+        self.msg = msg
+
+    def __str__(self):
+        return self.msg
+
+
+# The errors raised while reading a damaged joint, such as malformed JSON, a
+# missing key, a bad Decimal string, or a truncated pickle
+_DECODE_ERRORS = (ValueError, KeyError, IndexError, TypeError, AttributeError, ArithmeticError,
+                  EOFError, pickle.UnpicklingError)
+
+
+def _decode_error(e):
+    '''Returns a Serialize_Exception for the error e, raised while reading a joint'''
+    return Serialize_Exception('The joint is damaged and cannot be read (%s: %s)' %
+                               (type(e).__name__, e))
+
+
+def _check_format(header):
+    '''Raises Serialize_Exception if the JSON header is not of FORMAT_VERSION'''
+    if header.get('format') != FORMAT_VERSION:
+        raise Serialize_Exception('The joint was saved in format %s by pyRouterJig %s, but'
+                                  ' this version reads only format %d.  Upgrade pyRouterJig'
+                                  ' to open it.' % (header.get('format'), header.get('version'),
+                                                    FORMAT_VERSION))
+
+
+def _number(x):
+    '''Returns x as an int if it is integral, otherwise as a string'''
+    # exact type tests are faster than isinstance() for the many Decimals
+    t = type(x)
+    if t is int or t is bool or t is float or x is None:
+        return x
+    i = int(x)
+    if i == x:
+        return i
+    return str(x)
+
+
+def _value(x):
+    '''Inverse of _number()'''
+    if type(x) is str:
+        return Decimal(x)
+    return x
+
+
+# Encoder of canonical JSON: sorted keys, with no whitespace
+_encoder = json.JSONEncoder(sort_keys=True, separators=(',', ':'))
+
+# The header, board, and spacing in canonical JSON, with their keys in sorted
+# order, for _json() values.  Filling these in is about three times faster
+# than _encoder for the header, which is most of the cost of serialize().
+_HEADER = ('{"bit":{"angle":%s,"depth":%s,"gentle":%s,"width":%s},"boards":[%s],'
+           '"format":%s,"metric":%s,"num_increments":%s,"version":%s}')
+_BOARD = '{"active":%s,"dheight":%s,"height":%s,"width":%s,"wood":%s}'
+_PARAMS = '{"params":{%s},"type":%s}'
+_CUTS = '{"cuts":[%s],"type":%s}'
+_encode_string = json.encoder.encode_basestring_ascii
+
+
+def _json(x):
+    '''Returns _number(x) in canonical JSON, as _encoder would'''
+    t = type(x)
+    if t is int:
+        return str(x)
+    if t is str:
+        return _encode_string(x)
+    if x is True:
+        return 'true'
+    if x is False:
+        return 'false'
+    if t is Decimal:
+        i = int(x)
+        if i == x:
+            return str(i)
+        return '"%s"' % x
+    return _encoder.encode(x)
+
+
 
 def serialize(bit, boards, sp, config):
     '''
     Serializes the arguments. Returns the serialized string, which can
     later be used to reconstruct the arguments using unserialize()
     '''
+    units = bit.units
+    header = _HEADER % (_json(bit.angle), _json(bit.depth), _json(bit.bit_gentle),
+                        _json(bit.width),
+                        ','.join([_BOARD % (_json(b.active), _json(b.dheight), _json(b.height),
+                                            _json(b.width), _json(b.wood)) for b in boards]),
+                        _json(FORMAT_VERSION), _json(units.metric),
+                        _json(units.num_increments), _json(utils.VERSION))
+    sp_type = sp.description[0:4]
+    if config.debug:
+        print('serialize', sp_type)
+    if sp_type == 'Edit':
+        body = _CUTS % (','.join(['[%s,%s]' % (_json(c.xmin), _json(c.xmax)) for c in sp.cuts]),
+                        _json(sp_type))
+    else:
+        body = _PARAMS % (','.join(['%s:%s' % (_json(k), _json(sp.params[k].v))
+                                    for k in sorted(sp.params)]), _json(sp_type))
+    s = header + '\n' + body
+    if config.save_cuts:
+        try:
+            s += '\n' + _encoder.encode(_computed_cuts(_digest(s), bit, boards, sp, config))
+        except router.Router_Exception:
+            # the joint is saved, but its cuts are recomputed when opened
+            pass
+    if config.debug:
+        print('size of serialized joint', len(s))
+    return s
+
+
+def _digest(s):
+    '''Returns the hash of the header and spacing lines s'''
+    return hashlib.sha256(s.encode('utf-8')).hexdigest()
+
+
+def _computed_cuts(digest, bit, boards, sp, config):
+    '''
+    Returns a dictionary of the cuts and router passes on each edge of the
+    joint, as computed by router.cut_boards(), for the header and spacing
+    lines with the given digest.  The cuts are those in router.joint_cache,
+    if the joint has been cut, and are otherwise computed on new Cut
+    objects, so that neither the boards nor the cache are changed.
+    '''
+    value = router.joint_cache.peek(router.Joint_Cache.key(boards, bit, sp))
+    if value is None:
+        cuts = [router.Cut(c.xmin, c.xmax) for c in sp.cuts]
+        edges = router.joint_edges(boards, bit, cuts)
+        router.edge_router_passes(edges, bit)
+        passes = [c.passes for c in cuts]
+        edges = [cuts for (cuts, dummy_board) in edges[1:]]
+    else:
+        (passes, edges) = value
+    return {'algorithm': router.ALGORITHM_VERSION,
+            'hash': digest,
+            'min_finger_width': config.min_finger_width,
+            'edges': [[[_number(c.xmin), _number(c.xmax)] for c in cuts]
+                      for cuts in [sp.cuts] + edges],
+            'passes': [passes] + [[c.passes for c in cuts] for cuts in edges]}
+
+
+def _saved_edges(computed, digest, boards, config):
+    '''
+    Returns a list of the Cut lists, with their router passes, of each edge
+    of the joint, from the dictionary computed of _computed_cuts().
+    Returns None if these are not valid for the boards, the config, and the
+    header and spacing lines with the given digest.
+    '''
+    if computed.get('algorithm') != router.ALGORITHM_VERSION or \
+       computed.get('hash') != digest or \
+       computed.get('min_finger_width') != config.min_finger_width:
+        return None
+    (saved, passes) = (computed.get('edges'), computed.get('passes'))
+    # the top and bottom boards, and both edges of each double board
+    nedges = 2 + 2 * boards[2].active + 2 * boards[3].active
+    if saved is None or passes is None or len(saved) != nedges or \
+       [len(cuts) for cuts in saved] != [len(p) for p in passes]:
+        return None
+    edges = []
+    for (bounds, ps) in zip(saved, passes):
+        cuts = []
+        for ((xmin, xmax), p) in zip(bounds, ps):
+            c = router.Cut(_value(xmin), _value(xmax))
+            c.passes = p
+            cuts.append(c)
+        edges.append(cuts)
+    return edges
+
+
+def serialize_legacy(bit, boards, sp, config):
+    '''
+    Serializes the arguments in the pickle format used before FORMAT_VERSION 1.
+    '''
     out = BytesIO()
 
     p = pickle.Pickler(out)
@@ -76,19 +274,74 @@ def serialize(bit, boards, sp, config):
     return ret
 
 
-def unserialize(s, config, newformat=False, transl=None):
+def is_legacy(s):
+    '''Returns True if s was serialized in the pickle format'''
+    return not s.startswith('{')
+
+
+class Legacy_Unpickler(pickle.Unpickler):
     '''
-    Unserializes the string s, and returns the tuple (bit, boards, spacing)
+    Unpickler of joints saved in the pickle format, that only creates the
+    classes that were pickled.
     '''
+    # The strings of the future package, with which Python 2 pickled the
+    # wood names, are created as str
+    renamed = {('future.types.newstr', 'newstr'): str,
+               ('future.types.newbytes', 'newbytes'): str}
+    allowed = [('router', 'Cut'),
+               ('spacing', 'Spacing_Param'),
+               ('decimal', 'Decimal'),
+               ('copy_reg', '_reconstructor'),
+               ('copyreg', '_reconstructor'),
+               ('__builtin__', 'object'),
+               ('builtins', 'object'),
+               ('__builtin__', 'unicode'),
+               ('__builtin__', 'str'),
+               ('builtins', 'str')]
+
+    def find_class(self, module, name):
+        if (module, name) in self.renamed:
+            return self.renamed[(module, name)]
+        if (module, name) not in self.allowed:
+            raise pickle.UnpicklingError('%s.%s is not allowed in a saved joint' % (module, name))
+        return pickle.Unpickler.find_class(self, module, name)
+
+
+def _legacy_unpickler(s, newformat):
+    '''Returns an unpickler of the legacy string s'''
     # new format uue encoding support
     if newformat:
         s = binascii.a2b_qp(s)
     else:
         s = s.encode()
+    return Legacy_Unpickler(BytesIO(s))
+
+
+def _make_header(header, config, transl):
+    '''Returns (bit, boards) from the header dictionary'''
+    _check_format(header)
+    units = utils.Units(config.english_separator, header['metric'], header['num_increments'],
+                        transl)
+    b = header['bit']
+    bit = router.Router_Bit(units, _value(b['width']), _value(b['depth']), _value(b['angle']),
+                            _value(b['gentle']))
+    boards = []
+    for d in header['boards']:
+        board = router.Board(bit, 10)  # dummy width argument, for now
+        board.width = _value(d['width'])
+        board.height = _value(d['height'])
+        board.wood = d['wood']
+        board.active = d['active']
+        board.dheight = _value(d['dheight'])
+        boards.append(board)
+    return (bit, boards)
 
-    inp = BytesIO(s)
 
-    u = pickle.Unpickler(inp)
+def _load_legacy_header(u, config, transl):
+    '''
+    Loads (bit, boards) from the legacy unpickler u, which is left positioned
+    at the spacing
+    '''
     version = u.load()
     if config.debug:
         print('unserialized version:', version)
@@ -112,21 +365,153 @@ def unserialize(s, config, newformat=False, transl=None):
         b.wood = u.load()
         b.active = u.load()
         b.dheight = u.load()
+    return (bit, boards)
+
+
+def unserialize_header(s, config, newformat=False, transl=None):
+    '''
+    Unserializes only the units, bit, and boards of the string s, and
+    returns the tuple (bit, boards).  The spacing is not read.  Raises
+    Serialize_Exception if s cannot be read.
+    '''
+    try:
+        if is_legacy(s):
+            return _load_legacy_header(_legacy_unpickler(s, newformat), config, transl)
+        return _make_header(json.loads(s[:s.index('\n')]), config, transl)
+    except _DECODE_ERRORS as e:
+        raise _decode_error(e)
+
+
+def describe(s, newformat=False):
+    '''
+    Returns a dictionary describing the serialized joint s, without creating
+    the joint.  The keys are those of the JSON header (version, metric,
+    num_increments, bit, and boards), plus spacing, the spacing type, and
+    params, the dictionary of spacing parameter values.  For the Edit
+    spacing, params is {'cuts': number of cuts}.  Dimensions are in
+    increments, as numbers or strings.  Raises Serialize_Exception if s
+    cannot be read.
+
+    newformat: For legacy strings, True if s is quoted-printable encoded
+    '''
+    try:
+        return _describe(s, newformat)
+    except _DECODE_ERRORS as e:
+        raise _decode_error(e)
+
+
+def _describe(s, newformat):
+    '''Returns describe(s, newformat), raising any error of reading s'''
+    if not is_legacy(s):
+        lines = s.split('\n')
+        d = json.loads(lines[0])
+        _check_format(d)
+        body = json.loads(lines[1])
+        d['spacing'] = body['type']
+        if body['type'] == 'Edit':
+            d['params'] = {'cuts': len(body['cuts'])}
+        else:
+            d['params'] = body['params']
+        return d
+    u = _legacy_unpickler(s, newformat)
+    d = {'format': 0}
+    for k in ['version', 'metric', 'num_increments']:
+        d[k] = u.load()
+    d['bit'] = {}
+    for k in ['width', 'depth', 'angle']:
+        d['bit'][k] = _number(u.load())
+    boards = [{} for _ in lrange(u.load())]
+    for b in boards:
+        for k in ['width', 'height', 'wood', 'active', 'dheight']:
+            b[k] = u.load()
+            if k != 'wood':
+                b[k] = _number(b[k])
+    d['boards'] = boards
+    d['spacing'] = u.load()
+    if d['spacing'] == 'Edit':
+        d['params'] = {'cuts': len(u.load())}
+    else:
+        d['params'] = dict((k, _number(p.v)) for (k, p) in u.load().items())
+    return d
+
+
+def unserialize(s, config, newformat=False, transl=None):
+    '''
+    Unserializes the string s, and returns the tuple (bit, boards, spacing, sp_type).
+    Raises Serialize_Exception if s cannot be read.
+
+    newformat: For legacy strings, True if s is quoted-printable encoded
+    '''
+    try:
+        return _unserialize(s, config, newformat, transl)
+    except _DECODE_ERRORS as e:
+        raise _decode_error(e)
+
+
+def _unserialize(s, config, newformat, transl):
+    '''Returns unserialize(s, config, newformat, transl), raising any error of reading s'''
+    computed = None
+    if is_legacy(s):
+        u = _legacy_unpickler(s, newformat)
+        (bit, boards) = _load_legacy_header(u, config, transl)
+        sp_type = u.load()
+        if sp_type == 'Edit':
+            cuts = u.load()
+        else:
+            params = u.load()
+    else:
+        lines = s.split('\n')
+        (bit, boards) = _make_header(json.loads(lines[0]), config, transl)
+        body = json.loads(lines[1])
+        if len(lines) > 2:
+            computed = json.loads(lines[2])
+        sp_type = body['type']
+        if sp_type == 'Edit':
+            cuts = [router.Cut(_value(xmin), _value(xmax)) for (xmin, xmax) in body['cuts']]
+        else:
+            params = None
+            values = body['params']
+
+    # the cuts on every edge, if they were saved and are still valid
+    edges = None
+    if computed is not None:
+        edges = _saved_edges(computed, _digest(lines[0] + '\n' + lines[1]), boards, config)
+        if config.debug:
+            print('saved cuts used:', edges is not None)
+
     # form the spacing
-    sp_type = u.load()
     if sp_type == 'Edit':
         if config.debug:
             print('unserialized edit spacing')
-        cuts = u.load()
         sp = spacing.Edit_Spaced(bit, boards, config)
-        sp.set_cuts(cuts)
+        if edges is None:
+            sp.set_cuts(cuts)
+        else:
+            sp.set_cuts(edges[0])
     else:
         if sp_type == 'Equa':
             sp = spacing.Equally_Spaced(bit, boards, config)
         else:
             sp = spacing.Variable_Spaced(bit, boards, config)
-        sp.params = u.load()
+        if params is None:
+            for k in sp.keys:
+                sp.params[k].v = _value(values[k])
+            if sp_type == 'Vari':
+                # the Spacing limits depend on the Fingers and Inverted values
+                sp.calc_var_params()
+                sp.params['Spacing'].v = _value(values['Spacing'])
+        else:
+            sp.params = params
         if config.debug:
             print('unserialized ', sp_type, str(sp.params))
-        sp.set_cuts()
+        if edges is None:
+            sp.set_cuts()
+        else:
+            # the saved cuts are those that set_cuts() computes
+            sp.cuts = edges[0]
+            sp.set_labels()
+    if edges is not None:
+        # so that the first cut_boards() does not recompute them
+        router.joint_cache.put(router.Joint_Cache.key(boards, bit, sp),
+                               [c.passes for c in edges[0]], edges[1:])
     return (bit, boards, sp, sp_type)
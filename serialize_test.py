@@ -0,0 +1,262 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for serialize.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import binascii
+import json
+import pickle
+import unittest
+from io import BytesIO
+
+from future.types.newstr import newstr
+
+import utils
+import router
+import serialize
+import spacing
+import job_runner
+import router_test
+
+
+def cut_list(sp):
+    '''Returns the (xmin, xmax) of each cut of the spacing sp'''
+    return [(c.xmin, c.xmax) for c in sp.cuts]
+
+
+def protocol0(s):
+    '''Returns the quoted-printable legacy string s, as an unencoded protocol 0 pickle'''
+    u = pickle.Unpickler(BytesIO(binascii.a2b_qp(s)))
+    out = BytesIO()
+    p = pickle.Pickler(out, 0)
+    while True:
+        try:
+            p.dump(u.load())
+        except EOFError:
+            break
+    return out.getvalue().decode('ascii')
+
+
+class Serialize_Test(unittest.TestCase):
+    '''
+    Tests serialize and unserialize, in the current and legacy formats
+    '''
+    jobs = [{'double_thickness': '1/8'},
+            {'spacing': 'variable', 'vs_inverted': True, 'bit_angle': 7},
+            {'metric': True, 'board_width': 151, 'bit_width': 12, 'es_centered': False}]
+
+    def setUp(self):
+        utils.init_decimal_context()
+        self.factory = job_runner.Joint_Factory()
+        self.transl = utils.Null_Translator()
+
+    def joints(self):
+        '''Generator over (bit, boards, sp, config) of each job, and of an edited joint'''
+        for job in self.jobs:
+            (bit, boards, sp, config) = self.factory.make_joint(job)
+            yield (bit, boards, sp, config)
+        (bit, boards, sp, config) = self.factory.make_joint(self.jobs[0])
+        edit = spacing.Edit_Spaced(bit, boards, config)
+        edit.set_cuts(sp.cuts)
+        edit.active_cuts = [1]
+        edit.cut_move_left()
+        yield (bit, boards, edit, config)
+
+    def check(self, joint, r):
+        (bit, boards, sp, dummy_config) = joint
+        (rbit, rboards, rsp, sp_type) = r
+        self.assertEqual(sp_type, sp.description[0:4])
+        self.assertEqual((rbit.width, rbit.depth, rbit.angle, rbit.units.metric),
+                         (bit.width, bit.depth, bit.angle, bit.units.metric))
+        self.assertEqual([(b.width, b.height, b.active, b.dheight) for b in rboards],
+                         [(b.width, b.height, b.active, b.dheight) for b in boards])
+        self.assertEqual(cut_list(rsp), cut_list(sp))
+
+    def test_round_trip(self):
+        for joint in self.joints():
+            s = serialize.serialize(*joint)
+            config = joint[3]
+            self.check(joint, serialize.unserialize(s, config, True, self.transl))
+            # the serialized string is canonical
+            (rbit, rboards, rsp, dummy_sp_type) = serialize.unserialize(s, config, True, self.transl)
+            self.assertEqual(serialize.serialize(rbit, rboards, rsp, config), s)
+            for line in s.split('\n'):
+                self.assertEqual(serialize._encoder.encode(json.loads(line)), line)
+            header = json.loads(s.split('\n')[0])
+            self.assertEqual(header['format'], serialize.FORMAT_VERSION)
+
+    def test_saved_cuts(self):
+        cache = router.joint_cache
+        for joint in self.joints():
+            (bit, boards, sp, config) = joint
+            # saving neither cuts the boards nor uses the cache
+            cache.invalidate()
+            stats = (cache.hits, cache.misses, cache.reused, cache.computed)
+            s = serialize.serialize(*joint)
+            self.assertEqual([(b.top_cuts, b.bottom_cuts) for b in boards], [(None, None)] * 4)
+            self.assertEqual((cache.hits, cache.misses, cache.reused, cache.computed), stats)
+            self.assertEqual(len(cache.entries), 0)
+            router.cut_boards(boards, bit, sp)
+            expected = router_test.all_cuts(boards)
+            # the cuts of a joint that has been cut are read from the cache
+            self.assertEqual(serialize.serialize(*joint), s)
+            lines = s.split('\n')
+            self.assertEqual(len(lines), 3)
+            # the saved cuts are used when they match, without computing any
+            cache.invalidate()
+            calls = []
+            set_cuts = {}
+            for cls in [spacing.Equally_Spaced, spacing.Variable_Spaced]:
+                set_cuts[cls] = cls.set_cuts
+                cls.set_cuts = lambda sp: calls.append(sp)
+            try:
+                (rbit, rboards, rsp, dummy_sp_type) = \
+                    serialize.unserialize(s, config, True, self.transl)
+            finally:
+                for (cls, f) in set_cuts.items():
+                    cls.set_cuts = f
+            self.assertEqual(calls, [])
+            self.assertEqual(cut_list(rsp), cut_list(sp))
+            self.assertEqual((rsp.labels, rsp.description), (sp.labels, sp.description))
+            (hits, computed) = (cache.hits, cache.computed)
+            router.cut_boards(rboards, rbit, rsp)
+            self.assertEqual((cache.hits, cache.computed), (hits + 1, computed))
+            self.assertEqual(router_test.all_cuts(rboards), expected)
+            # and are recomputed otherwise
+            saved = json.loads(lines[2])
+            for (k, v) in [('hash', '0'), ('algorithm', router.ALGORITHM_VERSION + 1),
+                           ('min_finger_width', '1/4'), ('edges', saved['edges'][:-1]),
+                           ('passes', None)]:
+                t = '\n'.join(lines[0:2] + [json.dumps(dict(saved, **{k: v}))])
+                cache.invalidate()
+                (rbit, rboards, rsp, dummy_sp_type) = \
+                    serialize.unserialize(t, config, True, self.transl)
+                self.assertEqual(len(cache.entries), 0)
+                router.cut_boards(rboards, rbit, rsp)
+                self.assertEqual(router_test.all_cuts(rboards), expected)
+            config.save_cuts = False
+            self.assertEqual(serialize.serialize(*joint), '\n'.join(lines[0:2]))
+            config.save_cuts = True
+        # the cuts are not saved for a joint that cannot be cut
+        (bit, boards, sp, config) = self.factory.make_joint({'metric': True, 'board_width': 151,
+                                                             'bit_width': 12.7,
+                                                             'es_centered': False})
+        self.assertRaises(router.Router_Exception, router.cut_boards, boards, bit, sp)
+        self.assertEqual(len(serialize.serialize(bit, boards, sp, config).split('\n')), 2)
+
+    def test_legacy(self):
+        for joint in self.joints():
+            config = joint[3]
+            s = serialize.serialize_legacy(*joint)
+            self.assertTrue(serialize.is_legacy(s))
+            self.check(joint, serialize.unserialize(s, config, True, self.transl))
+            # before version 0.9, the protocol 0 pickle was not quoted-printable encoded
+            raw = protocol0(s)
+            self.check(joint, serialize.unserialize(raw, config, False, self.transl))
+
+    def test_legacy_future_strings(self):
+        # Python 2 pickled the wood names as the strings of the future package
+        (bit, boards, sp, config) = self.factory.make_joint({})
+        for b in boards:
+            b.wood = newstr('Cherry')
+        raw = protocol0(serialize.serialize_legacy(bit, boards, sp, config))
+        self.assertTrue('cfuture.types.newstr\nnewstr\n' in raw)
+        self.assertTrue('c__builtin__\nunicode\n' in raw)
+        for (s, newformat) in [(raw, False), (binascii.b2a_qp(raw.encode()).decode(), True)]:
+            (dummy_bit, rboards, dummy_sp, dummy_sp_type) = \
+                serialize.unserialize(s, config, newformat, self.transl)
+            self.assertEqual([(type(b.wood), b.wood) for b in rboards], [(str, 'Cherry')] * 4)
+            d = serialize.describe(s, newformat)
+            self.assertEqual([b['wood'] for b in d['boards']], ['Cherry'] * 4)
+        # a newbytes, as pickled by Python 2
+        raw = (b"ccopy_reg\n_reconstructor\np0\n(cfuture.types.newbytes\nnewbytes\np1\n"
+               b"c__builtin__\nstr\np2\nS'Walnut'\np3\ntp4\nRp5\n.")
+        wood = serialize.Legacy_Unpickler(BytesIO(raw)).load()
+        self.assertEqual((type(wood), wood), (str, 'Walnut'))
+
+    def test_unknown_format(self):
+        for joint in self.joints():
+            config = joint[3]
+            lines = serialize.serialize(*joint).split('\n')
+            header = json.loads(lines[0])
+            header['format'] = serialize.FORMAT_VERSION + 1
+            s = '\n'.join([json.dumps(header)] + lines[1:])
+            for f in [lambda: serialize.unserialize(s, config, True, self.transl),
+                      lambda: serialize.unserialize_header(s, config, True, self.transl),
+                      lambda: serialize.describe(s)]:
+                self.assertRaises(serialize.Serialize_Exception, f)
+
+    def test_damaged(self):
+        for joint in self.joints():
+            config = joint[3]
+            s = serialize.serialize(*joint)
+            (header, body) = s.split('\n')[:2]
+            legacy = serialize.serialize_legacy(*joint)
+            damaged = [s[:len(header) // 2],  # malformed JSON
+                       header + '\n' + body[:len(body) // 2],
+                       header + '\n{}',  # missing keys
+                       header + '\n[]',
+                       header.replace('"width":', '"w":', 1) + '\n' + body,
+                       legacy[:len(legacy) // 2],  # truncated pickle
+                       legacy[:-2]]
+            for d in damaged:
+                self.assertRaises(serialize.Serialize_Exception,
+                                  serialize.unserialize, d, config, True, self.transl)
+            # only the header is read
+            for d in [damaged[0], damaged[4], legacy[:10]]:
+                self.assertRaises(serialize.Serialize_Exception,
+                                  serialize.unserialize_header, d, config, True, self.transl)
+            for d in damaged[:4] + damaged[5:]:
+                self.assertRaises(serialize.Serialize_Exception, serialize.describe, d, True)
+
+    def test_header(self):
+        for joint in self.joints():
+            (bit, boards, dummy_sp, config) = joint
+            for s in [serialize.serialize(*joint), serialize.serialize_legacy(*joint)]:
+                (rbit, rboards) = serialize.unserialize_header(s, config, True, self.transl)
+                self.assertEqual((rbit.width, rbit.depth, rbit.angle),
+                                 (bit.width, bit.depth, bit.angle))
+                self.assertEqual([b.width for b in rboards], [b.width for b in boards])
+            # only the first line is parsed
+            s = serialize.serialize(*joint).split('\n')[0] + '\nnot json'
+            serialize.unserialize_header(s, config, True, self.transl)
+
+    def test_unsafe_pickle(self):
+        config = self.factory.make_joint({})[3]
+        # a legacy payload that calls os.system
+        out = BytesIO()
+        pickle.Pickler(out, 0).dump(Unsafe())
+        s = binascii.b2a_qp(out.getvalue()).decode('utf-8')
+        self.assertRaises(serialize.Serialize_Exception, serialize.unserialize, s, config, True,
+                          self.transl)
+
+
+class Unsafe(object):
+    '''Object that, when unpickled, runs a shell command'''
+    def __reduce__(self):
+        import os
+        return (os.system, ('echo unsafe',))
+
+
+if __name__ == '__main__':
+    unittest.main()
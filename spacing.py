@@ -23,9 +23,11 @@ Contains the classes that define the finger width and spacing.
 '''
 from __future__ import print_function
 from __future__ import division
+import sys
 import math
 import copy
-from operator import attrgetter
+from collections import deque
+from operator import attrgetter, itemgetter
 from decimal import Decimal
 
 from future.utils import lrange
@@ -43,6 +45,29 @@ def dump_cuts(cuts):
         print('{:f}\t{:f}'.format(c.xmin, c.xmax))
 
 
+def first_true(f):
+    '''
+    Returns the smallest integer d >= 1 for which f(d) is True, where f(d)
+    is False up to some d and True from then on.  Brackets the answer by
+    doubling d, then bisects, so f is called O(log d) times.
+    '''
+    if f(1):
+        return 1
+    lo = 1
+    hi = 2
+    while not f(hi):
+        lo = hi
+        hi *= 2
+    # f(lo) is False and f(hi) is True
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if f(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
 class Spacing_Exception(Exception):
     '''
     Exception handler for spacings
@@ -155,12 +180,10 @@ class Equally_Spaced(Base_Spacing):
         for i in lrange(len(t)):
             self.params[self.keys[i]] = t[i]
 
-    def set_cuts(self):
+    def spacing_width(self):
         '''
-        Sets the cuts to make the joint
+        Returns the (spacing, width) parameter values in increments
         '''
-
-        # on local variables init
         # we have to care about imperial values and convert them to increments before use
         spacing = self.params['Spacing'].v
         width = Decimal(math.floor(self.params['Width'].v))
@@ -168,6 +191,33 @@ class Equally_Spaced(Base_Spacing):
         if not self.bit.units.metric and width < 1.:
             spacing = self.bit.units.inches_to_increments(self.params['Spacing'].v)
             width = Decimal(math.floor(self.bit.units.inches_to_increments(self.params['Width'].v)))
+        return (spacing, width)
+
+    def set_labels(self):
+        '''
+        Sets the labels and description, as set_cuts() does, without
+        computing the cuts
+        '''
+        (spacing, width) = self.spacing_width()
+        units = self.bit.units
+        # Note the Width slider measures "midline" but indicates the actual cut space
+        # show actual maximum cut with for dovetails
+        self.labels = self.keys[:]
+        l0 = self.transl.tr(self.labels[0])
+        l1 = self.transl.tr(self.labels[1])
+        self.labels[2] = self.transl.tr(self.labels[2])
+        self.labels[0] = l0 +': ' + units.increments_to_string(spacing, True)
+        self.labels[1] = l1 +': ' + units.increments_to_string(width + self.bit.overhang * 2, True)
+        self.description = self.transl.tr('Equally spaced ')+' (' + self.labels[0] + \
+                           ', ' + self.labels[1] + ')'
+
+    def set_cuts(self):
+        '''
+        Sets the cuts to make the joint
+        '''
+
+        # on local variables init
+        (spacing, width) = self.spacing_width()
 
         shift = Decimal(self.bit.midline % 2) / 2  # offset to keep cut center mm count
         centered = self.params['Centered'].v
@@ -176,7 +226,6 @@ class Equally_Spaced(Base_Spacing):
 
         board_width = self.boards[0].width
         units = self.bit.units
-        label = units.increments_to_string(spacing, True)
 
         min_interior = utils.my_round(self.dhtot + self.bit.overhang)
         # min_finger_width means most thin wood at the corner
@@ -193,16 +242,7 @@ class Equally_Spaced(Base_Spacing):
             if (left - overhang) < min_finger_width:
                 left = 0
 
-        # Note the Width slider measures "midline" but indicates the actual cut space
-        # show actual maximum cut with for dovetails
-        self.labels = self.keys[:]
-        l0 = self.transl.tr(self.labels[0])
-        l1 = self.transl.tr(self.labels[1])
-        self.labels[2] = self.transl.tr(self.labels[2])
-        self.labels[0] = l0 +': ' + label
-        self.labels[1] = l1 +': ' + units.increments_to_string(width + overhang * 2, True)
-        self.description = self.transl.tr('Equally spaced ')+' (' + self.labels[0] + \
-                           ', ' + self.labels[1] + ')'
+        self.set_labels()
         self.cuts = []  # return value
 
         right = Decimal(min(board_width, left + width))
@@ -246,6 +286,22 @@ class Equally_Spaced(Base_Spacing):
             print('e-s cuts:')
             dump_cuts(self.cuts)
 
+    def sweep(self):
+        '''
+        Generator that sets the parameters to each of the combinations that
+        one move of a slider, or the Centered check box, reaches from the
+        current values, nearest first.
+        '''
+        ps = self.params['Spacing']
+        pw = self.params['Width']
+        pc = self.params['Centered']
+        (s0, w0, c0) = (ps.v, pw.v, pc.v)
+        moves = [(1, s0, w0, not c0)]
+        moves.extend((abs(s - s0), s, w0, c0) for s in lrange(int(ps.vMin), int(ps.vMax) + 1))
+        moves.extend((abs(w - w0), s0, w, c0) for w in lrange(int(pw.vMin), int(pw.vMax) + 1))
+        for (dummy_d, ps.v, pw.v, pc.v) in sorted(moves, key=itemgetter(0)):
+            yield
+
 
 class Variable_Spaced(Base_Spacing):
     '''
@@ -301,32 +357,48 @@ class Variable_Spaced(Base_Spacing):
         min_interior = self.bit.midline + self.dhtot * 2
         s = math.floor(Decimal(self.boards[0].width) / 2)    # half board width
         n = int(self.params['Fingers'].v)  # number of cuts
-        d = 0  # d is the ideal decrease in finger width for each finger away from center finger
-        an = 0
 
-        # Iterate to get perfect d value
+        # d is the ideal decrease in finger width for each finger away from
+        # center finger.  The largest |d| is one less than the first |d| that
+        # is too large, which is found by bisection.  This works because, as
+        # |d| increases, the rounded a1 increases by less than n - 1 per step,
+        # so that an never increases.  The interior an - d never increases
+        # for n >= 4, and never decreases for n <= 3, in which case it can
+        # only be too narrow at |d| = 1, which first_true() checks first.
+        # For inverted, a1 never increases.
         if not self.params['Inverted'].v:
-            while True:
-                d += -1
+            def too_large(d):
+                '''Returns True if the last finger or cut is too narrow'''
+                d = -d
                 a1 = utils.math_round(((2 * s) - (n - 1) * n * d) / Decimal(2 * n - 1))
                 an = a1 + Decimal(n - 1) * d
-                if (an - d) < min_interior or an < self.min_finger_width:
-                    d += 1
-                    break
+                return (an - d) < min_interior or an < self.min_finger_width
         else:
-            while  True:
-                d += 1
+            def too_large(d):
+                '''Returns True if the center cut is too narrow'''
                 a1 = utils.math_round(((2 * s) - (n - 1) * n * d) / Decimal(2 * n - 1))
-                an = a1 + Decimal(n - 1) * d
-                if a1 < min_interior:
-                    d -= 1
-                    break
+                return a1 < min_interior
+        d = first_true(too_large) - 1
 
-        d = abs(d)
         self.params['Spacing'].vMax = d
         if self.params['Spacing'].v >= d:
             self.params['Spacing'].v = d
 
+    def set_labels(self):
+        '''
+        Sets the labels and description, as set_cuts() does, without
+        computing the cuts
+        '''
+        n = int(self.params['Fingers'].v)
+        d = int(self.params['Spacing'].v)
+        if not self.params['Inverted'].v:
+            d = -d
+        transl = self.bit.units.transl
+        self.labels = [transl.tr(self.keys[0]),
+                       transl.tr(self.keys[1]) +': '+ str(d),
+                       self.keys[2]]
+        self.description = transl.tr('Variable Spaced ( {}: {})').format(transl.tr(self.keys[0]), n)
+
     def set_cuts(self):
         '''
         Sets the cuts to make the joint
@@ -393,11 +465,7 @@ class Variable_Spaced(Base_Spacing):
         neck = Decimal(increments[0]) / 2
         left = xMid - neck
         right = xMid + neck
-        self.labels = [units.transl.tr(self.keys[0]),
-                       units.transl.tr(self.keys[1]) +': '+ str(d),
-                       self.keys[2]]
-        self.description = units.transl.tr('Variable Spaced ( {}: {})')\
-                               .format(units.transl.tr(self.keys[0]), n)
+        self.set_labels()
 
         self.cuts = [router.Cut(left - overhang, right + overhang)]
 
@@ -424,6 +492,225 @@ class Variable_Spaced(Base_Spacing):
             print('v-s cuts:')
             dump_cuts(self.cuts)
 
+    def sweep(self):
+        '''
+        Generator that sets the parameters to each of the combinations that
+        one move of the Spacing slider, the Fingers combo box, or the
+        Inverted check box reaches from the current values, nearest first.
+        As on the widgets, calc_var_params() sets the Spacing range.
+        '''
+        pf = self.params['Fingers']
+        ps = self.params['Spacing']
+        pi = self.params['Inverted']
+        (f0, s0, i0) = (pf.v, ps.v, pi.v)
+        moves = [(1, f0, s0, not i0)]
+        moves.extend((abs(s - s0), f0, s, i0) for s in lrange(int(ps.vMin), int(ps.vMax) + 1))
+        moves.extend((abs(f - f0), f, s0, i0) for f in lrange(int(pf.vMin), int(pf.vMax) + 1))
+        for (dummy_d, pf.v, ps.v, pi.v) in sorted(moves, key=itemgetter(0)):
+            self.calc_var_params()
+            yield
+
+
+class Spacing_Table(object):
+    '''
+    Table of the cuts of an Equally_Spaced or Variable_Spaced object, for
+    parameter values near the current ones, so that moving a slider is a
+    lookup instead of a call to set_cuts().  The table may be filled ahead
+    of time, a piece at a time, with precompute(), which computes the values
+    that the widgets reach from the current values, nearest first, and
+    starts again from the new values when they change.  Entries are valid
+    only for the bit, boards, and configuration at the time they were
+    computed.
+
+    Attributes:
+
+    sp: The spacing object
+    table: Dictionary of parameter values to (cuts, labels, description),
+           where cuts is a tuple of (xmin, xmax)
+    max_entries: precompute() stops when the table has this many entries,
+                 and the table is cleared when it starts again
+    '''
+    def __init__(self, sp, max_entries=500):
+        self.sp = sp
+        self.max_entries = max_entries
+        self.table = {}
+        self.signature = self.get_signature()
+        # precompute() works on a copy, so the parameters of sp are untouched
+        self.worker = copy.copy(sp)
+        self.restart()
+
+    def restart(self):
+        '''Starts precompute() again, from the current parameters of sp'''
+        self.origin = self.key(self.sp)
+        if len(self.table) >= self.max_entries:
+            self.table = {}
+        self.worker.params = copy.deepcopy(self.sp.params)
+        self.sweep = self.worker.sweep()
+
+    def get_signature(self):
+        '''
+        Returns the bit, board, and configuration values that the cuts depend
+        upon, and the units, which the labels also depend upon
+        '''
+        bit = self.sp.bit
+        units = bit.units
+        return ((bit.width_f, bit.midline, bit.overhang, bit.angle),
+                tuple((b.width, b.dheight, b.active) for b in self.sp.boards),
+                self.sp.config.min_finger_width,
+                (units.metric, units.num_increments, units.english_separator))
+
+    @staticmethod
+    def key(sp):
+        '''Returns the table key for the current parameters of sp'''
+        return tuple(sp.params[k].v for k in sp.keys)
+
+    @staticmethod
+    def entry(sp):
+        '''Returns the table entry for the cuts of sp'''
+        return (tuple((c.xmin, c.xmax) for c in sp.cuts), sp.labels[:], sp.description)
+
+    def store(self):
+        '''Stores the current cuts of sp, which were set for its current parameters'''
+        self.check_signature()
+        self.table[self.key(self.sp)] = self.entry(self.sp)
+
+    def check_signature(self):
+        '''Clears the table if the bit, boards, or configuration changed'''
+        signature = self.get_signature()
+        if signature != self.signature:
+            self.signature = signature
+            self.table = {}
+            self.restart()
+
+    def set_cuts(self):
+        '''
+        Same as sp.set_cuts(), but uses the table, if the current parameters
+        are stored.  Otherwise, calls sp.set_cuts() and stores the result.
+        Returns True if precompute() has entries to compute.
+        '''
+        self.check_signature()
+        k = self.key(self.sp)
+        if k != self.origin:
+            self.restart()
+        e = self.table.get(k)
+        if e is None:
+            self.sp.set_cuts()
+            self.table[k] = self.entry(self.sp)
+        else:
+            (cuts, labels, description) = e
+            self.sp.cuts = [router.Cut(xmin, xmax) for (xmin, xmax) in cuts]
+            self.sp.labels = labels[:]
+            self.sp.description = description
+        return self.sweep is not None
+
+    def precompute(self, n):
+        '''
+        Computes up to n more table entries.  Returns True if there are more
+        entries to compute, False if done.
+        '''
+        if self.sweep is None:
+            return False
+        self.check_signature()
+        for _ in self.sweep:
+            if len(self.table) >= self.max_entries:
+                break
+            k = self.key(self.worker)
+            if k in self.table:
+                continue
+            try:
+                self.worker.set_cuts()
+            except Spacing_Exception:
+                # leave it for set_cuts() to raise
+                continue
+            self.table[k] = self.entry(self.worker)
+            n -= 1
+            if n <= 0:
+                return True
+        self.sweep = None
+        return False
+
+
+class Cut_History(object):
+    '''
+    Undo and redo stacks of the cuts of Edit_Spaced.  Each state is a tuple
+    of (xmin, xmax) per cut.  A state shares the (xmin, xmax) of each cut that
+    is unchanged from the previous state, so that a state costs about one
+    pointer per cut, plus the cuts that changed.
+
+    Attributes:
+
+    depth: Maximum number of undo states.  The oldest states are dropped.
+    undo_states: States to undo, last is most recent
+    redo_states: States to redo, last is most recent
+    '''
+    def __init__(self, depth=100):
+        self.depth = depth
+        self.undo_states = deque(maxlen=depth)
+        self.redo_states = []
+        self.last = ()
+
+    def clear(self):
+        '''Removes all of the states'''
+        self.undo_states.clear()
+        self.redo_states = []
+        self.last = ()
+
+    def snapshot(self, cuts):
+        '''Returns the state of cuts'''
+        shared = dict((b, b) for b in self.last)
+        state = []
+        for c in cuts:
+            b = (c.xmin, c.xmax)
+            state.append(shared.get(b, b))
+        self.last = tuple(state)
+        return self.last
+
+    @staticmethod
+    def restore(state):
+        '''Returns new cuts from state'''
+        return [router.Cut(xmin, xmax) for (xmin, xmax) in state]
+
+    def push(self, state):
+        '''Saves state, taken before a change, for undo.  Clears the redo states.'''
+        self.undo_states.append(state)
+        self.redo_states = []
+
+    def undo(self, cuts):
+        '''
+        Returns the cuts of the most recent undo state, and saves cuts for
+        redo.  Returns None if there is nothing to undo.
+        '''
+        if not self.undo_states:
+            return None
+        self.redo_states.append(self.snapshot(cuts))
+        return self.restore(self.undo_states.pop())
+
+    def redo(self, cuts):
+        '''
+        Returns the cuts of the most recent redo state, and saves cuts for
+        undo.  Returns None if there is nothing to redo.
+        '''
+        if not self.redo_states:
+            return None
+        self.undo_states.append(self.snapshot(cuts))
+        return self.restore(self.redo_states.pop())
+
+    def memory(self):
+        '''Returns the number of bytes used by the states, counting shared objects once'''
+        seen = set()
+        nbytes = 0
+        for state in list(self.undo_states) + self.redo_states:
+            for obj in [state] + list(state) + [x for b in state for x in b]:
+                if id(obj) not in seen:
+                    seen.add(id(obj))
+                    nbytes += sys.getsizeof(obj)
+        return nbytes
+
+    def stats(self):
+        '''Returns a string summary of the stacks'''
+        return 'cut history: %d undo, %d redo of %d, %d bytes' % \
+            (len(self.undo_states), len(self.redo_states), self.depth, self.memory())
+
 
 class Edit_Spaced(Base_Spacing):
     '''
@@ -433,7 +720,7 @@ class Edit_Spaced(Base_Spacing):
 
     def __init__(self, bit, boards, config):
         Base_Spacing.__init__(self, bit, boards, config)
-        self.undo_cuts = []  # list of cuts to undo
+        self.history = Cut_History(config.undo_depth)
         self.params = []
 
     def set_cuts(self, cuts):
@@ -445,13 +732,21 @@ class Edit_Spaced(Base_Spacing):
         self.description = self.transl.tr('Edit spacing')
         self.cursor_cut = 0
         self.active_cuts = [self.cursor_cut]
-        self.undo_cuts = []
+        self.history.clear()
 
     def changes_made(self):
         '''
         Returns true if editing changes have been made
         '''
-        return len(self.undo_cuts) > 0
+        return len(self.history.undo_states) > 0
+
+    def save_undo(self, cuts_save):
+        '''
+        Saves the state cuts_save, from before a change, for undo
+        '''
+        self.history.push(cuts_save)
+        if self.config.debug:
+            print(self.history.stats())
 
     def get_limits(self, f):
         '''
@@ -476,17 +771,30 @@ class Edit_Spaced(Base_Spacing):
 
     def undo(self):
         '''
-        Undoes the last change to cuts
+        Undoes the last change to cuts.  Returns True if there was a change to undo.
+        '''
+        cuts = self.history.undo(self.cuts)
+        if cuts is None:
+            return False
+        self.cuts = cuts
+        return True
+
+    def redo(self):
+        '''
+        Redoes the last undone change to cuts.  Returns True if there was a change to redo.
         '''
-        if self.undo_cuts:
-            self.cuts = self.undo_cuts.pop()
+        cuts = self.history.redo(self.cuts)
+        if cuts is None:
+            return False
+        self.cuts = cuts
+        return True
 
     def cut_move_left(self):
         '''
         Moves the active cuts 1 increment to the left
         with min finger with respect
         '''
-        cuts_save = copy.deepcopy(self.cuts)
+        cuts_save = self.history.snapshot(self.cuts)
         op = []
         noop = []
         min_finger_width = self.bit.units.abstract_to_increments(self.config.min_finger_width)
@@ -519,11 +827,11 @@ class Edit_Spaced(Base_Spacing):
             else:
                 noop.append(f + incr)
         if noop:
-            self.cuts = cuts_save
+            self.cuts = Cut_History.restore(cuts_save)
             return (self.transl.tr('No cuts moved: unable to move indices %s') % str(noop),
                     True)
         if op or delete_cut:
-            self.undo_cuts.append(cuts_save)
+            self.save_undo(cuts_save)
         if op:
             msg += self.transl.tr('Moved cut indices %s to left 1 increment') % str(op)
         return (msg, False)
@@ -533,7 +841,7 @@ class Edit_Spaced(Base_Spacing):
         Moves the active cuts 1 increment to the right
         with min finger with respect
         '''
-        cuts_save = copy.deepcopy(self.cuts)
+        cuts_save = self.history.snapshot(self.cuts)
         op = []
         noop = []
         delete_cut = False
@@ -566,11 +874,11 @@ class Edit_Spaced(Base_Spacing):
             else:
                 noop.append(f)
         if noop:
-            self.cuts = cuts_save
+            self.cuts = Cut_History.restore(cuts_save)
             return (self.transl.tr('No cuts moved: unable to move indices %s') % str(noop),
                     True)
         if op or delete_cut:
-            self.undo_cuts.append(cuts_save)
+            self.save_undo(cuts_save)
         if op:
             msg += self.transl.tr('Moved cut indices %s to right 1 increment') % str(op)
         return (msg, False)
@@ -580,7 +888,7 @@ class Edit_Spaced(Base_Spacing):
         Increases the active cuts width on the left side by 1 increment
         '''
         min_finger_width = self.bit.units.abstract_to_increments(self.config.min_finger_width)
-        cuts_save = copy.deepcopy(self.cuts)
+        cuts_save = self.history.snapshot(self.cuts)
         op = []
         noop = []
         for f in self.active_cuts:
@@ -595,11 +903,11 @@ class Edit_Spaced(Base_Spacing):
             else:
                 noop.append(f)
         if noop:
-            self.cuts = cuts_save
+            self.cuts = Cut_History.restore(cuts_save)
             return (self.transl.tr('No cuts widened: unable to widen indices %s') % str(noop),
                     True)
         if op:
-            self.undo_cuts.append(cuts_save)
+            self.save_undo(cuts_save)
             msg = (self.transl.tr('Widened cut indices %s on left 1 increment') % str(op),
                    False)
         else:
@@ -611,7 +919,7 @@ class Edit_Spaced(Base_Spacing):
         Increases the active cuts width on the right side by 1 increment
         '''
         min_finger_width = self.bit.units.abstract_to_increments(self.config.min_finger_width)
-        cuts_save = copy.deepcopy(self.cuts)
+        cuts_save = self.history.snapshot(self.cuts)
         op = []
         noop = []
         for f in self.active_cuts:
@@ -626,11 +934,11 @@ class Edit_Spaced(Base_Spacing):
             else:
                 noop.append(f)
         if noop:
-            self.cuts = cuts_save
+            self.cuts = Cut_History.restore(cuts_save)
             return (self.transl.tr('No cuts widened: unable to widen indices %s') % str(noop),
                     True)
         if op:
-            self.undo_cuts.append(cuts_save)
+            self.save_undo(cuts_save)
             msg = (self.transl.tr('Widened cut indices %s on right 1 increment') % str(op),
                    False)
         else:
@@ -641,7 +949,7 @@ class Edit_Spaced(Base_Spacing):
         '''
         Decreases the active cuts width on the left side by 1 increment
         '''
-        cuts_save = copy.deepcopy(self.cuts)
+        cuts_save = self.history.snapshot(self.cuts)
         op = []
         noop = []
         min_finger_width = self.bit.units.abstract_to_increments(self.config.min_finger_width)
@@ -662,11 +970,11 @@ class Edit_Spaced(Base_Spacing):
                 self.cuts[f] = c
                 op.append(f)
         if noop:
-            self.cuts = cuts_save
+            self.cuts = Cut_History.restore(cuts_save)
             return (self.transl.tr('No cuts trimmed: unable to trim indices %s') % str(noop),
                     True)
         if op:
-            self.undo_cuts.append(cuts_save)
+            self.save_undo(cuts_save)
             msg = (self.transl.tr('Trimmed cut indices %s on left 1 increment') % str(op),
                    False)
         else:
@@ -677,7 +985,7 @@ class Edit_Spaced(Base_Spacing):
         '''
         Decreases the active cuts width on the right side by 1 increment
         '''
-        cuts_save = copy.deepcopy(self.cuts)
+        cuts_save = self.history.snapshot(self.cuts)
         op = []
         noop = []
         min_finger_width = self.bit.units.abstract_to_increments(self.config.min_finger_width)
@@ -697,11 +1005,11 @@ class Edit_Spaced(Base_Spacing):
                 self.cuts[f] = c
                 op.append(f)
         if noop:
-            self.cuts = cuts_save
+            self.cuts = Cut_History.restore(cuts_save)
             return (self.transl.tr('No cuts trimmed: unable to trim indices %s') % str(noop),
                     True)
         if op:
-            self.undo_cuts.append(cuts_save)
+            self.save_undo(cuts_save)
             msg = (self.transl.tr('Trimmed cut indices %s on right 1 increment') % str(op),
                    False)
         else:
@@ -769,7 +1077,7 @@ class Edit_Spaced(Base_Spacing):
         '''
         Deletes the active cuts.
         '''
-        cuts_save = copy.deepcopy(self.cuts)
+        cuts_save = self.history.snapshot(self.cuts)
         deleted = []
         failed = False
         # delete in reverse order, so that modifications to cuts don't affect index values
@@ -782,7 +1090,7 @@ class Edit_Spaced(Base_Spacing):
         self.active_cuts = [self.cursor_cut]
         if deleted:
             msg = 'Deleted cut indices ' + str(deleted)
-            self.undo_cuts.append(cuts_save)
+            self.save_undo(cuts_save)
         else:
             msg = 'Deleted no cuts'
         if failed:
@@ -797,7 +1105,7 @@ class Edit_Spaced(Base_Spacing):
         overhang = self.bit.overhang
         midline = self.bit.midline
         index = None
-        cuts_save = copy.deepcopy(self.cuts)
+        cuts_save = self.history.snapshot(self.cuts)
         min_finger_width = math.floor(
             self.bit.units.abstract_to_increments(self.config.min_finger_width)) + 1
         wadd = min_finger_width + self.dhtot
@@ -842,7 +1150,7 @@ class Edit_Spaced(Base_Spacing):
             xmin = self.cuts[-1].xmax - overhang
         if index is None:
             return (self.transl.tr('Unable to add cut'), True)
-        self.undo_cuts.append(cuts_save)
+        self.save_undo(cuts_save)
         c = self.cuts[0:index]
         c.append(router.Cut(xmin, xmax))
         c.extend(self.cuts[index:])
@@ -0,0 +1,268 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for spacing.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import copy
+import math
+import unittest
+from decimal import Decimal
+
+from future.utils import lrange
+
+import utils
+import spacing
+import job_runner
+
+
+class Spacing_Table_Test(unittest.TestCase):
+    '''
+    Tests that Spacing_Table gives the same cuts as set_cuts()
+    '''
+    def setUp(self):
+        utils.init_decimal_context()
+        self.factory = job_runner.Joint_Factory()
+
+    def check_table(self, job):
+        (dummy_bit, dummy_boards, sp, dummy_config) = self.factory.make_joint(job)
+        table = spacing.Spacing_Table(sp)
+        while table.precompute(100):
+            pass
+        self.assertTrue(len(table.table) > 0)
+        check = copy.copy(sp)
+        check.params = copy.deepcopy(sp.params)
+        for (k, e) in table.table.items():
+            for (key, v) in zip(check.keys, k):
+                check.params[key].v = v
+            check.set_cuts()
+            self.assertEqual(spacing.Spacing_Table.entry(check), e, str(k))
+        return (sp, table)
+
+    def test_equal(self):
+        (sp, table) = self.check_table({'board_width': '3'})
+        # a lookup replaces the cuts of sp
+        sp.params['Spacing'].v = sp.params['Spacing'].vMax
+        table.set_cuts()
+        cuts = [(c.xmin, c.xmax) for c in sp.cuts]
+        sp.set_cuts()
+        self.assertEqual(cuts, [(c.xmin, c.xmax) for c in sp.cuts])
+
+    def test_store(self):
+        (dummy_bit, dummy_boards, sp, dummy_config) = self.factory.make_joint({})
+        table = spacing.Spacing_Table(sp)
+        sp.set_cuts()
+        table.store()
+        cuts = sp.cuts
+        # the stored cuts are looked up, not set again
+        sp.set_cuts = lambda: self.fail('set_cuts() called')
+        table.set_cuts()
+        self.assertEqual([(c.xmin, c.xmax) for c in sp.cuts], [(c.xmin, c.xmax) for c in cuts])
+        self.assertEqual(len(table.table), 1)
+
+    def test_variable(self):
+        self.check_table({'spacing': 'variable'})
+        self.check_table({'spacing': 'variable', 'vs_inverted': True, 'double_thickness': '1/8'})
+
+    def test_signature(self):
+        (sp, table) = self.check_table({'board_width': '3'})
+        sp.bit.set_width_from_string('3/8')
+        table.set_cuts()
+        self.assertEqual(len(table.table), 1)
+        # the dovetail angle changes the cuts
+        sp.bit.angle = 7
+        table.set_cuts()
+        self.assertEqual(len(table.table), 1)
+        # the labels depend on the units.  The widest finger is over an inch.
+        sp.params['Width'].v = sp.params['Width'].vMax
+        table.set_cuts()
+        table.precompute(5)
+        sp.bit.units.english_separator = '+'
+        table.set_cuts()
+        self.assertEqual(len(table.table), 1)
+        self.assertTrue('+' in sp.labels[1], sp.labels[1])
+
+    def test_reachable(self):
+        (sp, table) = self.check_table({'board_width': '30'})
+        p = dict((k, sp.params[k].v) for k in sp.keys)
+        # only one parameter differs from the current values
+        for k in table.table:
+            self.assertTrue(sum(v != p[key] for (key, v) in zip(sp.keys, k)) <= 1, str(k))
+        self.assertEqual(len(table.table), table.max_entries)
+        # the precompute starts again, near the new values, once they
+        # change, with the full table cleared
+        sp.params['Spacing'].v = sp.params['Spacing'].vMax
+        sp.params['Width'].v += 2
+        self.assertTrue(table.set_cuts())
+        self.assertEqual(len(table.table), 1)
+        table.precompute(5)
+        s = sp.params['Spacing'].v
+        self.assertEqual(sorted(k[0] for k in table.table if k[1:] == (sp.params['Width'].v, True)),
+                         [s - 2, s - 1, s])
+
+
+class Cut_History_Test(unittest.TestCase):
+    '''
+    Tests undo and redo of Edit_Spaced
+    '''
+    def setUp(self):
+        utils.init_decimal_context()
+        factory = job_runner.Joint_Factory()
+        (bit, boards, sp, config) = factory.make_joint({'board_width': '12', 'es_spacing': 20})
+        self.edit = spacing.Edit_Spaced(bit, boards, config)
+        self.edit.set_cuts(sp.cuts)
+
+    def bounds(self):
+        return [(c.xmin, c.xmax) for c in self.edit.cuts]
+
+    def test_undo_redo(self):
+        edit = self.edit
+        edit.active_cuts = [2]
+        states = [self.bounds()]
+        for move in [edit.cut_move_left, edit.cut_widen_right, edit.cut_add,
+                     edit.cut_delete_active, edit.cut_widen_left]:
+            (dummy_msg, warning) = move()
+            self.assertFalse(warning)
+            states.append(self.bounds())
+        self.assertTrue(edit.changes_made())
+        for state in reversed(states[:-1]):
+            self.assertTrue(edit.undo())
+            self.assertEqual(self.bounds(), state)
+        self.assertFalse(edit.undo())
+        for state in states[1:]:
+            self.assertTrue(edit.redo())
+            self.assertEqual(self.bounds(), state)
+        self.assertFalse(edit.redo())
+        # a new change clears the redo states
+        edit.undo()
+        edit.cut_move_right()
+        self.assertFalse(edit.redo())
+
+    def test_sharing(self):
+        edit = self.edit
+        edit.active_cuts = [1]
+        for _ in lrange(4):
+            edit.cut_move_right()
+        states = edit.history.undo_states
+        self.assertEqual(len(states), 4)
+        # only cut 1 changes, so the others are shared
+        for i in lrange(len(states[0])):
+            self.assertEqual(states[0][i] is states[-1][i], i != 1)
+
+    def test_depth(self):
+        edit = self.edit
+        edit.history = spacing.Cut_History(3)
+        edit.active_cuts = [1]
+        for _ in lrange(5):
+            edit.cut_move_right()
+        self.assertEqual(len(edit.history.undo_states), 3)
+        self.assertTrue(edit.history.memory() > 0)
+
+
+class Namespace(object):
+    '''Holds the attributes given as keywords'''
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def var_spaced(width, midline, dhtot, min_finger_width, fingers, inverted):
+    '''
+    Returns a Variable_Spaced with just the attributes used by
+    calc_var_params(), so that a large grid is fast to set up
+    '''
+    sp = spacing.Variable_Spaced.__new__(spacing.Variable_Spaced)
+    sp.bit = Namespace(midline=midline)
+    sp.boards = [Namespace(width=width)]
+    sp.dhtot = dhtot
+    sp.min_finger_width = Decimal(min_finger_width)
+    sp.params = {'Fingers': spacing.Spacing_Param(2, fingers, fingers),
+                 'Spacing': spacing.Spacing_Param(0, 0, 0),
+                 'Inverted': spacing.Spacing_Param(0, 0, inverted)}
+    return sp
+
+
+def linear_var_max(sp):
+    '''
+    The original calc_var_params() search for the max Spacing, one step at a time
+    '''
+    min_interior = sp.bit.midline + sp.dhtot * 2
+    s = math.floor(Decimal(sp.boards[0].width) / 2)
+    n = int(sp.params['Fingers'].v)
+    d = 0
+    if not sp.params['Inverted'].v:
+        while True:
+            d += -1
+            a1 = utils.math_round(((2 * s) - (n - 1) * n * d) / Decimal(2 * n - 1))
+            an = a1 + Decimal(n - 1) * d
+            if (an - d) < min_interior or an < sp.min_finger_width:
+                d += 1
+                break
+    else:
+        while True:
+            d += 1
+            a1 = utils.math_round(((2 * s) - (n - 1) * n * d) / Decimal(2 * n - 1))
+            if a1 < min_interior:
+                d -= 1
+                break
+    return abs(d)
+
+
+class Var_Params_Test(unittest.TestCase):
+    '''
+    Tests that calc_var_params() gives the same Spacing vMax as the original
+    linear search, over a grid of board widths, bit midlines, dhtot, and
+    finger counts
+    '''
+    def setUp(self):
+        utils.init_decimal_context()
+
+    def test_grid(self):
+        grid = []
+        for width in lrange(40, 3000, 293):
+            for midline in [2, 5, 13, 32]:
+                for dhtot in [0, 2, 7]:
+                    for min_finger_width in [1, 5]:
+                        mMax = int((width // (midline + dhtot)) // 2 + 1)
+                        for n in lrange(2, mMax + 1):
+                            for inverted in [False, True]:
+                                grid.append(var_spaced(width, midline, dhtot, min_finger_width,
+                                                       n, inverted))
+        expected = [linear_var_max(sp) for sp in grid]
+        for sp in grid:
+            sp.calc_var_params()
+        for (sp, d) in zip(grid, expected):
+            self.assertEqual(sp.params['Spacing'].vMax, d)
+
+    def test_first_true(self):
+        # the answer, with O(log d) calls, where the linear search took d
+        for d in lrange(1, 1000):
+            calls = []
+
+            def f(x):
+                calls.append(x)
+                return x >= d
+            self.assertEqual(spacing.first_true(f), d)
+            self.assertTrue(len(calls) <= 2 * math.log(d, 2) + 2, (d, calls))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,29 +19,119 @@
 ###########################################################################
 
 '''
-Contains functionality for writing Autodesk 3DS files.
+Contains functionality for writing and reading Autodesk 3DS files.
+
+The vertex and face lists of each mesh are packed as little-endian arrays,
+with numpy if it is available, rather than one vertex or face at a time.
 '''
 from __future__ import division
 from __future__ import print_function
 from future.utils import lrange
-from io import StringIO
 
 import struct, copy
 import router
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Chunk identifiers
+KEY3DS = {
+
+    #------ Primary chunk
+
+    'MAIN3DS': 0x4D4D,
+
+    #------ Main Chunks
+
+    'EDIT3DS': 0x3D3D,
+    'KEYF3DS': 0xB000,
+
+    #------ sub defines of EDIT3DS
+
+    'EDIT_MATERIAL': 0xAFFF,
+    'EDIT_CONFIG1': 0x0100,
+    'EDIT_CONFIG2': 0x3E3D,
+    'EDIT_VIEW_P1': 0x7012,
+    'EDIT_VIEW_P2': 0x7011,
+    'EDIT_VIEW_P3': 0x7020,
+    'EDIT_VIEW1': 0x7001,
+    'EDIT_BACKGR': 0x1200,
+    'EDIT_AMBIENT': 0x2100,
+    'EDIT_OBJECT': 0x4000,
+
+    #------ sub defines of EDIT_OBJECT
+    'OBJ_TRIMESH': 0x4100,
+    'OBJ_LIGHT': 0x4600,
+    'OBJ_CAMERA': 0x4700,
+
+    'OBJ_UNKNWN01': 0x4010,
+    'OBJ_UNKNWN02': 0x4012,  #>---- Could be shadow
+
+    #------ sub defines of OBJ_CAMERA
+    'CAM_UNKNWN01': 0x4710,
+    'CAM_UNKNWN02': 0x4720,
+
+    #------ sub defines of OBJ_LIGHT
+    'LIT_OFF': 0x4620,
+    'LIT_SPOT': 0x4610,
+    'LIT_UNKNWN01': 0x465A,
+
+    #------ sub defines of OBJ_TRIMESH
+    'TRI_VERTEXL': 0x4110,
+    'TRI_FACEL2': 0x4111,
+    'TRI_FACEL1': 0x4120,
+    'TRI_SMOOTH': 0x4150,
+    'TRI_LOCAL': 0x4160,
+    'TRI_VISIBLE': 0x4165,
+
+    #------ sub defs of KEYF3DS
+
+    'KEYF_FRAMES': 0xB008,
+    'KEYF_OBJDES': 0xB002,
+
+    #------  these define the different color chunk types
+    'COL_RGB': 0x0010,
+    'COL_TRU': 0x0011,
+    'COL_UNK': 0x0013,
+
+    #------ defines for viewport chunks
+
+    'TOP': 0x0001,
+    'BOTTOM': 0x0002,
+    'LEFT': 0x0003,
+    'RIGHT': 0x0004,
+    'FRONT': 0x0005,
+    'BACK': 0x0006,
+    'USER': 0x0007,
+    'CAMERA': 0x0008,  # 0xFFFF is the actual code read from file
+    'LIGHT': 0x0009,
+    'DISABLED': 0x0010,
+    'BOGUS': 0x0011
+}
 
-class BinaryIO(StringIO):
-    def writepack(self, fmt, *values):
-        '''Writes data with little-endian, packed with struct'''
-        self.write(struct.pack('<' + fmt, *values))
+# The flags written with each face
+FACE_FLAGS = 0x0006
+
+# The maximum number of vertices, and of faces, in a mesh, since the counts
+# are unsigned shorts
+MAX_COUNT = 0xFFFF
 
 
 class Object_Geometry(object):
-    '''Geometry information for a single 3DS object'''
-    def __init__(self, name, vertices, triangles):
+    '''
+    Geometry information for a single 3DS object
+
+    xbreaks: If not None, a list of x-coordinates, such as cut boundaries,
+             where the object is preferably split, if it is too large for
+             one mesh (see split_object()).
+    '''
+    def __init__(self, name, vertices, triangles, xbreaks=None):
         self.name = name
         self.vertices = vertices
         self.triangles = triangles
+        self.xbreaks = xbreaks
 
     def num_vertices(self):
         return len(self.vertices)
@@ -50,184 +140,344 @@ class Object_Geometry(object):
         return len(self.triangles)
 
 
+def _chunk_header(key, size):
+    '''Returns the header of the chunk key, of size bytes including the header'''
+    return struct.pack('<HI', KEY3DS[key], size)
+
+
+def pack_vertices(vertices):
+    '''Returns the bytes of the list of (x, y, z) vertices, as little-endian float32'''
+    if np is not None:
+        return np.asarray(vertices, dtype='<f4').reshape(-1, 3).tobytes()
+    return struct.pack('<%df' % (3 * len(vertices)), *[x for v in vertices for x in v[0:3]])
+
+
+def pack_faces(triangles):
+    '''
+    Returns the bytes of the list of (i0, i1, i2) triangles, as little-endian
+    uint16, each followed by FACE_FLAGS
+    '''
+    if np is not None:
+        faces = np.full((len(triangles), 4), FACE_FLAGS, dtype='<u2')
+        if len(triangles) > 0:
+            faces[:, 0:3] = np.asarray(triangles).reshape(-1, 3)
+        return faces.tobytes()
+    return struct.pack('<%dH' % (4 * len(triangles)),
+                       *[i for t in triangles for i in (t[0], t[1], t[2], FACE_FLAGS)])
+
+
+def mesh_chunks(objects):
+    '''
+    Returns a list of the byte strings of the 3DS file of objects, a list
+    of Object_Geometrys, which are to be concatenated
+    '''
+    edit = []
+    for obj in objects:
+        name = obj.name.encode('utf-8') + b'\0'
+        vertices = pack_vertices(obj.vertices)
+        faces = pack_faces(obj.triangles)
+        tri_vertexl_size = 8 + len(vertices)
+        tri_facel1_size = 8 + len(faces)
+        obj_trimesh_size = 6 + tri_vertexl_size + tri_facel1_size
+        edit.extend([_chunk_header('EDIT_OBJECT', 6 + len(name) + obj_trimesh_size), name,
+                     _chunk_header('OBJ_TRIMESH', obj_trimesh_size),
+                     _chunk_header('TRI_VERTEXL', tri_vertexl_size),
+                     struct.pack('<H', obj.num_vertices()), vertices,
+                     _chunk_header('TRI_FACEL1', tri_facel1_size),
+                     struct.pack('<H', obj.num_triangles()), faces])
+    edit3ds_size = 6 + sum(len(c) for c in edit)
+    return [_chunk_header('MAIN3DS', 6 + edit3ds_size),
+            _chunk_header('EDIT3DS', edit3ds_size)] + edit
+
+
+def split_object(obj, max_count=MAX_COUNT):
+    '''
+    Returns a list of Object_Geometrys that together form obj, each with at
+    most max_count vertices and triangles.  If obj is small enough, returns
+    [obj].
+
+    The triangles are sorted by the x-coordinate of their centroids, and
+    split into slabs of consecutive triangles, so that each piece is a
+    contiguous part of the object along x.  Each slab is ended at the last
+    of obj.xbreaks that it crosses, if any, and otherwise where it is full.
+    Each piece copies only its own vertices and triangles, so the time is
+    O(n log n) in the number of triangles.
+    '''
+    if len(obj.vertices) <= max_count and len(obj.triangles) <= max_count:
+        return [obj]
+    if np is not None:
+        vertices = np.asarray(obj.vertices, dtype=float).reshape(-1, 3)
+        triangles = np.asarray(obj.triangles).reshape(-1, 3)
+        x = vertices[triangles, 0].sum(axis=1) / 3
+        order = np.argsort(x, kind='stable')
+        triangles = triangles[order]
+        x = x[order]
+        # prev[p] is the previous position of the vertex at position p of
+        # the sorted triangles, or -1, so that the vertices first used in a
+        # slab starting at position q are those with prev < q
+        flat = triangles.ravel()
+        order = np.argsort(flat, kind='stable')
+        same = flat[order[1:]] == flat[order[:-1]]
+        prev = np.full(len(flat), -1)
+        prev[order[1:][same]] = order[:-1][same]
+    else:
+        vertices = obj.vertices
+        x = [sum(vertices[k][0] for k in t[0:3]) / 3 for t in obj.triangles]
+        order = sorted(lrange(len(x)), key=x.__getitem__)
+        triangles = [obj.triangles[k] for k in order]
+        x = [x[k] for k in order]
+
+    xbreaks = sorted(obj.xbreaks or [])
+    pieces = []
+    i = 0
+    n = len(triangles)
+    while i < n:
+        # the largest slab starting at i that fits
+        m = min(n - i, max_count)
+        if np is not None:
+            nused = (prev[3 * i:3 * (i + m)] < 3 * i).reshape(m, 3).sum(axis=1).cumsum()
+            j = i + int(np.searchsorted(nused, max_count, side='right'))
+        else:
+            used = set()
+            j = i
+            while j < i + m:
+                new = set(triangles[j][0:3]) - used
+                if len(used) + len(new) > max_count:
+                    break
+                used |= new
+                j += 1
+        if j < n:
+            # end at the last break in the slab, if any
+            for xb in reversed(xbreaks):
+                if x[i] < xb <= x[j - 1]:
+                    j = _bisect_x(x, xb, i, j)
+                    break
+        if np is not None:
+            used = np.unique(triangles[i:j])
+            piece = (vertices[used], np.searchsorted(used, triangles[i:j]))
+        else:
+            used = sorted(set(k for t in triangles[i:j] for k in t[0:3]))
+            index = dict((k, position) for (position, k) in enumerate(used))
+            piece = ([vertices[k] for k in used],
+                     [[index[k] for k in t[0:3]] for t in triangles[i:j]])
+        pieces.append(Object_Geometry('%s_%d' % (obj.name, len(pieces) + 1), *piece))
+        i = j
+    return pieces
+
+
+def _bisect_x(x, xb, i, j):
+    '''Returns the first index k in [i, j) of the sorted list x with x[k] >= xb'''
+    while i < j:
+        mid = (i + j) // 2
+        if x[mid] < xb:
+            i = mid + 1
+        else:
+            j = mid
+    return i
+
+
 def write_3ds(filename, objects):
     '''
-    Writes objects to filename in 3DS format, where objects is a list of Object_Geometrys.
+    Writes objects to filename in 3DS format, where objects is a list of
+    Object_Geometrys.  Objects too large for one mesh are split with
+    split_object().
     '''
+    objects = [piece for obj in objects for piece in split_object(obj)]
+    with open(filename, 'wb') as fd:
+        for c in mesh_chunks(objects):
+            fd.write(c)
 
-    key3ds = {
-
-        #------ Primary chunk
-
-        'MAIN3DS': 0x4D4D,
-
-        #------ Main Chunks
-
-        'EDIT3DS': 0x3D3D,
-        'KEYF3DS': 0xB000,
-
-        #------ sub defines of EDIT3DS
-
-        'EDIT_MATERIAL': 0xAFFF,
-        'EDIT_CONFIG1': 0x0100,
-        'EDIT_CONFIG2': 0x3E3D,
-        'EDIT_VIEW_P1': 0x7012,
-        'EDIT_VIEW_P2': 0x7011,
-        'EDIT_VIEW_P3': 0x7020,
-        'EDIT_VIEW1': 0x7001,
-        'EDIT_BACKGR': 0x1200,
-        'EDIT_AMBIENT': 0x2100,
-        'EDIT_OBJECT': 0x4000,
-
-        #------ sub defines of EDIT_OBJECT
-        'OBJ_TRIMESH': 0x4100,
-        'OBJ_LIGHT': 0x4600,
-        'OBJ_CAMERA': 0x4700,
-
-        'OBJ_UNKNWN01': 0x4010,
-        'OBJ_UNKNWN02': 0x4012,  #>---- Could be shadow
-
-        #------ sub defines of OBJ_CAMERA
-        'CAM_UNKNWN01': 0x4710,
-        'CAM_UNKNWN02': 0x4720,
-
-        #------ sub defines of OBJ_LIGHT
-        'LIT_OFF': 0x4620,
-        'LIT_SPOT': 0x4610,
-        'LIT_UNKNWN01': 0x465A,
-
-        #------ sub defines of OBJ_TRIMESH
-        'TRI_VERTEXL': 0x4110,
-        'TRI_FACEL2': 0x4111,
-        'TRI_FACEL1': 0x4120,
-        'TRI_SMOOTH': 0x4150,
-        'TRI_LOCAL': 0x4160,
-        'TRI_VISIBLE': 0x4165,
-
-        #------ sub defs of KEYF3DS
-
-        'KEYF_FRAMES': 0xB008,
-        'KEYF_OBJDES': 0xB002,
-
-        #------  these define the different color chunk types
-        'COL_RGB': 0x0010,
-        'COL_TRU': 0x0011,
-        'COL_UNK': 0x0013,
-
-        #------ defines for viewport chunks
-
-        'TOP': 0x0001,
-        'BOTTOM': 0x0002,
-        'LEFT': 0x0003,
-        'RIGHT': 0x0004,
-        'FRONT': 0x0005,
-        'BACK': 0x0006,
-        'USER': 0x0007,
-        'CAMERA': 0x0008,  # 0xFFFF is the actual code read from file
-        'LIGHT': 0x0009,
-        'DISABLED': 0x0010,
-        'BOGUS': 0x0011
-    }
-
-    n = len(objects)
-    tri_vertexl_size = [8] * n
-    tri_facel1_size = [8] * n
-    obj_trimesh_size = [6] * n
-    edit_object_size = [6] * n
-    name = [''] * n
-    edit3ds_size = 6
-    main3ds_size = 6
-    # determine the size of each chunk
-    for i in lrange(n):
-        tri_vertexl_size[i] += 4 * 3 * objects[i].num_vertices()
-        tri_facel1_size[i] += 2 * 4 * objects[i].num_triangles()
-        obj_trimesh_size[i] += tri_vertexl_size[i] + tri_facel1_size[i]
-        name[i] = objects[i].name + '\0'
-        edit_object_size[i] += obj_trimesh_size[i] + len(name[i])
-        edit3ds_size += edit_object_size[i]
-    main3ds_size += edit3ds_size
-    # pack up the chunks into a buffer
-    bio = BinaryIO()
-    bio.writepack('HI', key3ds['MAIN3DS'], main3ds_size)
-    bio.writepack('HI', key3ds['EDIT3DS'], edit3ds_size)
-    for i in lrange(n):
-        bio.writepack('HI', key3ds['EDIT_OBJECT'], edit_object_size[i])
-        bio.write(name[i])
-        bio.writepack('HI', key3ds['OBJ_TRIMESH'], obj_trimesh_size[i])
-        bio.writepack('HI', key3ds['TRI_VERTEXL'], tri_vertexl_size[i])
-        bio.writepack('H', objects[i].num_vertices())
-        for v in objects[i].vertices:
-            bio.writepack('fff', v[0], v[1], v[2])
-        bio.writepack('HI', key3ds['TRI_FACEL1'], tri_facel1_size[i])
-        bio.writepack('H', objects[i].num_triangles())
-        for t in objects[i].triangles:
-            bio.writepack('HHHH', t[0], t[1], t[2], 0x0006)
-    s = bio.getvalue()
-    # print len(s), main3ds_size
-    # Write the buffer to the file
-    fd = open(filename, 'wb')
-    fd.write(s)
-    fd.close()
 
+def _unpack(fmt, data, offset, count, ncols):
+    '''
+    Returns count rows of ncols values of type fmt, from data at offset, as
+    a numpy array if numpy is available, otherwise as a list of tuples
+    '''
+    if np is not None:
+        a = np.frombuffer(data, dtype='<' + fmt, count=count * ncols, offset=offset)
+        return a.reshape(count, ncols)
+    values = struct.unpack_from('<%d%s' % (count * ncols, fmt), data, offset)
+    return [tuple(values[i:i + ncols]) for i in lrange(0, len(values), ncols)]
 
-def extrude(v2d, tri2d, order, z1, z2, units):
+
+def _read_chunks(data, i, end, objects):
+    '''
+    Reads the chunks of data from i to end, appending each mesh to the list
+    of Object_Geometrys objects
+    '''
+    while i < end:
+        (key, size) = struct.unpack_from('<HI', data, i)
+        body = i + 6
+        if key in (KEY3DS['EDIT3DS'], KEY3DS['OBJ_TRIMESH']):
+            _read_chunks(data, body, i + size, objects)
+        elif key == KEY3DS['EDIT_OBJECT']:
+            j = data.index(b'\0', body)
+            objects.append(Object_Geometry(data[body:j].decode('utf-8'), [], []))
+            _read_chunks(data, j + 1, i + size, objects)
+        elif key == KEY3DS['TRI_VERTEXL']:
+            (n,) = struct.unpack_from('<H', data, body)
+            objects[-1].vertices = _unpack('f', data, body + 2, n, 3)
+        elif key == KEY3DS['TRI_FACEL1']:
+            (n,) = struct.unpack_from('<H', data, body)
+            faces = _unpack('H', data, body + 2, n, 4)
+            if np is not None:
+                objects[-1].triangles = faces[:, 0:3]
+            else:
+                objects[-1].triangles = [f[0:3] for f in faces]
+        i += size
+
+
+def read_3ds(filename):
+    '''
+    Reads the triangle meshes of the 3DS file filename.  Returns a list of
+    Object_Geometrys, whose vertices are (x, y, z) and triangles are (i0, i1,
+    i2).  These are numpy arrays if numpy is available, otherwise lists of
+    tuples.  Chunks other than meshes are skipped.
+    '''
+    with open(filename, 'rb') as fd:
+        data = fd.read()
+    (key, size) = struct.unpack_from('<HI', data, 0)
+    if key != KEY3DS['MAIN3DS'] or size != len(data):
+        raise ValueError('%s is not a 3DS file' % filename)
+    objects = []
+    _read_chunks(data, 6, size, objects)
+    return objects
+
+
+def _scale(units):
+    '''Returns the length of an increment in the 3DS file, which is in mm or inches'''
     if units.metric:
-        scale = 1.0
-    else:
-        scale = 1.0 / units.increments_per_inch
-    nv2d = len(v2d)
-    ntri2d = len(tri2d)
-    v3d = [[0, 0, 0]] * (nv2d * 2)
-    i = 0
-    i2 = nv2d
-    for v in v2d:
-        v1 = [v[0] * scale, v[1] * scale, z1 * scale]
-        v2 = [v[0] * scale, v[1] * scale, z2 * scale]
-        v3d[i] = [v1[order[0]], v1[order[1]], v1[order[2]]]
-        v3d[i2] = [v2[order[0]], v2[order[1]], v2[order[2]]]
-        i += 1
-        i2 += 1
-    tri3d = [[0, 0, 0]] * (2 * ntri2d)
-    i = 0
-    i2 = ntri2d
-    for t in tri2d:
-        tri3d[i] = [t[0], t[1], t[2]]
-        tri3d[i2] = [t[0] + nv2d, t[1] + nv2d, t[2] + nv2d]
-        i += 1
-        i2 += 1
-    for i in lrange(nv2d):
-        ip = i + 1
-        ie = i + nv2d
-        iep = ie + 1
-        if ip == nv2d:
-            ip = 0
-            iep = nv2d
-        tri3d.append([i, ip, iep])
-        tri3d.append([i, iep, ie])
-    return (v3d, tri3d)
+        return 1.0
+    return 1.0 / units.increments_per_inch
 
 
-def joint_to_3ds(filename, boards, bit, spacing):
+def cut_xbreaks(board, units):
+    '''Returns the x-coordinates of the cut boundaries of board, as written by extrude()'''
+    xs = set()
+    for cuts in [board.top_cuts, board.bottom_cuts]:
+        if cuts is not None:
+            for c in cuts:
+                xs.update([c.xmin, c.xmax])
+    scale = _scale(units)
+    return sorted(float(x + board.xL()) * scale for x in xs)
+
+
+def _permutation_parity(order):
+    '''Returns True if the axis permutation order is odd, and so reflects the mesh'''
+    return sum(1 for a in lrange(3) for b in lrange(a + 1, 3) if order[a] > order[b]) % 2 == 1
+
+
+def _area2(xy, t):
+    '''Returns twice the signed area of the triangle t of the points xy'''
+    (a, b, c) = [xy[k] for k in t[0:3]]
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+def extrude(v2d, tri2d, order, z1, z2, units):
+    '''
+    Extrudes the 2D triangulation (v2d, tri2d), whose vertices are ordered
+    around its perimeter, from z1 to z2.  The (x, y, z) coordinates are
+    permuted to (order[0], order[1], order[2]) and scaled to inches or mm.
+
+    Coincident vertices are merged, and the triangles that become degenerate
+    are removed.  The triangles are wound counterclockwise when seen from
+    outside the solid.
+
+    Returns (vertices, triangles), as numpy arrays if numpy is available,
+    otherwise as lists.
+    '''
+    scale = _scale(units)
+    # merge coincident vertices, keeping the first of each.  The floats are
+    # hashed, since hashing Decimals is slow.
+    index = {}
+    inverse = [index.setdefault((float(v[0]) * scale, float(v[1]) * scale), len(index))
+               for v in v2d]
+    xy = list(index)
+    n = len(xy)
+    zs = (float(z1) * scale, float(z2) * scale)
+    # the extruded triangles are reversed if the bottom cap (z1) is on top,
+    # or the permutation is a reflection
+    flip = (zs[0] > zs[1]) != _permutation_parity(order)
+    if np is not None:
+        p = np.array(xy).reshape(-1, 2)
+        inverse = np.array(inverse, dtype=int)
+        cap = inverse[np.asarray(tri2d, dtype=int).reshape(-1, 3)]
+        cap = cap[(cap[:, 0] != cap[:, 1]) & (cap[:, 1] != cap[:, 2]) & (cap[:, 2] != cap[:, 0])]
+        # wind the cap triangles counterclockwise
+        (a, b, c) = (p[cap[:, 0]], p[cap[:, 1]], p[cap[:, 2]])
+        cw = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) < (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+        cap[cw] = cap[cw][:, ::-1]
+        # a quad of two triangles for each perimeter edge, with the perimeter
+        # counterclockwise
+        i = inverse
+        ip = np.concatenate([inverse[1:], inverse[0:1]])
+        if np.sum(p[i, 0] * p[ip, 1] - p[ip, 0] * p[i, 1]) < 0:
+            (i, ip) = (ip, i)
+        keep = i != ip
+        (i, ip) = (i[keep], ip[keep])
+        walls = np.stack([np.column_stack([i, ip, ip + n]),
+                          np.column_stack([i, ip + n, i + n])], axis=1).reshape(-1, 3)
+        triangles = np.concatenate([cap[:, ::-1], cap + n, walls])
+        if flip:
+            triangles = triangles[:, ::-1]
+        xyz = np.empty((2 * n, 3))
+        xyz[0:n, 0:2] = p
+        xyz[n:, 0:2] = p
+        xyz[0:n, 2] = zs[0]
+        xyz[n:, 2] = zs[1]
+        return (xyz[:, list(order)], triangles)
+    vertices = [[p[order[k]] for k in lrange(3)] for z in zs for p in [(x, y, z) for (x, y) in xy]]
+    cap = [[inverse[k] for k in t[0:3]] for t in tri2d]
+    cap = [t if _area2(xy, t) >= 0 else t[::-1] for t in cap if len(set(t)) == 3]
+    triangles = [t[::-1] for t in cap] + [[k + n for k in t] for t in cap]
+    ring = [(i, inverse[(k + 1) % len(inverse)]) for (k, i) in enumerate(inverse)]
+    if sum(xy[i][0] * xy[ip][1] - xy[ip][0] * xy[i][1] for (i, ip) in ring) < 0:
+        ring = [(ip, i) for (i, ip) in ring]
+    for (i, ip) in ring:
+        if i != ip:
+            triangles.append([i, ip, ip + n])
+            triangles.append([i, ip + n, i + n])
+    if flip:
+        triangles = [t[::-1] for t in triangles]
+    return (vertices, triangles)
+
+
+def joint_objects(boards, bit, spacing):
+    '''
+    Returns a list of Object_Geometrys of the extruded active boards of the
+    joint, in inches or mm.  The top board and any double boards are in the
+    xy-plane, stacked down from the top board, each overlapping the next by
+    the bit depth.  The bottom board is rotated about the x-axis to meet
+    the last of them, as in the assembled joint.
+    '''
     bc = copy.deepcopy(boards)
     router.cut_boards(bc, bit, spacing)
-    for b in bc:
-        b.set_origin(0, 0)
+    stack = [(bc[0], 'top')]
+    if bc[3].active:
+        stack.append((bc[3], 'double_double'))
+    if bc[2].active:
+        stack.append((bc[2], 'double'))
     objects = []
-    bc[1].set_origin(0, -(bc[1].yT() - bit.depth))
-    (v2d, tri2d) = bc[0].triangulate(bit)
-    (v3dtop, tri3dtop) = extrude(v2d, tri2d, (0, 1, 2), 0, bit.depth, bit.units)
-    objects.append(Object_Geometry('top', v3dtop, tri3dtop))
-    (v2d, tri2d) = bc[1].triangulate(bit)
-    (v3dbot, tri3dbot) = extrude(v2d, tri2d, (0, 2, 1), 0, bit.depth, bit.units)
-    objects.append(Object_Geometry('top', v3dbot, tri3dbot))
-#
-#    v3d = []
-#    for v in v2d:
-#        v3d.append([v[0], v[1], 0])
-#    objects = [Object_Geometry('top', v3d, tri2d)]
-#
-    write_3ds(filename, objects)
-    
+    y = bc[0].height
+    for (b, name) in stack:
+        # the top of each board is at the depth of the bottom cuts of the board above
+        b.set_origin(0, y - b.height)
+        y = b.yB() + bit.depth
+        (v2d, tri2d) = b.triangulate(bit)
+        (v3d, tri3d) = extrude(v2d, tri2d, (0, 1, 2), 0, bit.depth, bit.units)
+        objects.append(Object_Geometry(name, v3d, tri3d, cut_xbreaks(b, bit.units)))
+    b = bc[1]
+    b.set_origin(0, -(b.height - bit.depth))
+    (v2d, tri2d) = b.triangulate(bit)
+    (v3d, tri3d) = extrude(v2d, tri2d, (0, 2, 1), y - bit.depth, y, bit.units)
+    objects.append(Object_Geometry('bottom', v3d, tri3d, cut_xbreaks(b, bit.units)))
+    return objects
+
+
+def joint_to_3ds(filename, boards, bit, spacing):
+    '''Writes the joint to filename in 3DS format'''
+    write_3ds(filename, joint_objects(boards, bit, spacing))
+
 
 if __name__ == '__main__':
     v1 = [[0, 0, 0],
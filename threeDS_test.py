@@ -0,0 +1,213 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for threeDS.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import os
+import shutil
+import struct
+import random
+import tempfile
+import unittest
+
+import utils
+import job_runner
+import threeDS
+
+
+def reference_3ds(objects):
+    '''Returns the 3DS bytes of objects, packed one vertex and face at a time'''
+    edit = b''
+    for obj in objects:
+        v = b''.join(struct.pack('<fff', *p) for p in obj.vertices)
+        f = b''.join(struct.pack('<HHHH', t[0], t[1], t[2], 6) for t in obj.triangles)
+        mesh = struct.pack('<HIH', 0x4110, 8 + len(v), len(obj.vertices)) + v + \
+            struct.pack('<HIH', 0x4120, 8 + len(f), len(obj.triangles)) + f
+        mesh = struct.pack('<HI', 0x4100, 6 + len(mesh)) + mesh
+        name = obj.name.encode('utf-8') + b'\0'
+        edit += struct.pack('<HI', 0x4000, 6 + len(name) + len(mesh)) + name + mesh
+    return struct.pack('<HIHI', 0x4D4D, 12 + len(edit), 0x3D3D, 6 + len(edit)) + edit
+
+
+def as_lists(obj):
+    '''Returns the vertices and triangles of obj as lists of lists'''
+    return ([[float(x) for x in v] for v in obj.vertices],
+            [[int(i) for i in t] for t in obj.triangles])
+
+
+def strip(nx):
+    '''
+    Returns an Object_Geometry of a strip of 2 (nx - 1) triangles, between
+    two rows of nx vertices along x, with the triangles in a shuffled order
+    '''
+    vertices = [[float(i), float(j), 0.] for j in range(2) for i in range(nx)]
+    triangles = [[i, i + 1, i + nx + 1] for i in range(nx - 1)] + \
+                [[i, i + nx + 1, i + nx] for i in range(nx - 1)]
+    random.Random(nx).shuffle(triangles)
+    return threeDS.Object_Geometry('strip', vertices, triangles)
+
+
+def triangle_set(obj):
+    '''Returns the set of the triangles of obj, as tuples of vertex coordinates'''
+    (vertices, triangles) = as_lists(obj)
+    return set(tuple(tuple(vertices[i]) for i in t) for t in triangles)
+
+
+def triangle_coords(obj, np):
+    '''Returns a numpy array of the vertex coordinates of each triangle of obj'''
+    vertices = np.asarray(obj.vertices, dtype=np.float32)
+    return vertices[np.asarray(obj.triangles, dtype=int)].reshape(-1, 9)
+
+
+class ThreeDS_Test(unittest.TestCase):
+    '''
+    Tests writing and reading 3DS files
+    '''
+    objects = [threeDS.Object_Geometry('box', [[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0.5]],
+                                       [[0, 1, 3], [0, 3, 2]]),
+               threeDS.Object_Geometry('empty', [], []),
+               threeDS.Object_Geometry('tri', [[0.25, 1.5, -2], [0.75, 1.5, 3], [0, 0, 0]],
+                                       [[2, 1, 0]])]
+
+    def setUp(self):
+        utils.init_decimal_context()
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'test.3ds')
+        self.np = threeDS.np
+
+    def tearDown(self):
+        threeDS.np = self.np
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip(self):
+        # with numpy, if available, and with struct
+        for np in [self.np, None]:
+            threeDS.np = np
+            threeDS.write_3ds(self.filename, self.objects)
+            with open(self.filename, 'rb') as fd:
+                self.assertEqual(fd.read(), reference_3ds(self.objects))
+            objects = threeDS.read_3ds(self.filename)
+            self.assertEqual([o.name for o in objects], [o.name for o in self.objects])
+            for (o, expected) in zip(objects, self.objects):
+                self.assertEqual(as_lists(o), as_lists(expected))
+
+    def test_joint(self):
+        (bit, boards, sp, dummy_config) = job_runner.Joint_Factory().make_joint({'es_centered': False})
+        threeDS.joint_to_3ds(self.filename, boards, bit, sp)
+        objects = threeDS.read_3ds(self.filename)
+        self.assertEqual(len(objects), 2)
+        for (o, thickness) in zip(objects, [2, 1]):
+            (vertices, triangles) = as_lists(o)
+            self.assertTrue(len(triangles) > 0)
+            self.assertTrue(max(max(t) for t in triangles) < len(vertices))
+            # the boards are 7 1/2 inches wide, extruded by the 3/4 inch bit depth
+            self.assertEqual(max(v[0] for v in vertices), 7.5)
+            self.assertEqual(max(v[thickness] for v in vertices), 0.75)
+
+    def test_extrude(self):
+        # an L of area 4, with a repeated vertex and mixed triangle windings
+        v2d = [[0, 0], [3, 0], [3, 1], [1, 1], [1, 2], [0, 2], [0, 0]]
+        tri2d = [[3, 4, 5], [3, 0, 5], [3, 6, 1], [3, 2, 1]]
+        units = utils.Units(' ', True, 1, utils.Null_Translator())
+        for order in [(0, 1, 2), (0, 2, 1), (2, 0, 1)]:
+            for (z1, z2) in [(0, 3), (3, 0)]:
+                r = []
+                for np in [self.np, None]:
+                    threeDS.np = np
+                    (vertices, triangles) = as_lists(threeDS.Object_Geometry(
+                        '', *threeDS.extrude(v2d, tri2d, order, z1, z2, units)))
+                    r.append((vertices, triangles))
+                    self.assertEqual(len(vertices), 12)
+                    self.assertEqual(len(set(tuple(v) for v in vertices)), 12)
+                    self.assertEqual(self.check_solid(vertices, triangles), 12)
+                self.assertEqual(r[0], r[-1])
+
+    def test_joint_boards(self):
+        # dovetails, and boards with cuts on both edges
+        (bit, boards, sp, dummy_config) = job_runner.Joint_Factory().make_joint(
+            {'bit_angle': 7, 'double_thickness': '1/8', 'double_double_thickness': '1/8'})
+        objects = threeDS.joint_objects(boards, bit, sp)
+        self.assertEqual([o.name for o in objects], ['top', 'double_double', 'double', 'bottom'])
+        for o in objects:
+            self.assertTrue(self.check_solid(*as_lists(o)) > 0)
+
+    def check_solid(self, vertices, triangles):
+        '''
+        Checks that the triangles are a closed surface, with each edge in
+        opposite directions on its two triangles.  Returns the volume, which
+        is positive if the triangles are counterclockwise from outside.
+        '''
+        edges = sorted((t[k], t[k - 1]) for t in triangles for k in range(3))
+        self.assertEqual(edges, sorted((b, a) for (a, b) in edges))
+        self.assertEqual(len(set(edges)), len(edges))
+        volume = sum(a[0] * (b[1] * c[2] - b[2] * c[1]) +
+                     a[1] * (b[2] * c[0] - b[0] * c[2]) +
+                     a[2] * (b[0] * c[1] - b[1] * c[0])
+                     for (a, b, c) in [[vertices[i] for i in t] for t in triangles])
+        return volume / 6
+
+    def check_split(self, obj, pieces, max_count):
+        self.assertEqual(sum(len(p.triangles) for p in pieces), len(obj.triangles))
+        for p in pieces:
+            self.assertTrue(len(p.vertices) <= max_count and len(p.triangles) <= max_count)
+        if self.np is None:
+            found = set()
+            for p in pieces:
+                found |= triangle_set(p)
+            self.assertEqual(found, triangle_set(obj))
+        else:
+            np = self.np
+            found = np.concatenate([triangle_coords(p, np) for p in pieces])
+            expected = triangle_coords(obj, np)
+            self.assertTrue(np.array_equal(found[np.lexsort(found.T)],
+                                           expected[np.lexsort(expected.T)]))
+
+    def test_split(self):
+        # several hundred thousand triangles, written as several meshes
+        obj = strip(150001)
+        threeDS.write_3ds(self.filename, [obj])
+        pieces = threeDS.read_3ds(self.filename)
+        self.assertEqual([p.name for p in pieces], ['strip_%d' % i for i in range(1, 6)])
+        self.check_split(obj, pieces, threeDS.MAX_COUNT)
+
+    def test_split_breaks(self):
+        for np in [self.np, None]:
+            threeDS.np = np
+            obj = strip(1001)
+            obj.xbreaks = [100., 250., 300., 700.]
+            pieces = threeDS.split_object(obj, 700)
+            self.check_split(obj, pieces, 700)
+            # slabs along x, ending at the last break in each
+            xranges = [(min(v[0] for v in p.vertices), max(v[0] for v in p.vertices))
+                       for p in [threeDS.Object_Geometry('', *as_lists(p)) for p in pieces]]
+            self.assertEqual(xranges, [(0, 300), (300, 649), (649, 700), (700, 1000)])
+            self.assertEqual(threeDS.split_object(obj, 2500), [obj])
+
+    def test_not_3ds(self):
+        with open(self.filename, 'wb') as fd:
+            fd.write(b'not a 3ds file')
+        self.assertRaises(ValueError, threeDS.read_3ds, self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
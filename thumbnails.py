@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+On-disk cache of thumbnails of saved joints, for previewing files without
+decoding the full-size images.
+
+Thumbnails are keyed by a hash of the file contents and the thumbnail size,
+so that renamed or copied files share a thumbnail, and a changed file gets a
+new one.  The total size of the cache is bounded, and the least recently
+used thumbnails are removed first, using the file modification times, which
+are updated on each use.
+
+The cache does not depend on Qt.  The function that makes a thumbnail from
+the PNG bytes of a file is given by the caller (see qt_utils.scale_png()).
+'''
+from __future__ import print_function
+
+import os
+import hashlib
+import threading
+
+
+def default_directory():
+    '''Returns the default cache directory, following the XDG convention'''
+    cache = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache, 'pyrouterjig', 'thumbs')
+
+
+class Thumbnail_Cache(object):
+    '''
+    Size-bounded, least-recently-used cache of thumbnails.  The methods may
+    be called from several threads.
+
+    directory: Where the thumbnails are stored.  Created if needed.
+    max_bytes: Maximum total size of the thumbnails
+    size: Maximum width and height of the thumbnails, in pixels
+    '''
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024, size=256):
+        if directory is None:
+            directory = default_directory()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = size
+        self.lock = threading.Lock()
+        # (path, mtime, size) to key, so that unchanged files are not hashed again
+        self.keys = {}
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.nbytes = sum(nbytes for (dummy_mtime, nbytes, dummy_f) in self._entries())
+        self.hits = 0
+        self.misses = 0
+
+    def _entries(self):
+        '''Returns a list of (mtime, bytes, filename) of the cached thumbnails'''
+        r = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.png'):
+                continue
+            f = os.path.join(self.directory, name)
+            try:
+                st = os.stat(f)
+            except OSError:
+                continue
+            r.append((st.st_mtime, st.st_size, f))
+        return r
+
+    def key(self, path):
+        '''Returns the cache key of the file path'''
+        st = os.stat(path)
+        stamp = (path, st.st_mtime, st.st_size)
+        k = self.keys.get(stamp)
+        if k is None:
+            h = hashlib.sha256()
+            with open(path, 'rb') as fd:
+                for block in iter(lambda: fd.read(1 << 16), b''):
+                    h.update(block)
+            k = '%s_%d' % (h.hexdigest(), self.size)
+            self.keys[stamp] = k
+        return k
+
+    def filename(self, key):
+        '''Returns the filename of the thumbnail with key'''
+        return os.path.join(self.directory, key + '.png')
+
+    def get(self, path):
+        '''Returns the PNG bytes of the thumbnail of the file path, or None if not cached'''
+        f = self.filename(self.key(path))
+        try:
+            with open(f, 'rb') as fd:
+                data = fd.read()
+            # mark as recently used
+            os.utime(f, None)
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, path, data):
+        '''Stores data, the PNG bytes of the thumbnail of the file path'''
+        f = self.filename(self.key(path))
+        tmp = '%s.%d.tmp' % (f, threading.current_thread().ident)
+        with open(tmp, 'wb') as fd:
+            fd.write(data)
+        with self.lock:
+            if os.path.exists(f):
+                self.nbytes -= os.path.getsize(f)
+            os.replace(tmp, f)
+            self.nbytes += len(data)
+            if self.nbytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        '''Removes the least recently used thumbnails, until the cache fits in max_bytes'''
+        entries = sorted(self._entries())
+        self.nbytes = sum(nbytes for (dummy_mtime, nbytes, dummy_f) in entries)
+        for (dummy_mtime, nbytes, f) in entries:
+            if self.nbytes <= self.max_bytes:
+                break
+            try:
+                os.remove(f)
+            except OSError:
+                continue
+            self.nbytes -= nbytes
+
+    def thumbnail(self, path, scale):
+        '''
+        Returns the PNG bytes of the thumbnail of the file path, making it if
+        it is not cached with scale(data, size), where data is the contents
+        of the file.  Returns None, and caches nothing, if scale fails and
+        returns no bytes.
+        '''
+        data = self.get(path)
+        if data is None:
+            with open(path, 'rb') as fd:
+                data = scale(fd.read(), self.size)
+            if not data:
+                return None
+            self.put(path, data)
+        return data
+
+    def clear(self):
+        '''Removes all of the thumbnails'''
+        with self.lock:
+            for (dummy_mtime, dummy_nbytes, f) in self._entries():
+                os.remove(f)
+            self.nbytes = 0
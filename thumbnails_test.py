@@ -0,0 +1,99 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for thumbnails.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import thumbnails
+
+
+def scale(data, size):
+    '''Returns a fake thumbnail of size bytes, from the first byte of data'''
+    return data[0:1] * size
+
+
+class Thumbnail_Cache_Test(unittest.TestCase):
+    '''
+    Tests the thumbnail cache
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, 'thumbs')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, data):
+        f = os.path.join(self.tmpdir, name)
+        with open(f, 'wb') as fd:
+            fd.write(data)
+        return f
+
+    def test_hits(self):
+        cache = thumbnails.Thumbnail_Cache(self.cache_dir, size=100)
+        a = self.write('a.png', b'a' * 1000)
+        self.assertEqual(cache.get(a), None)
+        self.assertEqual(cache.thumbnail(a, scale), b'a' * 100)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        # a copy has the same contents, so shares the thumbnail
+        b = self.write('b.png', b'a' * 1000)
+        self.assertEqual(cache.thumbnail(b, None), b'a' * 100)
+        self.assertEqual(cache.hits, 1)
+        # a changed file gets a new thumbnail
+        self.write('a.png', b'c' * 1001)
+        self.assertEqual(cache.thumbnail(a, scale), b'c' * 100)
+        # thumbnails persist
+        cache = thumbnails.Thumbnail_Cache(self.cache_dir, size=100)
+        self.assertEqual(cache.nbytes, 200)
+        self.assertEqual(cache.get(b), b'a' * 100)
+        cache.clear()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_eviction(self):
+        cache = thumbnails.Thumbnail_Cache(self.cache_dir, max_bytes=350, size=100)
+        files = [self.write('%d.png' % i, bytes(bytearray([i])) * 10) for i in range(5)]
+        for (i, f) in enumerate(files[0:3]):
+            cache.thumbnail(f, scale)
+            os.utime(cache.filename(cache.key(f)), (i, i))
+        # use the oldest, so that the second is the least recently used
+        cache.get(files[0])
+        cache.thumbnail(files[3], scale)
+        self.assertEqual(cache.nbytes, 300)
+        self.assertEqual([cache.get(f) is not None for f in files[0:4]], [True, False, True, True])
+
+    def test_failure(self):
+        cache = thumbnails.Thumbnail_Cache(self.cache_dir, size=100)
+        a = self.write('a.png', b'not a png')
+        # a failed scaling is not cached, so that it is retried
+        self.assertEqual(cache.thumbnail(a, lambda data, size: None), None)
+        self.assertEqual(cache.thumbnail(a, lambda data, size: b''), None)
+        self.assertEqual((cache.nbytes, os.listdir(self.cache_dir)), (0, []))
+        self.assertEqual(cache.thumbnail(a, scale), b'n' * 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
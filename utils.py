@@ -23,14 +23,15 @@ This module contains base utilities for pyRouterJig
 '''
 from __future__ import division
 from __future__ import print_function
-from decimal import Decimal
+from decimal import Decimal, getcontext
+import copy
 import math
 import os
 import glob
 import platform
 
 
-VERSION = '0.9.4'
+VERSION = '0.9.5'
 
 
 def my_round(f):
@@ -51,6 +52,26 @@ def isMac():
     return platform.system() == 'Darwin'
 
 
+def init_decimal_context():
+    '''
+    Sets the Decimal context used for all joint computations.  The GUI and
+    the headless tools must use the same context to get identical cuts.
+    '''
+    getcontext().prec = 4 + 4  # working in f8.4
+    getcontext().Emin = -99999999  # working in f8.4
+    getcontext().Emax = 99999999  # working in f8.4
+
+
+class Null_Translator(object):
+    '''
+    Stands in for QTranslator when running without Qt.  Strings are
+    returned untranslated.
+    '''
+    def tr(self, s):
+        '''Returns s, untranslated'''
+        return s
+
+
 class My_Fraction(object):
     '''
     Represents a number as whole + numerator / denominator, all of which must be
@@ -167,9 +188,16 @@ class Units(object):
 
     Attributes:
     increments_per_inch: Number of increments per inch.
+
+    increments_to_string() caches its strings, which are drawn for every
+    router pass on every paint.  The cache is cleared when the units change.
     '''
     mm_per_inch = 25.4
     quant = Decimal('0.01')
+    # Denominators of the English fractions, otherwise decimals are used
+    allow_denoms = (1, 2, 4, 8, 16, 32, 64)
+    # Maximum number of strings cached by increments_to_string()
+    max_strings = 4096
 
     def __init__(self, english_separator, metric=False, num_increments=None, transl=None):
         self.english_separator = english_separator
@@ -188,6 +216,16 @@ class Units(object):
         else:  # english units
             self.increments_per_inch = self.num_increments
             Units.quant = Decimal('0.001')
+        self.strings = {}
+        self.strings_state = None
+
+    def __deepcopy__(self, memo):
+        '''Copies the units, without the strings cached by increments_to_string()'''
+        units = Units.__new__(Units)
+        memo[id(self)] = units
+        state = dict(self.__dict__, strings={}, strings_state=None)
+        units.__dict__.update(copy.deepcopy(state, memo))
+        return units
 
     def increments_to_inches(self, increments):
         '''Converts increments to inches.'''
@@ -207,10 +245,25 @@ class Units(object):
         its respective units.
         metric conversion requires fixed point rounding
         '''
+        # floats are converted differently from integers and Decimals of
+        # the same value.  Units.quant is shared by all Units.
+        key = (increments, with_units, type(increments))
+        state = (self.metric, self.num_increments, self.increments_per_inch,
+                 self.english_separator, Units.quant)
+        if state != self.strings_state or len(self.strings) >= self.max_strings:
+            self.strings = {}
+            self.strings_state = state
+        r = self.strings.get(key)
+        if r is None:
+            r = self._increments_to_string(increments, with_units)
+            self.strings[key] = r
+        return r
+
+    def _increments_to_string(self, increments, with_units):
+        '''Returns increments_to_string(), without the cache'''
         if self.metric:
             r = '%g' % (Decimal(increments) / Decimal(self.num_increments)).quantize(Units.quant)
         else:
-            allow_denoms = [1, 2, 4, 8, 16, 32, 64]
             if isinstance(increments, float):
                 precision = 100
                 numer = int(precision * increments)
@@ -220,7 +273,7 @@ class Units(object):
                 denom = self.increments_per_inch
             frac = My_Fraction(self.english_separator, 0, numer, denom)
             frac.reduce()
-            if frac.numerator != 0 and frac.denominator not in allow_denoms:
+            if frac.numerator != 0 and frac.denominator not in self.allow_denoms:
                 r = '%.3f' % (increments / float(self.num_increments))
             else:
                 r = frac.to_string()
@@ -360,6 +413,15 @@ def get_file_index(path, prefix, suffix):
     return index
 
 
+def default_chunksize(njobs, workers):
+    '''
+    Returns a chunk size for mapping njobs over a pool of workers processes
+    that gives each worker about four chunks, which balances the load
+    without paying the pickling overhead per job.
+    '''
+    return max(1, njobs // (4 * workers))
+
+
 def set_slider_tick_interval(slider):
     '''
     Sets the QSlider tick interval to a reasonable value
@@ -0,0 +1,96 @@
+###########################################################################
+#
+# Copyright 2015-2018 Robert B. Lowrie (http://github.com/lowrie)
+#
+# This file is part of pyRouterJig.
+#
+# pyRouterJig is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# pyRouterJig is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# pyRouterJig; see the file LICENSE. If not, see <http://www.gnu.org/licenses/>.
+#
+###########################################################################
+
+'''
+Tests for utils.  These do not require Qt.
+'''
+from __future__ import print_function
+
+import copy
+import unittest
+from decimal import Decimal
+
+import utils
+
+
+class Units_Test(unittest.TestCase):
+    '''
+    Tests the strings cached by Units.increments_to_string()
+    '''
+    values = [0, 1, 16, 37, 240, -8, 12.5, 0.3, 1.0 / 3, Decimal('5.125'), Decimal(7)]
+
+    def setUp(self):
+        utils.init_decimal_context()
+        self.quant = utils.Units.quant
+        self.transl = utils.Null_Translator()
+
+    def tearDown(self):
+        utils.Units.quant = self.quant
+
+    def check_strings(self, units):
+        for with_units in [False, True]:
+            for v in self.values:
+                expected = units._increments_to_string(v, with_units)
+                self.assertEqual(units.increments_to_string(v, with_units), expected)
+                # and again, from the cache
+                self.assertEqual(units.increments_to_string(v, with_units), expected)
+
+    def test_cached(self):
+        for (metric, num_increments) in [(False, 32), (False, 64), (True, 1), (True, 10)]:
+            units = utils.Units(' ', metric, num_increments, self.transl)
+            self.check_strings(units)
+            # equal integers and floats are cached separately
+            self.assertEqual(len(units.strings), 2 * len(self.values))
+
+    def test_invalidate(self):
+        units = utils.Units('-', False, 32, self.transl)
+        self.assertEqual(units.increments_to_string(40, True), '1-1/4"')
+        units.english_separator = ' '
+        self.assertEqual(units.increments_to_string(40, True), '1 1/4"')
+        units.num_increments = units.increments_per_inch = 64
+        self.assertEqual(units.increments_to_string(40, True), '5/8"')
+        units.metric = True
+        utils.Units.quant = Decimal('0.01')
+        self.assertEqual(units.increments_to_string(40, True), '0.62 mm')
+        self.check_strings(units)
+        # Units.quant is shared, and set by the last Units created
+        utils.Units(' ', False, 32, self.transl)
+        self.assertEqual(units.increments_to_string(40, True), '0.625 mm')
+
+    def test_max_strings(self):
+        units = utils.Units(' ', False, 32, self.transl)
+        for i in range(2 * units.max_strings):
+            units.increments_to_string(i)
+            self.assertTrue(len(units.strings) <= units.max_strings)
+        self.check_strings(units)
+
+    def test_deepcopy(self):
+        units = utils.Units(' ', False, 32, self.transl)
+        self.check_strings(units)
+        (u, transl) = copy.deepcopy((units, units.transl))
+        self.assertEqual(u.strings, {})
+        self.assertTrue(u.transl is transl)
+        self.assertEqual(u.num_increments, 32)
+        self.check_strings(u)
+        self.assertEqual(len(units.strings), 2 * len(self.values))
+
+
+if __name__ == '__main__':
+    unittest.main()